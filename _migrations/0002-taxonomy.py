@@ -1,10 +1,61 @@
+def _squash(obj):
+    names = [getattr(obj, name, None) for name in ('genus', 'species')]
+    if all(name is None for name in names):
+        return
+    obj.taxonomy = ' '.join(name for name in names if name is not None)
+    obj._d_.pop('genus', None)
+    obj._d_.pop('species', None)
+
+
 def migrate(doc):
-    # Squash the taxonomy
-    doc.taxonomy = ' '.join([doc.genus, doc.species])
-    del doc.genus
-    del doc.species
-    for enc_doc in doc.encounters:
-        enc_doc.taxonomy = ' '.join([enc_doc.genus, enc_doc.species])
-        del enc_doc.genus
-        del enc_doc.species
+    # Squash the taxonomy, by the client (like ``SCRIPT``)
+    _squash(doc)
+    for enc_doc in doc.encounters or []:
+        _squash(enc_doc)
     return doc
+
+
+# Squash the taxonomy, within the cluster (see ``gumby.migrations.migrate_server_side``)
+SCRIPT = """
+boolean changed = false;
+if (ctx._source.containsKey('genus') || ctx._source.containsKey('species')) {
+  ctx._source.taxonomy = [ctx._source.remove('genus'), ctx._source.remove('species')]
+    .stream().filter(x -> x != null).collect(Collectors.joining(' '));
+  changed = true;
+}
+if (ctx._source.encounters != null) {
+  for (def enc_doc : ctx._source.encounters) {
+    if (enc_doc.containsKey('genus') || enc_doc.containsKey('species')) {
+      enc_doc.taxonomy = [enc_doc.remove('genus'), enc_doc.remove('species')]
+        .stream().filter(x -> x != null).collect(Collectors.joining(' '));
+      changed = true;
+    }
+  }
+}
+if (!changed) {
+  ctx.op = 'noop';
+}
+"""
+
+# Only the documents that still have a genus or species
+QUERY = {
+    'bool': {
+        'should': [
+            {'exists': {'field': 'genus'}},
+            {'exists': {'field': 'species'}},
+            {
+                'nested': {
+                    'path': 'encounters',
+                    'query': {
+                        'bool': {
+                            'should': [
+                                {'exists': {'field': 'encounters.genus'}},
+                                {'exists': {'field': 'encounters.species'}},
+                            ]
+                        }
+                    },
+                }
+            },
+        ]
+    }
+}
@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+"""Client-side benchmarks of gumby's models and ingest paths.
+
+None of these benchmarks require a running elasticsearch instance.
+Search responses are parsed from recordings in the ``responses`` directory.
+
+Run all benchmarks and write the results as JSON::
+
+    python benchmarks/run.py --output results.json
+
+Compare against the results of a previous run (e.g. from another commit)::
+
+    python benchmarks/run.py --compare baseline.json
+
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+from pathlib import Path
+
+from elasticsearch.helpers import expand_action
+from elasticsearch.serializer import JSONSerializer
+from elasticsearch_dsl.response import Response
+
+from gumby.codecs import get_codec
+from gumby.factories import CorpusGenerator
+from gumby.ingest import iter_bulk_actions
+from gumby.models import Individual, Sex
+
+HERE = Path(__file__).parent
+RESPONSES = HERE / 'responses'
+#: Numbers of nested encounters used for the document benchmarks
+ENCOUNTER_COUNTS = (1, 10, 100, 1000)
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register a benchmark. The decorated function does any setup
+    and returns the callable that is timed.
+
+    """
+
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return decorator
+
+
+def make_individual(encounters):
+    generator = CorpusGenerator(seed=encounters)
+    props = next(generator.individuals(1))
+    props['encounters'] = [
+        e for i in generator.individuals(encounters) for e in i['encounters']
+    ][:encounters]
+    return props
+
+
+# ############################################################################
+# Fields
+# ############################################################################
+
+
+@benchmark('enum_field.deserialize[1000]')
+def enum_field_deserialize():
+    field = Individual._doc_type.mapping['sex']
+    values = [str(x) for x in Sex] * 250
+    return lambda: [field.deserialize(v) for v in values]
+
+
+@benchmark('enum_field.clean[1000]')
+def enum_field_clean():
+    field = Individual._doc_type.mapping['sex']
+    values = [str(x) for x in Sex] * 250
+    return lambda: [field.clean(v) for v in values]
+
+
+@benchmark('enum_field.serialize[1000]')
+def enum_field_serialize():
+    field = Individual._doc_type.mapping['sex']
+    values = list(Sex) * 250
+    return lambda: [field.serialize(v) for v in values]
+
+
+@benchmark('uuid_field.deserialize[1000]')
+def uuid_field_deserialize():
+    field = Individual._doc_type.mapping['id']
+    values = [str(x) for x in CorpusGenerator(seed=0)._uuids(1000)]
+    return lambda: [field.deserialize(v) for v in values]
+
+
+@benchmark('uuid_field.serialize[1000]')
+def uuid_field_serialize():
+    field = Individual._doc_type.mapping['id']
+    values = CorpusGenerator(seed=0)._uuids(1000)
+    return lambda: [field.serialize(v) for v in values]
+
+
+# ############################################################################
+# Documents
+# ############################################################################
+
+
+def _document_benchmarks(count):
+    @benchmark(f'individual.construct[{count}]')
+    def construct():
+        props = make_individual(count)
+        return lambda: Individual(**props)
+
+    @benchmark(f'individual.full_clean[{count}]')
+    def full_clean():
+        props = make_individual(count)
+        return lambda: Individual(**props).full_clean()
+
+    @benchmark(f'individual.to_dict[{count}]')
+    def to_dict():
+        doc = Individual(**make_individual(count))
+        doc.full_clean()
+        return doc.to_dict
+
+    @benchmark(f'codec.to_source[{count}]')
+    def to_source():
+        props = make_individual(count)
+        return lambda: get_codec(Individual).to_source(props)
+
+    @benchmark(f'codec.to_source.trusted[{count}]')
+    def to_source_trusted():
+        props = make_individual(count)
+        return lambda: get_codec(Individual).to_source(props, validate=False)
+
+
+for count in ENCOUNTER_COUNTS:
+    _document_benchmarks(count)
+
+
+# ############################################################################
+# Bulk ingest
+# ############################################################################
+
+
+def _bulk_body(actions):
+    serializer = JSONSerializer()
+    lines = []
+    for action in actions:
+        for line in expand_action(action):
+            if line is not None:
+                lines.append(serializer.dumps(line))
+    return '\n'.join(lines)
+
+
+@benchmark('bulk_actions[100x10]')
+def bulk_actions():
+    docs = [make_individual(10) for i in range(100)]
+    return lambda: _bulk_body(iter_bulk_actions(docs))
+
+
+@benchmark('bulk_actions.trusted[100x10]')
+def bulk_actions_trusted():
+    docs = [make_individual(10) for i in range(100)]
+    return lambda: _bulk_body(iter_bulk_actions(docs, trusted=True))
+
+
+# ############################################################################
+# Search responses
+# ############################################################################
+
+
+def _recorded_response(name):
+    with (RESPONSES / f'{name}.json').open('r') as fb:
+        return json.load(fb)
+
+
+@benchmark('search_response.hits[individuals-search]')
+def search_response_hits():
+    raw = _recorded_response('individuals-search')
+    s = Individual.search()
+
+    def parse():
+        resp = Response(s, raw)
+        return [hit.encounters for hit in resp.hits]
+
+    return parse
+
+
+@benchmark('search_response.from_hits[individuals-search]')
+def search_response_from_hits():
+    raw = _recorded_response('individuals-search')
+    return lambda: get_codec(Individual).from_hits(raw['hits']['hits'])
+
+
+# ############################################################################
+# Runner
+# ############################################################################
+
+
+def time_benchmark(func, repeat, min_time):
+    timer = timeit.Timer(func)
+    # Find a number of loops that takes at least ``min_time``
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    timings = [timer.timeit(number) / number for i in range(repeat)]
+    return {
+        'loops': number,
+        'repeat': repeat,
+        'min': min(timings),
+        'mean': statistics.mean(timings),
+        'stdev': statistics.stdev(timings) if repeat > 1 else 0.0,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=HERE,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names=None, repeat=5, min_time=0.05):
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if names and not any(n in name for n in names):
+            continue
+        results[name] = time_benchmark(setup(), repeat, min_time)
+        print(f"{name:<50} {results[name]['min'] * 1e6:>12.1f} us", file=sys.stderr)
+    return {
+        'meta': {
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold):
+    """Print the change in each benchmark's minimum time.
+    Returns the names of benchmarks that slowed down by more than ``threshold``.
+
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        before, after = baseline['results'][name]['min'], result['min']
+        change = (after - before) / before
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(
+            f'{name:<50} {before * 1e6:>12.1f} us -> {after * 1e6:>12.1f} us {change:+8.1%}{flag}'
+        )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        'names', nargs='*', help='only run benchmarks containing these names'
+    )
+    parser.add_argument(
+        '--output', type=Path, help='write the results as JSON to this file'
+    )
+    parser.add_argument(
+        '--compare', type=Path, help='results of a previous run to compare against'
+    )
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.1,
+        help='relative slowdown considered a regression',
+    )
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument(
+        '--min-time', type=float, default=0.05, help='minimum seconds per timing'
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args.names, repeat=args.repeat, min_time=args.min_time)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2, sort_keys=True))
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if compare(baseline, results, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,20 +1,133 @@
-from os import getenv
+import threading
+from os import getenv, getpid
 
 # Expose the major parts of the elasticsearch library
 from elasticsearch import Elasticsearch as BaseClient
+from elasticsearch_dsl import connections
 
 # Expose gumby's internals
 from . import dsl  # noqa
+from .cache import *  # noqa
+from .codecs import *  # noqa
+from .dump import *  # noqa
 from .factories import *  # noqa
+from .indexer import *  # noqa
+from .indices import *  # noqa
+from .ingest import *  # noqa
 from .initialize import *  # noqa
+from .lookups import *  # noqa
+from .migrations import *  # noqa
 from .models import *  # noqa
+from .msearch import *  # noqa
+from .pagination import *  # noqa
+from .partitions import *  # noqa
+from .pipelines import *  # noqa
+from .queries import *  # noqa
+from .routing import *  # noqa
+from .serializers import *  # noqa
+from .sorting import *  # noqa
+from .sync import *  # noqa
+from .updates import *  # noqa
+from .views import *  # noqa
+from .serializers import bulk_body, get_serializer
+
+#: Transport settings that can be tuned through the environment,
+#: as ``<setting>: (<environment variable>, <type>, <default>)``
+TRANSPORT_SETTINGS = {
+    # Connections kept open (and reused) per host
+    'maxsize': ('ELASTICSEARCH_MAXSIZE', int, 25),
+    'timeout': ('ELASTICSEARCH_TIMEOUT', float, 10.0),
+    'max_retries': ('ELASTICSEARCH_MAX_RETRIES', int, 3),
+    'retry_on_timeout': ('ELASTICSEARCH_RETRY_ON_TIMEOUT', bool, True),
+    # gzip request bodies
+    'http_compress': ('ELASTICSEARCH_HTTP_COMPRESS', bool, True),
+    'sniff_on_start': ('ELASTICSEARCH_SNIFF', bool, False),
+    'sniff_on_connection_fail': ('ELASTICSEARCH_SNIFF', bool, False),
+    'sniffer_timeout': ('ELASTICSEARCH_SNIFFER_TIMEOUT', float, None),
+}
+
+
+def _parse_setting(value, type_):
+    if type_ is bool:
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return type_(value)
+
+
+def _get_connection_config(hosts=None, http_auth=None):
+    """Fill in the ``hosts`` and ``http_auth`` connection settings from the environment"""
+    if not hosts:
+        hosts = getenv('ELASTICSEARCH_HOSTS', '').split(',')
+    if not http_auth:
+        # Looking for a value like `<username>:<password>`
+        http_auth = getenv('ELASTICSEARCH_HTTP_AUTH', None)
+    return hosts, http_auth
+
+
+def _get_transport_config(**kwargs):
+    """Fill in the ``TRANSPORT_SETTINGS`` not given in ``kwargs`` from the environment"""
+    for name, (env_var, type_, default) in TRANSPORT_SETTINGS.items():
+        if name in kwargs:
+            continue
+        value = getenv(env_var)
+        kwargs[name] = default if value is None else _parse_setting(value, type_)
+    return kwargs
 
 
 class Client(BaseClient):
     def __init__(self, hosts=None, http_auth=None, **kwargs):
-        if not hosts:
-            hosts = getenv('ELASTICSEARCH_HOSTS', '').split(',')
-        if not http_auth:
-            # Looking for a value like `<username>:<password>`
-            http_auth = getenv('ELASTICSEARCH_HTTP_AUTH', None)
+        hosts, http_auth = _get_connection_config(hosts, http_auth)
+        kwargs = _get_transport_config(**kwargs)
+        kwargs.setdefault('serializer', get_serializer())
         super().__init__(hosts=hosts, http_auth=http_auth, **kwargs)
+
+    def bulk(self, body, *args, **kwargs):
+        # Encode a sequence of actions and sources straight to bytes
+        if not isinstance(body, (str, bytes)):
+            body = bulk_body(self.transport.serializer, body)
+        return super().bulk(body, *args, **kwargs)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+_clients_pid = None
+
+
+def get_client(hosts=None, http_auth=None, alias='default', **kwargs):
+    """Get the shared ``Client`` for the given connection settings
+    (defaulting to the environment, see ``Client``).
+
+    Clients are kept for the life of the process and keyed by host set, credentials
+    and any other settings, so repeated calls reuse the same pool of connections.
+    The client is also registered with ``elasticsearch_dsl.connections`` as ``alias``
+    (e.g. so that ``using='default'`` works); pass ``alias=None`` to skip this.
+
+    """
+    global _clients_pid
+
+    hosts, http_auth = _get_connection_config(hosts, http_auth)
+    if isinstance(hosts, str):
+        hosts = [hosts]
+    key = (
+        tuple(sorted(str(h) for h in hosts)),
+        str(http_auth),
+        tuple(sorted((k, repr(v)) for k, v in kwargs.items())),
+    )
+    with _clients_lock:
+        if _clients_pid != getpid():
+            # Connections must not be shared with a forked parent process
+            _clients.clear()
+            _clients_pid = getpid()
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = Client(hosts=hosts, http_auth=http_auth, **kwargs)
+    if alias is not None:
+        connections.add_connection(alias, client)
+    return client
+
+
+def clear_clients():
+    """Close and forget all shared clients"""
+    with _clients_lock:
+        for client in _clients.values():
+            client.transport.close()
+        _clients.clear()
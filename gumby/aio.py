@@ -0,0 +1,345 @@
+"""Asyncio counterparts of gumby's client and model operations.
+
+This requires the optional ``aiohttp`` dependency (i.e. ``pip install gumby[async]``).
+
+"""
+
+import asyncio
+import warnings
+
+import elasticsearch.exceptions
+from elasticsearch import AsyncElasticsearch, AsyncTransport
+from elasticsearch.helpers import async_scan, async_streaming_bulk
+from elasticsearch_dsl.document import DOC_META_FIELDS, META_FIELDS
+from elasticsearch_dsl.response import Response
+
+from . import _get_connection_config, _get_transport_config
+from .cache import invalidate_index
+from .codecs import get_codec
+from .indices import IndexStatus, _client_method, _init_steps, _reindex_steps, _Sleep
+from .ingest import DEFAULT_CHUNK_SIZE, DEFAULT_MAX_CHUNK_BYTES
+from .models import ALL_MODELS, Individual
+from .msearch import (
+    DEFAULT_MAX_BATCH_SIZE,
+    DEFAULT_MAX_WAIT,
+    _check_params,
+    _fail,
+    _msearch_body,
+    _resolve,
+)
+from .pagination import (
+    DEFAULT_KEEP_ALIVE,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_SORT,
+    _pit_unsupported,
+    _scroll_params,
+)
+from .serializers import get_serializer
+
+__all__ = (
+    'AsyncClient',
+    'AsyncMultiSearchDispatcher',
+    'bulk_load',
+    'dump_ndjson',
+    'initialize_indexes_by_model',
+    'iter_hits',
+    'save',
+    'search',
+)
+
+#: Number of requests a client will have in flight at once
+DEFAULT_MAX_CONCURRENCY = 100
+
+
+class _BoundedAsyncTransport(AsyncTransport):
+    """Transport that limits the number of requests in flight"""
+
+    def __init__(self, *args, max_concurrency=DEFAULT_MAX_CONCURRENCY, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+
+    @property
+    def semaphore(self):
+        # Created lazily so that it belongs to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def perform_request(self, *args, **kwargs):
+        async with self.semaphore:
+            return await super().perform_request(*args, **kwargs)
+
+
+class AsyncClient(AsyncElasticsearch):
+    """Asynchronous client configured the same way as ``gumby.Client``.
+    At most ``max_concurrency`` requests are sent at once; the rest wait their turn.
+
+    """
+
+    def __init__(
+        self,
+        hosts=None,
+        http_auth=None,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        **kwargs,
+    ):
+        hosts, http_auth = _get_connection_config(hosts, http_auth)
+        kwargs = _get_transport_config(**kwargs)
+        kwargs.setdefault('serializer', get_serializer())
+        kwargs.setdefault('transport_class', _BoundedAsyncTransport)
+        if issubclass(kwargs['transport_class'], _BoundedAsyncTransport):
+            kwargs['max_concurrency'] = max_concurrency
+        super().__init__(hosts=hosts, http_auth=http_auth, **kwargs)
+
+
+async def save(client, doc, index=None, validate=True, **kwargs):
+    """Save the ``doc`` like ``Document.save``.
+    Additional keyword arguments are given to ``AsyncElasticsearch.index``.
+
+    """
+    source = get_codec(type(doc)).to_source(doc, validate=validate)
+    doc._route()
+    params = {k: doc.meta[k] for k in DOC_META_FIELDS if k in doc.meta}
+    # Optimistic concurrency control
+    if 'seq_no' in doc.meta and 'primary_term' in doc.meta:
+        params['if_seq_no'] = doc.meta['seq_no']
+        params['if_primary_term'] = doc.meta['primary_term']
+    params.update(kwargs)
+
+    index = doc._get_index(index)
+    meta = await client.index(index=index, body=source, **params)
+    invalidate_index(index, doc._index._name)
+    # update meta information from ES
+    for k in META_FIELDS:
+        if '_' + k in meta:
+            setattr(doc.meta, k, meta['_' + k])
+    return meta['result']
+
+
+async def search(client, s):
+    """Execute the ``elasticsearch_dsl.Search`` ``s`` like ``Search.execute``"""
+    pruned = s.prune() if hasattr(s, 'prune') else s
+    raw = await client.search(index=pruned._index, body=pruned.to_dict(), **pruned._params)
+    return Response(s, raw)
+
+
+class AsyncMultiSearchDispatcher:
+    """Asynchronous ``gumby.MultiSearchDispatcher``, sending the searches
+    awaited by any number of tasks in batches through the ``client``
+
+    """
+
+    def __init__(
+        self, client, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT
+    ):
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def search(self, s):
+        """Execute the search ``s`` in the next batch, like ``Search.execute``"""
+        _check_params(s)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((s, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    async def close(self):
+        """Send the searches still waiting and wait for every batch's response"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch):
+        # Skip searches cancelled before being sent
+        batch = [(s, f) for s, f in batch if not f.done()]
+        if not batch:
+            return
+        try:
+            raw = await self.client.msearch(body=_msearch_body(s for s, f in batch))
+        except Exception as exc:
+            _fail(batch, exc)
+        else:
+            _resolve(batch, raw['responses'])
+
+
+async def _aiter(items):
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def bulk_load(
+    client,
+    docs,
+    model=Individual,
+    index=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    max_chunk_bytes=DEFAULT_MAX_CHUNK_BYTES,
+    refresh=True,
+    trusted=False,
+    raise_on_error=True,
+):
+    """Asynchronous ``gumby.bulk_load``; ``docs`` may also be an asynchronous iterable"""
+    codec = get_codec(model)
+    validate = not trusted
+
+    async def actions():
+        async for doc in _aiter(docs):
+            yield codec.to_action(doc, index=index, validate=validate)
+
+    success, errors = 0, []
+    async for ok, info in async_streaming_bulk(
+        client,
+        actions(),
+        chunk_size=chunk_size,
+        max_chunk_bytes=max_chunk_bytes,
+        raise_on_error=raise_on_error,
+    ):
+        if ok:
+            success += 1
+        else:
+            errors.append(info)
+
+    written = model._index._name if index is None else index
+    if refresh:
+        # Refresh to ensure all shards are up-to-date and ready for requests
+        await client.indices.refresh(index=written)
+    invalidate_index(written)
+    return success, errors
+
+
+async def iter_hits(
+    client,
+    index,
+    body=None,
+    sort=DEFAULT_SORT,
+    page_size=DEFAULT_PAGE_SIZE,
+    keep_alive=DEFAULT_KEEP_ALIVE,
+):
+    """Asynchronous ``gumby.iter_hits``"""
+    try:
+        resp = await client.open_point_in_time(index=index, keep_alive=keep_alive)
+    except elasticsearch.exceptions.TransportError as e:
+        if not _pit_unsupported(e):
+            raise
+        params = _scroll_params(body, sort, page_size, keep_alive)
+        async for hit in async_scan(client, index=index, **params):
+            yield hit
+        return
+    pit_id = resp['id']
+    body = dict(body or {})
+    body.update(
+        size=page_size,
+        sort=list(sort),
+        track_total_hits=False,
+        pit={'id': pit_id, 'keep_alive': keep_alive},
+    )
+    try:
+        while True:
+            resp = await client.search(body=body)
+            hits = resp['hits']['hits']
+            for hit in hits:
+                yield hit
+            if len(hits) < page_size:
+                break
+            # The point-in-time id may change between requests
+            pit_id = resp.get('pit_id', pit_id)
+            body['pit']['id'] = pit_id
+            body['search_after'] = hits[-1]['sort']
+    finally:
+        await client.close_point_in_time(body={'id': pit_id}, ignore=(404,))
+
+
+async def dump_ndjson(
+    client, fp, model=Individual, index=None, page_size=DEFAULT_PAGE_SIZE
+):
+    """Asynchronous ``gumby.dump_ndjson``"""
+    if index is None:
+        index = model._index._name
+    serializer = get_serializer()
+    count = 0
+    async for hit in iter_hits(client, index, page_size=page_size):
+        fp.write(serializer.dumps(hit['_source']))
+        fp.write('\n')
+        count += 1
+    return count
+
+
+async def _run_steps(client, steps):
+    # Asynchronous ``gumby.indices._run_steps``
+    resp, error = None, None
+    while True:
+        try:
+            step = steps.send(resp) if error is None else steps.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            if isinstance(step, _Sleep):
+                resp = await asyncio.sleep(step.seconds)
+            else:
+                resp = await _client_method(client, step.method)(**step.kwargs)
+            error = None
+        except BaseException as e:
+            resp, error = None, e
+
+
+async def _init_model(client, model, reindex):
+    # Runs the steps of ``gumby.init_model_index`` (and ``gumby.reindex_model``)
+    status = await _run_steps(client, _init_steps(model))
+    if reindex and status == IndexStatus.NEEDS_REINDEX:
+        await _run_steps(client, _reindex_steps(model))
+        status = IndexStatus.REINDEXED
+    return status
+
+
+async def initialize_indexes_by_model(
+    client, models=None, fail_gracefully=False, reindex=False
+):
+    """Asynchronous ``gumby.initialize_indexes_by_model``, initializing the models concurrently
+    with the same steps. Returns the ``IndexStatus`` of each model's index,
+    as ``{model: status}``.
+
+    """
+    if not models:
+        models = ALL_MODELS
+    results = await asyncio.gather(
+        *[_init_model(client, model, reindex) for model in models], return_exceptions=True
+    )
+    report = {}
+    for model, result in zip(models, results):
+        if not isinstance(result, Exception):
+            report[model] = result
+            continue
+        if fail_gracefully and isinstance(
+            result, elasticsearch.exceptions.ConnectionError
+        ):
+            warnings.warn(
+                f"connection error while initializing '{model!r}'",
+                RuntimeWarning,
+            )
+        else:
+            raise result
+    return report
@@ -0,0 +1,149 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from elasticsearch_dsl.connections import get_connection
+from elasticsearch_dsl.response import Response
+
+from .serializers import get_serializer
+
+__all__ = ('QueryCache', 'invalidate_index', 'refresh_index')
+
+#: Generation of each index, increased whenever gumby writes to that index
+_generations = {}
+#: Generation increased on every write, used by searches without a specific index
+_global_generation = 0
+_generations_lock = threading.Lock()
+
+
+def invalidate_index(*indices):
+    """Mark cached results for the ``indices`` as stale.
+    gumby calls this whenever it writes to or refreshes an index.
+
+    """
+    global _global_generation
+    with _generations_lock:
+        _global_generation += 1
+        for index in indices:
+            _generations[index] = _generations.get(index, 0) + 1
+
+
+def refresh_index(client, *indices):
+    """Refresh the ``indices``, making gumby's writes to them searchable,
+    and mark cached results for them as stale, as searches run before the refresh
+    were cached without those writes
+
+    """
+    client.indices.refresh(index=','.join(indices))
+    invalidate_index(*indices)
+
+
+def _generation(indices):
+    if not indices or any('*' in index or index == '_all' for index in indices):
+        return (_global_generation,)
+    return tuple(_generations.get(index, 0) for index in indices)
+
+
+class QueryCache:
+    """Client-side cache of ``Search.execute()`` responses.
+
+    Responses are keyed by a hash of the normalized request (index, body and parameters)
+    and the write generation of the searched indices, so any write gumby makes
+    to an index (see ``invalidate_index``) makes its cached results unreachable.
+    Entries are evicted least recently used first once there are more than ``max_entries``
+    or their estimated size exceeds ``max_bytes``, and expire after ``ttl`` seconds.
+
+    Writes made outside of this process are only picked up once entries expire.
+
+    """
+
+    def __init__(self, max_entries=1024, ttl=60.0, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._serializer = get_serializer()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'size': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hit_ratio,
+        }
+
+    def _key(self, search, using):
+        indices = tuple(sorted(search._index or ()))
+        request = {
+            'using': using if isinstance(using, str) else id(using),
+            'index': indices,
+            'body': search.to_dict(),
+            'params': search._params,
+        }
+        normalized = json.dumps(request, sort_keys=True, default=str)
+        digest = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        return digest, _generation(indices)
+
+    def execute(self, search, using=None):
+        """Execute the ``search``, or return a copy of its cached response.
+        The connection is ``using`` or that of the ``search``.
+
+        """
+        using = using if using is not None else search._using
+        key = self._key(search, using)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, size, raw = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return Response(search, copy.deepcopy(raw))
+                self._remove(key)
+            self.misses += 1
+
+        es = get_connection(using)
+        # Keyed by the alias of a ``PartitionedSearch``, which its writes invalidate
+        s = search.prune() if hasattr(search, 'prune') else search
+        raw = es.search(index=s._index, body=s.to_dict(), **s._params)
+        self._store(key, raw, now + self.ttl)
+        return Response(search, copy.deepcopy(raw))
+
+    def _store(self, key, raw, expires):
+        size = len(self._serializer.dumps(raw))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires, size, raw)
+            self.size += size
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        expires, size, raw = self._entries.pop(key)
+        self.size -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
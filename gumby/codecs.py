@@ -0,0 +1,235 @@
+import functools
+import uuid
+
+from elasticsearch_dsl import Object, ValidationException
+from elasticsearch_dsl.utils import AttrDict, AttrList, ObjectBase
+
+from .models import EnumField, UUIDField
+
+__all__ = ('ModelCodec', 'get_codec')
+
+#: Values left out of serialized documents, see ``ObjectBase.to_dict``
+_EMPTY = ([], {}, None)
+
+
+def _required(field, value):
+    if value in _EMPTY and field._required:
+        raise ValidationException('Value required for this field.')
+    return value
+
+
+class _FieldCodec:
+    """Conversions for a single field, specialized by field type at compile time
+
+    ``decode`` turns a value from ``_source`` into its python value,
+    ``encode`` turns a python (or raw) value into its ``_source`` value
+    and ``clean`` validates a value the same way ``Field.clean`` does.
+
+    """
+
+    #: Whether ``clean`` already returns the encoded value
+    clean_encodes = False
+
+    def __init__(self, field):
+        self.field = field
+        if isinstance(field, EnumField):
+            self._compile_enum(field)
+        elif isinstance(field, UUIDField):
+            self._compile_uuid(field)
+        elif isinstance(field, Object):
+            self._compile_object(field)
+        elif field._coerce:
+            self._decode, self._encode = field._deserialize, field._serialize
+            self.clean = field.clean
+        else:
+            self._decode = self._encode = None
+            self.clean = field.clean
+
+    def _compile_enum(self, field):
+        members = field._members
+        enum = field._enum
+
+        def decode(value):
+            if isinstance(value, enum):
+                return value
+            try:
+                return members[value]
+            except (KeyError, TypeError):
+                raise field._invalid(value) from None
+
+        def clean(value):
+            if value is None:
+                return _required(field, value)
+            self._map(decode, value)
+            # Like ``EnumField.clean``, the given value is kept as is
+            return value
+
+        self._decode, self._encode, self.clean = decode, str, clean
+
+    def _compile_uuid(self, field):
+        def decode(value):
+            if isinstance(value, uuid.UUID):
+                return value
+            return uuid.UUID(value)
+
+        def clean(value):
+            if value is None:
+                return _required(field, value)
+            return _required(field, self._map(decode, value))
+
+        self._decode, self._encode, self.clean = decode, str, clean
+
+    def _compile_object(self, field):
+        doc_class = field._doc_class
+
+        def decode(value):
+            if isinstance(value, doc_class):
+                return value
+            if isinstance(value, AttrDict):
+                value = value._d_
+            return get_codec(doc_class).from_source(value)
+
+        def encode(value):
+            return get_codec(doc_class).to_source(value, validate=False)
+
+        def clean(value):
+            if value is None:
+                return _required(field, value)
+            # Validated in their serialized form, which is all that's kept
+            return _required(
+                field,
+                self._map(lambda v: get_codec(doc_class).to_source(v), value),
+            )
+
+        self._decode, self._encode, self.clean = decode, encode, clean
+        self.clean_encodes = True
+
+    def _map(self, func, value):
+        if isinstance(value, (list, tuple, AttrList)):
+            return [func(v) for v in value]
+        return func(value)
+
+    def decode(self, value):
+        if value is None or self._decode is None:
+            return value
+        return self._map(self._decode, value)
+
+    def encode(self, value):
+        if value is None or self._encode is None:
+            return value
+        if isinstance(value, AttrList):
+            value = value._l_
+        return self._map(self._encode, value)
+
+
+class ModelCodec:
+    """Conversions between a model's documents and their elasticsearch form,
+    using per-field lookup tables that are compiled once per model class.
+
+    Use ``get_codec`` rather than creating instances directly.
+
+    """
+
+    def __init__(self, doc_class):
+        self.doc_class = doc_class
+        mapping = doc_class._doc_type.mapping
+        self.fields = {name: _FieldCodec(mapping[name]) for name in mapping}
+
+    def to_source(self, doc, validate=True):
+        """Serialize a document (or a dictionary of its properties) into its ``_source``.
+
+        Unless ``validate`` is false, the document is validated
+        with the same semantics as ``Document.full_clean``
+        (i.e. a ``ValidationException`` of errors by field name).
+        Pass ``validate=False`` for trusted data that has already been validated.
+
+        """
+        data = doc._d_ if isinstance(doc, ObjectBase) else doc
+        fields = self.fields
+        source, errors = {}, {}
+
+        if validate:
+            for name, codec in fields.items():
+                value = data.get(name)
+                try:
+                    value = codec.clean(value)
+                except ValidationException as e:
+                    errors.setdefault(name, []).append(e)
+                    continue
+                if not codec.clean_encodes:
+                    value = codec.encode(value)
+                if value not in _EMPTY:
+                    source[name] = value
+            if errors:
+                raise ValidationException(errors)
+
+        for name, value in data.items():
+            codec = fields.get(name)
+            if codec is not None:
+                if validate:
+                    continue
+                value = codec.encode(value)
+            elif isinstance(value, AttrList):
+                value = value._l_
+            if value not in _EMPTY:
+                source[name] = value
+        return source
+
+    def to_dicts(self, docs, validate=False):
+        """Serialize many documents, see ``to_source``"""
+        to_source = self.to_source
+        return [to_source(doc, validate=validate) for doc in docs]
+
+    def from_source(self, source, meta=None):
+        """Construct a document instance from its ``_source``"""
+        fields = self.fields
+        data = {}
+        for name, value in source.items():
+            codec = fields.get(name)
+            data[name] = value if codec is None else codec.decode(value)
+        doc = self.doc_class(meta=meta)
+        doc._d_.update(data)
+        return doc
+
+    def from_hit(self, hit):
+        """Construct a document instance from a search hit, like ``Document.from_es``"""
+        meta = hit.copy()
+        source = meta.pop('_source', {})
+        return self.from_source(source, meta=meta)
+
+    def from_hits(self, hits):
+        """Construct document instances from many search hits"""
+        from_hit = self.from_hit
+        return [from_hit(hit) for hit in hits]
+
+    def to_action(self, doc, index=None, op_type='index', validate=True):
+        """Translate a document (or a dictionary of its properties) into a bulk action,
+        without constructing a ``Document`` instance (see also ``to_bulk_action``).
+        The action's index defaults to the model's (or the document's partition),
+        and documents of routed models are given their routing.
+
+        """
+        source = self.to_source(doc, validate=validate)
+        if index is None:
+            partitioning = getattr(self.doc_class, '_partitioning', None)
+            if partitioning is None:
+                index = self.doc_class._index._name
+            else:
+                index = partitioning.index_for(source.get(partitioning.field))
+        action = {'_index': index, '_source': source}
+        shard_routing = getattr(self.doc_class, '_shard_routing', None)
+        if shard_routing is not None:
+            action['routing'] = shard_routing.routing_for(source)
+        if isinstance(doc, ObjectBase) and 'id' in doc.meta:
+            action['_id'] = doc.meta.id
+        elif source.get('id') is not None:
+            action['_id'] = str(source['id'])
+        if op_type != 'index':
+            action['_op_type'] = op_type
+        return action
+
+
+@functools.lru_cache(maxsize=None)
+def get_codec(doc_class):
+    """Get the (cached) ``ModelCodec`` for the ``doc_class``"""
+    return ModelCodec(doc_class)
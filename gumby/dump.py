@@ -0,0 +1,83 @@
+import gzip
+from pathlib import Path
+
+from .ingest import bulk_load
+from .models import Individual
+from .pagination import DEFAULT_PAGE_SIZE, iter_documents
+from .serializers import get_serializer
+
+__all__ = (
+    'dump_json',
+    'dump_ndjson',
+    'iter_ndjson',
+    'load_ndjson',
+    'open_dump',
+)
+
+
+def open_dump(path, mode='r', compress=None):
+    """Open a dump file as text.
+    The file is gzip (de)compressed when ``compress`` is true
+    or, when ``compress`` is not given, when the path ends with ``.gz``.
+
+    """
+    path = Path(path)
+    if compress is None:
+        compress = path.suffix == '.gz'
+    if compress:
+        return gzip.open(path, f'{mode}t', encoding='utf-8')
+    return path.open(mode, encoding='utf-8')
+
+
+def _iter_sources(client, model, index, page_size):
+    return iter_documents(model, using=client, index=index, page_size=page_size, raw=True)
+
+
+def dump_ndjson(client, fp, model=Individual, index=None, page_size=DEFAULT_PAGE_SIZE):
+    """Write every document in the ``model``'s index (or ``index``)
+    to the text file ``fp`` as newline delimited JSON, one document per line.
+    Documents are written as they are received, so memory use is bounded by ``page_size``.
+
+    Returns the number of documents written.
+
+    """
+    serializer = get_serializer()
+    count = 0
+    for source in _iter_sources(client, model, index, page_size):
+        fp.write(serializer.dumps(source))
+        fp.write('\n')
+        count += 1
+    return count
+
+
+def dump_json(client, fp, model=Individual, index=None, page_size=DEFAULT_PAGE_SIZE):
+    """Like ``dump_ndjson``, but written as a single JSON array
+    (the format read by ``iter_json_array``).
+
+    """
+    serializer = get_serializer()
+    count = 0
+    fp.write('[')
+    for source in _iter_sources(client, model, index, page_size):
+        if count:
+            fp.write(',\n')
+        fp.write(serializer.dumps(source))
+        count += 1
+    fp.write(']\n')
+    return count
+
+
+def iter_ndjson(fp):
+    """Lazily read documents from a newline delimited JSON text file"""
+    loads = get_serializer().loads
+    for line in fp:
+        if line.strip():
+            yield loads(line)
+
+
+def load_ndjson(client, fp, model=Individual, index=None, **kwargs):
+    """Stream a newline delimited JSON dump into the ``model``'s index (or ``index``).
+    Additional keyword arguments are given to ``bulk_load``.
+
+    """
+    return bulk_load(client, iter_ndjson(fp), model=model, index=index, **kwargs)
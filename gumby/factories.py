@@ -1,10 +1,15 @@
 import datetime
+import itertools
 import random
 import uuid
 
+from .ingest import bulk_load
 from .models import (
+    Encounter,
     Individual,
+    LivingStatus,
     Sex,
+    Sighting,
 )
 
 SEXES = [x for x in Sex] + [None]
@@ -84,16 +89,7 @@ def make_individual(**kwargs):
     #     An aggregate in the query would probably work to provide this bit of data.
     # Determine the last_sighting value
     encounters = kwargs.get('encounters', [])
-    try:
-        latest_encounter = sorted(
-            encounters, key=lambda x: x['date_occurred'], reverse=True
-        )[0]
-    except IndexError:
-        last_sighting = None
-    else:
-        last_sighting = latest_encounter['date_occurred']
-    finally:
-        props['last_sighting'] = last_sighting
+    props['last_sighting'] = max((x['date_occurred'] for x in encounters), default=None)
 
     return props | kwargs
 
@@ -118,9 +114,233 @@ def make_encounter(**kwargs):
     return props | kwargs
 
 
-def load_individuals_index_with_random_data(client):
+def load_individuals_index_with_random_data(client, count=50):
     """Load the individuals index with data"""
-    for i in range(0, 50):
-        encounters = [make_encounter() for i in range(0, random.randint(1, 20))]
-        indv = Individual(**make_individual(encounters=encounters))
-        indv.save(using=client)
+
+    def generate():
+        for i in range(0, count):
+            encounters = [make_encounter() for i in range(0, random.randint(1, 20))]
+            yield make_individual(encounters=encounters)
+
+    return bulk_load(client, generate(), model=Individual)
+
+
+# ############################################################################
+# Synthetic corpus generation
+# ############################################################################
+
+#: Fixed reference date so that generated corpora are reproducible
+CORPUS_EPOCH = datetime.datetime(2021, 1, 1)
+TIME_SPECIFICITIES = ['time', 'day', 'month', 'year']
+LIVING_STATUSES = [x for x in LivingStatus] + [None]
+
+
+def _zipf_weights(count, skew):
+    return [1 / (rank**skew) for rank in range(1, count + 1)]
+
+
+class CorpusGenerator:
+    """Seeded generator of reproducible individual, encounter and sighting documents.
+
+    Documents are generated in batches of ``batch_size``,
+    with each property sampled for the whole batch at once,
+    and are yielded lazily so they can be streamed straight into ``bulk_load``.
+    The same ``seed`` and settings always produce the same documents.
+
+    The shape of the corpus is controlled by:
+
+    - ``encounters_skew`` and ``max_encounters``:
+      the number of encounters per individual follows a Pareto distribution with
+      this shape (lower is more skewed), capped at ``max_encounters``
+    - ``taxonomy_weights``: mapping of scientific name to relative frequency,
+      defaults to a Zipf distribution (with ``taxonomy_skew``) over ``BINOMIAL_NOMENCLATURES``
+    - ``clusters`` and ``cluster_spread``: points are normally distributed
+      (with a standard deviation of ``cluster_spread`` degrees) around this many centers
+
+    """
+
+    def __init__(
+        self,
+        seed=0,
+        batch_size=1000,
+        encounters_skew=1.5,
+        max_encounters=1000,
+        taxonomy_weights=None,
+        taxonomy_skew=1.0,
+        clusters=20,
+        cluster_spread=2.0,
+    ):
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.encounters_skew = encounters_skew
+        self.max_encounters = max_encounters
+        if taxonomy_weights is None:
+            names = [
+                f'{genus} {species}'
+                for genus, species_list in BINOMIAL_NOMENCLATURES.items()
+                for species in species_list
+            ]
+            taxonomy_weights = dict(zip(names, _zipf_weights(len(names), taxonomy_skew)))
+        self.taxonomies = list(taxonomy_weights)
+        self.taxonomy_cum_weights = list(itertools.accumulate(taxonomy_weights.values()))
+        self.cluster_spread = cluster_spread
+        self.cluster_centers = [
+            (self.random.uniform(-60, 60), self.random.uniform(-180, 180))
+            for i in range(clusters)
+        ]
+
+    # Batched samplers, each returning a list of ``k`` values
+
+    def _choices(self, population, k, cum_weights=None):
+        return self.random.choices(population, cum_weights=cum_weights, k=k)
+
+    def _uuids(self, k):
+        getrandbits = self.random.getrandbits
+        return [uuid.UUID(int=getrandbits(128), version=4) for i in range(k)]
+
+    def _dates(self, k, max_days=TWO_YEARS):
+        seconds = max_days * 24 * 60 * 60
+        randrange = self.random.randrange
+        return [
+            CORPUS_EPOCH - datetime.timedelta(seconds=randrange(seconds))
+            for i in range(k)
+        ]
+
+    def _points(self, k):
+        gauss, spread = self.random.gauss, self.cluster_spread
+        points = []
+        for lat, lon in self._choices(self.cluster_centers, k):
+            lat = min(max(gauss(lat, spread), -90), 90)
+            lon = (gauss(lon, spread) + 180) % 360 - 180
+            points.append(f'{lat:.6f},{lon:.6f}')
+        return points
+
+    def _taxonomies(self, k):
+        return self._choices(self.taxonomies, k, cum_weights=self.taxonomy_cum_weights)
+
+    def _encounter_counts(self, k):
+        pareto, cap = self.random.paretovariate, self.max_encounters
+        return [min(int(pareto(self.encounters_skew)), cap) for i in range(k)]
+
+    def _batches(self, count):
+        while count > 0:
+            size = min(count, self.batch_size)
+            yield size
+            count -= size
+
+    def individuals(self, count):
+        """Generate ``count`` individual documents with nested encounters"""
+        for size in self._batches(count):
+            counts = self._encounter_counts(size)
+            total = sum(counts)
+            encounters = list(
+                zip(
+                    self._uuids(total),
+                    self._points(total),
+                    self._choices(SEXES, total),
+                    self._choices(SUBMITTERS, total),
+                    self._dates(total),
+                    self._taxonomies(total),
+                    self._choices([False, True, True], total),
+                )
+            )
+            columns = zip(
+                counts,
+                self._uuids(size),
+                self._choices(range(100000), size),
+                self._choices(ALIASES, size),
+                self._taxonomies(size),
+                self._choices(SEXES, size),
+            )
+            start = 0
+            for n, id, number, alias, taxonomy, sex in columns:
+                nested = [
+                    {
+                        'id': e[0],
+                        'point': e[1],
+                        'sex': e[2],
+                        'submitter_id': e[3],
+                        'date_occurred': e[4],
+                        'taxonomy': e[5],
+                        'has_annotation': e[6],
+                    }
+                    for e in encounters[start : start + n]
+                ]
+                start += n
+                yield {
+                    'id': id,
+                    'name': f'TI-{number:05}',
+                    'alias': alias,
+                    'taxonomy': taxonomy,
+                    'sex': sex,
+                    'last_sighting': max(
+                        (e['date_occurred'] for e in nested), default=None
+                    ),
+                    'encounters': nested,
+                }
+
+    def encounters(self, count):
+        """Generate ``count`` encounter documents"""
+        for size in self._batches(count):
+            columns = zip(
+                self._uuids(size),
+                self._points(size),
+                self._choices(range(100), size),
+                self._choices(SEXES, size),
+                self._taxonomies(size),
+                self._choices(LIVING_STATUSES, size),
+                self._dates(size),
+                self._choices(TIME_SPECIFICITIES, size),
+            )
+            for id, point, location, sex, taxonomy, status, date, specificity in columns:
+                yield {
+                    'id': id,
+                    'point': point,
+                    'locationid': f'location-{location:02}',
+                    'sex': sex,
+                    'taxonomy': taxonomy,
+                    'living_status': status,
+                    'datetime': date,
+                    'time_specificity': specificity,
+                }
+
+    def sightings(self, count):
+        """Generate ``count`` sighting documents"""
+        for size in self._batches(count):
+            columns = zip(
+                self._uuids(size),
+                self._points(size),
+                self._dates(size),
+                self._choices(TIME_SPECIFICITIES, size),
+                self._taxonomies(size),
+            )
+            for id, point, date, specificity, taxonomy in columns:
+                yield {
+                    'id': id,
+                    'point': point,
+                    'datetime': date,
+                    'time_specificity': specificity,
+                    'taxonomy': taxonomy,
+                }
+
+
+def load_corpus(client, individuals=0, encounters=0, sightings=0, seed=0, **kwargs):
+    """Stream a generated corpus (see ``CorpusGenerator``) into elasticsearch.
+    Additional keyword arguments are given to the ``CorpusGenerator``.
+    The indices of models with a count of zero are left untouched.
+
+    Returns the number of documents loaded by model.
+
+    """
+    generator = CorpusGenerator(seed=seed, **kwargs)
+    loaded = {}
+    for model, count, docs in (
+        (Individual, individuals, generator.individuals(individuals)),
+        (Encounter, encounters, generator.encounters(encounters)),
+        (Sighting, sightings, generator.sightings(sightings)),
+    ):
+        if not count:
+            continue
+        # Generated documents are valid by construction
+        loaded[model], _ = bulk_load(client, docs, model=model, trusted=True)
+    return loaded
@@ -0,0 +1,363 @@
+import heapq
+import itertools
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+
+from elasticsearch.exceptions import ConnectionError, TransportError
+from elasticsearch.helpers import expand_action
+
+from .cache import invalidate_index
+from .codecs import get_codec
+from .ingest import DEFAULT_CHUNK_SIZE, DEFAULT_MAX_CHUNK_BYTES
+from .models import ALL_MODELS
+from .serializers import bulk_body
+
+__all__ = ('BulkIndexer',)
+
+#: Statuses of items (or whole requests) that are retried,
+#: e.g. ``429`` when a busy cluster rejects writes
+RETRY_STATUSES = frozenset((429, 502, 503, 504))
+
+
+class _Item:
+    """A queued action, with its encoded ``_bulk`` lines"""
+
+    __slots__ = ('action', 'indices', 'data', 'attempts', 'error')
+
+    def __init__(self, action, indices, data):
+        self.action = action
+        self.indices = indices
+        self.data = data
+        self.attempts = 0
+        self.error = None
+
+
+class BulkIndexer:
+    """Long-lived, thread-safe writer of documents of any model through the ``_bulk`` API.
+
+    Documents (and actions) added from any number of threads are buffered
+    and sent in chunks, once ``chunk_size`` actions or ``max_chunk_bytes`` are buffered
+    or ``flush_interval`` seconds after the first was added, by up to ``concurrency``
+    requests at once. ``add`` blocks while the requests fall behind.
+
+    The chunk size and concurrency adapt to the cluster (additive increase,
+    multiplicative decrease): they grow while requests take less than ``target_latency``
+    seconds, the chunk size is halved when they take longer,
+    and both are halved when the cluster rejects writes (``429``).
+    Only the items that failed with a ``RETRY_STATUSES`` status are retried,
+    up to ``max_retries`` times after a randomized (jittered) exponential backoff.
+    Items that failed permanently are appended to the ``dead_letter_path``
+    newline delimited JSON file (or kept in ``dead_letters`` when no path is given).
+    Deletes of documents that don't exist are not failures.
+
+    """
+
+    def __init__(
+        self,
+        client,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        min_chunk_size=50,
+        max_chunk_size=5000,
+        max_chunk_bytes=DEFAULT_MAX_CHUNK_BYTES,
+        concurrency=2,
+        max_concurrency=8,
+        flush_interval=1.0,
+        target_latency=2.0,
+        max_retries=5,
+        backoff=0.5,
+        max_backoff=30.0,
+        dead_letter_path=None,
+        trusted=False,
+    ):
+        self.client = client
+        self.chunk_size = chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.max_chunk_bytes = max_chunk_bytes
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self.flush_interval = flush_interval
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.dead_letter_path = (
+            None if dead_letter_path is None else Path(dead_letter_path)
+        )
+        self.trusted = trusted
+        self.dead_letters = []
+        self.stats = {
+            'indexed': 0,
+            'retried': 0,
+            'failed': 0,
+            'rejected': 0,
+            'requests': 0,
+        }
+
+        self._serializer = client.transport.serializer
+        self._cond = threading.Condition()
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._buffer_started = None
+        #: Heap of items waiting to be retried, as ``(ready, seq, items)``
+        self._retries = []
+        self._seq = itertools.count()
+        #: Items added and not yet indexed or given up on
+        self._unfinished = 0
+        self._active = 0
+        self._flushing = False
+        self._closed = False
+        self._dead_letter_lock = threading.Lock()
+        # Bounded, so that adding blocks while every worker is busy
+        self._chunks = queue.Queue(maxsize=max_concurrency)
+        self._workers = [
+            threading.Thread(target=self._work, name=f'gumby-bulk-{i}', daemon=True)
+            for i in range(max_concurrency)
+        ]
+        self._ticker = threading.Thread(target=self._tick, name='gumby-bulk', daemon=True)
+        for thread in self._workers + [self._ticker]:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, doc, model=None, index=None, op_type='index'):
+        """Queue a document (or a dictionary of its properties) of the ``model``
+        (defaults to the document's class) to be written to its index (or ``index``)
+
+        """
+        if model is None:
+            model = type(doc)
+        if model not in ALL_MODELS:
+            raise ValueError(f'{model!r} is not a gumby model')
+        codec = get_codec(model)
+        action = codec.to_action(
+            doc, index=index, op_type=op_type, validate=not self.trusted
+        )
+        meta, source = expand_action(action)
+        # Writes to a partition also make searches of the model's alias stale
+        self._add(action, meta, source, {action['_index'], model._index._name})
+
+    def add_action(self, action):
+        """Queue a bulk ``action``, given like those of ``elasticsearch.helpers.bulk``
+        (e.g. an update or a delete)
+
+        """
+        meta, source = expand_action(action)
+        index = next(iter(meta.values())).get('_index')
+        self._add(action, meta, source, {index} if index else set())
+
+    def _add(self, action, meta, source, indices):
+        lines = [meta] if source is None else [meta, source]
+        item = _Item(action, indices, bulk_body(self._serializer, lines))
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('cannot add actions to a closed BulkIndexer')
+            self._unfinished += 1
+            if not self._buffer:
+                self._buffer_started = time.monotonic()
+                self._cond.notify_all()
+            self._buffer.append(item)
+            self._buffer_bytes += len(item.data)
+            chunk = None
+            if (
+                len(self._buffer) >= self.chunk_size
+                or self._buffer_bytes >= self.max_chunk_bytes
+            ):
+                chunk = self._cut()
+        if chunk:
+            self._chunks.put(chunk)
+
+    def flush(self):
+        """Send everything buffered, and wait until it's written (or given up on)"""
+        with self._cond:
+            self._flushing = True
+            self._cond.notify_all()
+            while self._unfinished:
+                self._cond.wait()
+            self._flushing = False
+
+    def close(self):
+        """Flush and stop the indexer's threads, returning the ``stats``"""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            self._chunks.put(None)
+        for thread in self._workers + [self._ticker]:
+            thread.join()
+        return self.stats
+
+    def _cut(self):
+        # Take the next chunk from the buffer, with the lock held
+        chunk, size = [], 0
+        for item in self._buffer:
+            if chunk and (
+                len(chunk) >= self.chunk_size
+                or size + len(item.data) > self.max_chunk_bytes
+            ):
+                break
+            chunk.append(item)
+            size += len(item.data)
+        del self._buffer[: len(chunk)]
+        self._buffer_bytes -= size
+        self._buffer_started = time.monotonic() if self._buffer else None
+        return chunk
+
+    def _due_chunks(self, now):
+        # Chunks to send now, with the lock held
+        while self._retries and self._retries[0][0] <= now:
+            ready, seq, items = heapq.heappop(self._retries)
+            # Retried items go first
+            self._buffer[:0] = items
+            self._buffer_bytes += sum(len(item.data) for item in items)
+            self._buffer_started = self._buffer_started or now
+        chunks = []
+        if self._buffer and (
+            self._flushing or now - self._buffer_started >= self.flush_interval
+        ):
+            while self._buffer:
+                chunks.append(self._cut())
+        return chunks
+
+    def _next_wakeup(self, now):
+        wakeup = now + self.flush_interval
+        if self._buffer:
+            wakeup = min(wakeup, self._buffer_started + self.flush_interval)
+        if self._retries:
+            wakeup = min(wakeup, self._retries[0][0])
+        return max(wakeup - now, 0.001)
+
+    def _tick(self):
+        # Sends buffered items once they're due, and items ready to be retried
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                chunks = self._due_chunks(now)
+                if not chunks:
+                    self._cond.wait(self._next_wakeup(now))
+                    continue
+            for chunk in chunks:
+                self._chunks.put(chunk)
+
+    def _work(self):
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                return
+            with self._cond:
+                while self._active >= self.concurrency:
+                    self._cond.wait()
+                self._active += 1
+            try:
+                self._send(chunk)
+            finally:
+                with self._cond:
+                    self._active -= 1
+                    self._cond.notify_all()
+
+    def _send(self, chunk):
+        start = time.monotonic()
+        try:
+            resp = self.client.bulk(body=b''.join(item.data for item in chunk))
+        except TransportError as e:
+            # ``ConnectionError``s (e.g. timeouts) have no status
+            error = {'status': e.status_code, 'error': e.error}
+            retry = isinstance(e, ConnectionError) or e.status_code in RETRY_STATUSES
+            self._fail(
+                chunk, error, retry, time.monotonic() - start, e.status_code == 429
+            )
+            return
+        except Exception as e:
+            # The chunk must still be accounted for, or flushing would never finish
+            error = {'status': None, 'error': repr(e)}
+            self._fail(chunk, error, False, time.monotonic() - start, False)
+            return
+
+        latency = time.monotonic() - start
+        indexed, retry, failed, rejected = 0, [], [], False
+        for item, result in zip(chunk, resp['items']):
+            ((op_type, info),) = result.items()
+            status = info.get('status', 500)
+            if status < 300 or (op_type == 'delete' and status == 404):
+                indexed += 1
+                continue
+            item.error = info
+            if status in RETRY_STATUSES:
+                retry.append(item)
+                rejected = rejected or status == 429
+            else:
+                failed.append(item)
+        self._done(chunk, indexed, retry, failed, latency, rejected)
+
+    def _fail(self, chunk, error, retry, latency, rejected):
+        # The whole request failed
+        for item in chunk:
+            item.error = error
+        if retry:
+            self._done(chunk, 0, chunk, [], latency, rejected)
+        else:
+            self._done(chunk, 0, [], chunk, latency, rejected)
+
+    def _done(self, chunk, indexed, retry, failed, latency, rejected):
+        invalidate_index(*set().union(*(item.indices for item in chunk)))
+        for item in retry:
+            item.attempts += 1
+        failed = failed + [item for item in retry if item.attempts > self.max_retries]
+        retry = [item for item in retry if item.attempts <= self.max_retries]
+        self._dead_letter(failed)
+
+        with self._cond:
+            self._adjust(latency, rejected)
+            self.stats['requests'] += 1
+            self.stats['indexed'] += indexed
+            self.stats['retried'] += len(retry)
+            self.stats['failed'] += len(failed)
+            self.stats['rejected'] += rejected
+            if retry:
+                # Exponential backoff with "full jitter"
+                attempts = max(item.attempts for item in retry)
+                delay = random.uniform(
+                    0, min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+                )
+                ready = time.monotonic() + delay
+                heapq.heappush(self._retries, (ready, next(self._seq), retry))
+            self._unfinished -= len(chunk) - len(retry)
+            self._cond.notify_all()
+
+    def _adjust(self, latency, rejected):
+        # Additive increase, multiplicative decrease, with the lock held
+        if rejected:
+            self.chunk_size = max(self.min_chunk_size, self.chunk_size // 2)
+            self.concurrency = max(1, self.concurrency // 2)
+        elif latency > self.target_latency:
+            self.chunk_size = max(self.min_chunk_size, self.chunk_size // 2)
+        elif self.chunk_size < self.max_chunk_size:
+            self.chunk_size = min(
+                self.max_chunk_size, self.chunk_size + self.min_chunk_size
+            )
+        else:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+
+    def _dead_letter(self, failed):
+        if not failed:
+            return
+        records = [{'action': item.action, 'error': item.error} for item in failed]
+        if self.dead_letter_path is None:
+            with self._dead_letter_lock:
+                self.dead_letters.extend(records)
+            return
+        body = bulk_body(self._serializer, records)
+        with self._dead_letter_lock:
+            self.dead_letter_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.dead_letter_path.open('ab') as fp:
+                fp.write(body)
@@ -0,0 +1,425 @@
+import enum
+import functools
+import hashlib
+import json
+import re
+import time
+from collections import namedtuple
+
+from elasticsearch_dsl.connections import get_connection
+
+from .cache import invalidate_index
+from .pipelines import _model_pipelines, _pipelines
+
+__all__ = (
+    'IndexStatus',
+    'drop_model_index',
+    'get_current_index',
+    'index_meta',
+    'init_model_index',
+    'reindex_model',
+    'wait_for_task',
+)
+
+#: Settings applied to an index while it is being bulk loaded,
+#: and reset to the model's settings (or the defaults) afterwards
+BULK_LOAD_SETTINGS = {
+    'index.refresh_interval': '-1',
+    'index.number_of_replicas': 0,
+    'index.translog.durability': 'async',
+}
+
+
+#: A request to make with a client, as the dotted name of the client's ``method``
+#: (e.g. ``indices.create``) and its ``kwargs``. Initializing and reindexing
+#: are generators of these steps (sent the response of each), so the same steps
+#: run with a synchronous client (see ``_run_steps``) and in ``gumby.aio``.
+_Call = namedtuple('_Call', ('method', 'kwargs'))
+#: A pause of some ``seconds`` between steps (e.g. to poll a task)
+_Sleep = namedtuple('_Sleep', ('seconds',))
+
+
+def _client_method(client, name):
+    return functools.reduce(getattr, name.split('.'), client)
+
+
+def _run_steps(es, steps):
+    """Make the calls of the ``steps`` generator with the client ``es``,
+    returning the generator's value. Errors are raised within the generator.
+
+    """
+    resp, error = None, None
+    while True:
+        try:
+            step = steps.send(resp) if error is None else steps.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            if isinstance(step, _Sleep):
+                resp = time.sleep(step.seconds)
+            else:
+                resp = _client_method(es, step.method)(**step.kwargs)
+            error = None
+        except BaseException as e:
+            resp, error = None, e
+
+
+class IndexStatus(str, enum.Enum):
+    """Outcome of initializing a model's index"""
+
+    CREATED = 'created'
+    UNCHANGED = 'unchanged'
+    #: New fields were added to the mapping in place
+    UPDATED = 'updated'
+    #: Existing fields or the settings changed, see ``reindex_model``
+    NEEDS_REINDEX = 'needs-reindex'
+    REINDEXED = 'reindexed'
+
+
+def _hash(obj):
+    normalized = json.dumps(obj, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def index_meta(model):
+    """Stable hashes of the ``model``'s mapping and settings,
+    stored in the ``_meta`` of its index to detect changes to the model
+
+    """
+    body = model._index.to_dict()
+    return {
+        'hash': _hash(body),
+        'settings_hash': _hash(body.get('settings', {})),
+    }
+
+
+def _diff_properties(live, desired, path=''):
+    """Paths of the fields in ``desired`` that are added to,
+    or changed from, the ``live`` mapping properties
+
+    """
+    added, changed = [], []
+    for name, field in desired.items():
+        field_path = f'{path}{name}'
+        if name not in live:
+            added.append(field_path)
+            continue
+        live_field = live[name]
+        if 'properties' in field or 'properties' in live_field:
+            # ``object`` is implied for fields with properties
+            params = {k: v for k, v in field.items() if k not in ('properties', 'type')}
+            live_params = {
+                k: v for k, v in live_field.items() if k not in ('properties', 'type')
+            }
+            if (
+                field.get('type', 'object') != live_field.get('type', 'object')
+                or params != live_params
+            ):
+                changed.append(field_path)
+                continue
+            sub_added, sub_changed = _diff_properties(
+                live_field.get('properties', {}),
+                field.get('properties', {}),
+                f'{field_path}.',
+            )
+            added.extend(sub_added)
+            changed.extend(sub_changed)
+        elif field != live_field:
+            changed.append(field_path)
+    return added, changed
+
+
+def mapping_status(model, live_mappings):
+    """Compare the ``model`` to the ``live_mappings`` of its index,
+    returning the ``IndexStatus`` of the index once updated in place where possible
+
+    """
+    desired = index_meta(model)
+    meta = live_mappings.get('_meta', {}).get('gumby', {})
+    if meta == desired:
+        return IndexStatus.UNCHANGED
+    # Indexes created before their settings were hashed are assumed to be up to date
+    if meta and meta.get('settings_hash') != desired['settings_hash']:
+        return IndexStatus.NEEDS_REINDEX
+    mappings = model._index.to_dict().get('mappings', {})
+    if live_mappings.get('_routing', {}) != mappings.get('_routing', {}):
+        # Documents have to be moved to the shards of their routing
+        return IndexStatus.NEEDS_REINDEX
+    added, changed = _diff_properties(
+        live_mappings.get('properties', {}),
+        mappings.get('properties', {}),
+    )
+    if changed:
+        return IndexStatus.NEEDS_REINDEX
+    return IndexStatus.UPDATED
+
+
+def versioned_name(alias, version):
+    """Name of the physical index for ``version`` of the ``alias``"""
+    return f'{alias}-v{version}'
+
+
+def _current_index_steps(alias):
+    resp = yield _Call('indices.get_alias', {'name': alias, 'ignore': 404})
+    indices = [name for name in resp if name not in ('error', 'status')]
+    if len(indices) > 1:
+        raise RuntimeError(f"alias '{alias}' points to more than one index: {indices!r}")
+    return indices[0] if indices else None
+
+
+def get_current_index(es, alias):
+    """Name of the physical index behind the ``alias``, or None"""
+    return _run_steps(es, _current_index_steps(alias))
+
+
+def _next_version(alias, existing):
+    """Version following those of the ``existing`` index names"""
+    pattern = re.compile(rf'^{re.escape(alias)}-v(\d+)$')
+    versions = [int(m.group(1)) for m in map(pattern.match, existing) if m]
+    return max(versions, default=0) + 1
+
+
+def _next_name_steps(alias):
+    existing = yield _Call('indices.get', {'index': f'{alias}-v*', 'ignore': 404})
+    return versioned_name(alias, _next_version(alias, existing))
+
+
+def _put_pipelines_steps(model):
+    # Steps of ``gumby.pipelines.put_pipelines``
+    for pipeline_id in _model_pipelines(model):
+        yield _Call(
+            'ingest.put_pipeline', {'id': pipeline_id, 'body': _pipelines[pipeline_id]}
+        )
+
+
+def _index_body(model, extra_settings=None):
+    body = model._index.to_dict()
+    body.setdefault('mappings', {})['_meta'] = {'gumby': index_meta(model)}
+    if extra_settings:
+        body['settings'] = {**body.get('settings', {}), **extra_settings}
+    return body
+
+
+def _model_setting(model, name):
+    settings = model._index._settings
+    short_name = name[len('index.') :]
+    return settings.get(name, settings.get(short_name))
+
+
+def _wait_for_task_steps(task_id, poll_interval=5, progress=None):
+    while True:
+        resp = yield _Call('tasks.get', {'task_id': task_id})
+        if progress is not None:
+            progress(resp['task'].get('status', {}))
+        if resp.get('completed'):
+            break
+        yield _Sleep(poll_interval)
+    if resp.get('error'):
+        raise RuntimeError(f"task '{task_id}' failed: {resp['error']!r}")
+    failures = resp.get('response', {}).get('failures')
+    if failures:
+        raise RuntimeError(f"task '{task_id}' had failures: {failures!r}")
+    return resp
+
+
+def wait_for_task(es, task_id, poll_interval=5, progress=None):
+    """Block until the task has completed and return its response,
+    calling ``progress`` with the task's status at each ``poll_interval`` (seconds).
+
+    """
+    return _run_steps(es, _wait_for_task_steps(task_id, poll_interval, progress))
+
+
+def _init_steps(model):
+    # Steps of ``init_model_index``
+    partitioning = getattr(model, '_partitioning', None)
+    if partitioning is not None:
+        return (yield from partitioning._init_steps())
+    alias = model._index._name
+    current = yield from _current_index_steps(alias)
+    if current is not None:
+        resp = yield _Call('indices.get_mapping', {'index': current})
+        status = mapping_status(model, resp[current]['mappings'])
+        if status == IndexStatus.UPDATED:
+            yield _Call(
+                'indices.put_mapping',
+                {'index': alias, 'body': _index_body(model)['mappings']},
+            )
+        return status
+    if (yield _Call('indices.exists', {'index': alias})):
+        yield from _reindex_steps(model)
+        return IndexStatus.REINDEXED
+
+    name = yield from _next_name_steps(alias)
+    yield from _put_pipelines_steps(model)
+    yield _Call(
+        'indices.create',
+        {'index': name, 'body': {**_index_body(model), 'aliases': {alias: {}}}},
+    )
+    return IndexStatus.CREATED
+
+
+def init_model_index(model, using=None):
+    """Initialize the ``model``'s index behind a versioned alias.
+
+    If the alias doesn't exist yet, the first version of the index is created behind it.
+    If it exists, the mapping is left alone unless the model changed (see ``index_meta``),
+    in which case new fields are added in place.
+    Changes to existing fields or the settings require a ``reindex_model``.
+    A legacy index named like the alias is migrated with ``reindex_model``.
+
+    Time partitioned models (see ``gumby.partition_model``) have their index template
+    and current partition initialized instead.
+
+    Returns the ``IndexStatus`` of the index.
+
+    """
+    es = get_connection(using or model._index._using)
+    return _run_steps(es, _init_steps(model))
+
+
+def _block_writes(index, blocked):
+    # ``None`` resets the block to the default (unblocked)
+    return _Call(
+        'indices.put_settings',
+        {'index': index, 'body': {'index.blocks.write': blocked or None}},
+    )
+
+
+def _reindex_steps(
+    model,
+    load=None,
+    slices='auto',
+    requests_per_second=None,
+    delete_old=True,
+    poll_interval=5,
+    progress=None,
+):
+    # Steps of ``reindex_model``
+    if getattr(model, '_partitioning', None) is not None:
+        raise ValueError(f'{model.__name__} is time partitioned and cannot be reindexed')
+    alias = model._index._name
+    current = yield from _current_index_steps(alias)
+    legacy = current is None and (yield _Call('indices.exists', {'index': alias}))
+    if legacy:
+        current = alias
+
+    name = yield from _next_name_steps(alias)
+    yield from _put_pipelines_steps(model)
+    yield _Call(
+        'indices.create', {'index': name, 'body': _index_body(model, BULK_LOAD_SETTINGS)}
+    )
+    if current is not None:
+        # Writes to the current index wouldn't be copied, and would be lost with it
+        yield _block_writes(current, True)
+
+    try:
+        if load is not None:
+            load(name)
+        elif current is not None:
+            params = {'slices': slices, 'wait_for_completion': False}
+            if requests_per_second is not None:
+                params['requests_per_second'] = requests_per_second
+            body = {'source': {'index': current}, 'dest': {'index': name}}
+            shard_routing = getattr(model, '_shard_routing', None)
+            if shard_routing is not None:
+                # Route the documents by their field (or id), see ``gumby.route_model``
+                body['script'] = {
+                    'source': (
+                        'def value = ctx._source[params.field];'
+                        ' ctx._routing = value == null ? ctx._id : value.toString()'
+                    ),
+                    'params': {'field': shard_routing.field},
+                }
+            resp = yield _Call('reindex', {'body': body, **params})
+            yield from _wait_for_task_steps(resp['task'], poll_interval, progress)
+
+        # Restore the model's own settings (or reset to the defaults)
+        yield _Call(
+            'indices.put_settings',
+            {
+                'index': name,
+                'body': {k: _model_setting(model, k) for k in BULK_LOAD_SETTINGS},
+            },
+        )
+        yield _Call('indices.refresh', {'index': name})
+        yield _Call('cluster.health', {'index': name, 'wait_for_status': 'yellow'})
+
+        if legacy:
+            actions = [{'remove_index': {'index': alias}}]
+        elif current is not None:
+            actions = [{'remove': {'index': current, 'alias': alias}}]
+        else:
+            actions = []
+        actions.append({'add': {'index': name, 'alias': alias}})
+        yield _Call('indices.update_aliases', {'body': {'actions': actions}})
+    except BaseException:
+        yield _Call('indices.delete', {'index': name, 'ignore': 404})
+        if current is not None:
+            yield _block_writes(current, False)
+        raise
+    invalidate_index(alias)
+
+    if delete_old and current is not None and not legacy:
+        yield _Call('indices.delete', {'index': current})
+    elif current is not None and not legacy:
+        yield _block_writes(current, False)
+    return name
+
+
+def reindex_model(
+    model,
+    using=None,
+    load=None,
+    slices='auto',
+    requests_per_second=None,
+    delete_old=True,
+    poll_interval=5,
+    progress=None,
+):
+    """Rebuild the ``model``'s index as a new version and atomically swap its alias over.
+
+    The new index is created with the model's current mapping and bulk loading settings
+    (no refresh, no replicas and asynchronous translog),
+    which are reset to the model's settings before the alias swap.
+    It's populated by calling ``load`` with its name (e.g. to load from source)
+    or, by default, with a server-side ``_reindex`` (with ``slices``) of the current index.
+    Searches continue to be served by the current index until the swap,
+    but writes to it are rejected (with a ``cluster_block_exception``) from the start
+    of the reindex, as they wouldn't be copied to the new index.
+    The old index is deleted afterwards when ``delete_old`` is true
+    (or writable again otherwise, as it is when the reindex fails).
+
+    Returns the name of the new physical index.
+
+    """
+    es = get_connection(using or model._index._using)
+    steps = _reindex_steps(
+        model,
+        load=load,
+        slices=slices,
+        requests_per_second=requests_per_second,
+        delete_old=delete_old,
+        poll_interval=poll_interval,
+        progress=progress,
+    )
+    return _run_steps(es, steps)
+
+
+def drop_model_index(model, using=None):
+    """Delete the ``model``'s alias and the physical index behind it
+    (or all of its partitions)
+
+    """
+    es = get_connection(using or model._index._using)
+    partitioning = getattr(model, '_partitioning', None)
+    if partitioning is not None:
+        return partitioning.drop(es)
+    alias = model._index._name
+    current = get_current_index(es, alias)
+    if current is None and es.indices.exists(index=alias):
+        # legacy index
+        current = alias
+    if current is not None:
+        es.indices.delete(index=current)
+    invalidate_index(alias)
@@ -0,0 +1,166 @@
+import json
+
+from elasticsearch.helpers import streaming_bulk
+
+from .cache import invalidate_index, refresh_index
+from .codecs import get_codec
+from .models import Individual
+
+__all__ = (
+    'bulk_load',
+    'iter_bulk_actions',
+    'iter_json_array',
+    'to_bulk_action',
+)
+
+#: Number of documents sent in each ``_bulk`` request
+DEFAULT_CHUNK_SIZE = 500
+#: Upper bound on the size of a single ``_bulk`` request body
+DEFAULT_MAX_CHUNK_BYTES = 10 * 1024 * 1024
+#: Number of characters read from a file at a time
+DEFAULT_READ_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_json_array(fp, read_size=DEFAULT_READ_SIZE):
+    """Incrementally parse a JSON array from the file-like object ``fp``,
+    yielding each item as soon as it has been decoded.
+
+    Only the item currently being decoded is held in memory,
+    so this is suitable for files much larger than the available memory.
+
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    # One of: '[' (before the array), 'first' (before the first item),
+    # 'value' (after a comma) or ',' (after an item)
+    expecting = '['
+
+    def fill(buf, pos):
+        # Drop what has been consumed and read at least as much as
+        # is currently buffered, which keeps re-decoding large items linear.
+        buf = buf[pos:]
+        chunk = fp.read(max(read_size, len(buf)))
+        return buf + chunk, 0, not chunk
+
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                raise ValueError('unexpected end of JSON array')
+            buf, pos, eof = fill(buf, pos)
+            continue
+
+        char = buf[pos]
+        if expecting == '[':
+            if char != '[':
+                raise ValueError(
+                    f"expected '[' at the start of a JSON array, got {char!r}"
+                )
+            pos += 1
+            expecting = 'first'
+        elif expecting == ',' and char == ',':
+            pos += 1
+            expecting = 'value'
+        elif char == ']' and expecting != 'value':
+            return
+        elif expecting == ',':
+            raise ValueError(f"expected ',' or ']' in JSON array, got {char!r}")
+        else:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                buf, pos, eof = fill(buf, pos)
+                continue
+            if end == len(buf) and not eof:
+                # A scalar may have been cut short by the read boundary
+                buf, pos, eof = fill(buf, pos)
+                continue
+            pos = end
+            expecting = ','
+            yield item
+
+
+def to_bulk_action(doc, index=None, op_type='index', validate=True):
+    """Translate a ``Document`` instance into a bulk action.
+    The document's ``id`` is used as the elasticsearch ``_id``
+    (unless one is already set in the document's meta),
+    which makes repeated loads of the same data idempotent.
+
+    """
+    if validate:
+        doc.full_clean()
+    action = doc.to_dict(include_meta=True)
+    if index is not None:
+        action['_index'] = index
+    if '_id' not in action and getattr(doc, 'id', None) is not None:
+        action['_id'] = str(doc.id)
+    if op_type != 'index':
+        action['_op_type'] = op_type
+    return action
+
+
+def iter_bulk_actions(docs, model=Individual, index=None, trusted=False):
+    """Lazily translate ``docs`` into bulk actions.
+    Items in ``docs`` may be ``model`` instances or dictionaries of its properties.
+    Validation is skipped for ``trusted`` documents (i.e. those that were already validated).
+
+    """
+    codec = get_codec(model)
+    validate = not trusted
+    for doc in docs:
+        yield codec.to_action(doc, index=index, validate=validate)
+
+
+def bulk_load(
+    client,
+    docs,
+    model=Individual,
+    index=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    max_chunk_bytes=DEFAULT_MAX_CHUNK_BYTES,
+    refresh=True,
+    trusted=False,
+    raise_on_error=True,
+):
+    """Stream ``docs`` into the ``model``'s index (or ``index``) using the ``_bulk`` API.
+
+    Documents are consumed lazily and sent in requests
+    bounded by ``chunk_size`` documents and ``max_chunk_bytes`` bytes.
+    The index is refreshed once, after all documents have been sent, when ``refresh`` is true.
+    Pass ``trusted`` to skip validating documents that have already been validated.
+
+    Returns a tuple of the number of successfully indexed documents
+    and a list of errors (only populated when ``raise_on_error`` is false).
+
+    """
+    # Without an ``index``, each document goes to the model's index (or its partition)
+    actions = iter_bulk_actions(docs, model=model, index=index, trusted=trusted)
+
+    success, errors = 0, []
+    for ok, info in streaming_bulk(
+        client,
+        actions,
+        chunk_size=chunk_size,
+        max_chunk_bytes=max_chunk_bytes,
+        raise_on_error=raise_on_error,
+    ):
+        if ok:
+            success += 1
+        else:
+            errors.append(info)
+
+    if index is None:
+        index = model._index._name
+    if refresh:
+        # Refresh to ensure all shards are up-to-date and ready for requests
+        refresh_index(client, index)
+    else:
+        invalidate_index(index)
+    return success, errors
@@ -1,14 +1,26 @@
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 
 import elasticsearch.exceptions
 
+from .indices import IndexStatus, reindex_model
 from .models import ALL_MODELS
 
 
 __all__ = ('initialize_indexes_by_model',)
 
 
-def initialize_indexes_by_model(models=None, using='default', fail_gracefully=False):
+def _init_model(model, using, reindex):
+    status = model.init(using=using)
+    if reindex and status == IndexStatus.NEEDS_REINDEX:
+        reindex_model(model, using=using)
+        status = IndexStatus.REINDEXED
+    return status
+
+
+def initialize_indexes_by_model(
+    models=None, using='default', fail_gracefully=False, reindex=False
+):
     """Initialize models. If a list of ``models`` is supplied,
     then only those models will be initialized. Otherwise all known models will be initialized.
 
@@ -16,17 +28,33 @@ def initialize_indexes_by_model(models=None, using='default', fail_gracefully=Fa
     the connection name or instance supplied will be used to initialize the models.
     If ``fail_gracefully`` is true, this function will not raise an error on connection problems, but it instead will supply a ``RuntimeWarning``.
 
+    Each model's index lives behind an alias named like the model's index.
+    The models are checked concurrently. Missing indexes are created,
+    unchanged ones are skipped and new fields are added to existing ones in place.
+    Models with changes to existing fields or settings are reported as needing a reindex,
+    unless ``reindex`` is true, in which case they are rebuilt with the current mapping
+    and swapped in without downtime (see ``gumby.indices.reindex_model``).
+
+    Returns the ``IndexStatus`` of each model's index, as ``{model: status}``.
+
     """
     if not models:
         models = ALL_MODELS
-    for model in models:
-        try:
-            model.init(using=using)
-        except elasticsearch.exceptions.ConnectionError:
-            if fail_gracefully:
-                warnings.warn(
-                    f"connection error while initializing '{model!r}'",
-                    RuntimeWarning,
-                )
-            else:
-                raise
+    report = {}
+    with ThreadPoolExecutor(max_workers=len(models)) as executor:
+        futures = [
+            (model, executor.submit(_init_model, model, using, reindex))
+            for model in models
+        ]
+        for model, future in futures:
+            try:
+                report[model] = future.result()
+            except elasticsearch.exceptions.ConnectionError:
+                if fail_gracefully:
+                    warnings.warn(
+                        f"connection error while initializing '{model!r}'",
+                        RuntimeWarning,
+                    )
+                else:
+                    raise
+    return report
@@ -1,73 +1,139 @@
-import importlib.util
-import json
+import sys
 from pathlib import Path
 
-from elasticsearch.serializer import JSONSerializer
 from invoke import task
 
 from gumby import (
-    Client,
+    ALL_MODELS,
+    bulk_load,
+    drop_model_index,
+    dump_json,
+    dump_ndjson,
+    get_client,
+    get_model,
+    initialize_indexes_by_model,
+    iter_json_array,
+    load_ndjson,
+    load_corpus,
+    open_dump,
     load_individuals_index_with_random_data,
+    sync_changes,
     Individual,
+    NDJSONChangeSource,
+)
+from gumby.ingest import DEFAULT_CHUNK_SIZE
+from gumby.migrations import (  # noqa: F401
+    _import_migration,
+    _import_migration_func,
+    migrate_index,
 )
 
 
 @task
-def init(c):
-    """Initialize the elasticsearch instance"""
-    client = Client()
+def init(c, reindex=False):
+    """Initialize the elasticsearch instance.
+    Use ``reindex`` to rebuild the indexes whose mappings changed incompatibly
+    and swap them in without downtime.
 
-    if Individual._index.exists(using=client):
-        # XXX Just to ensure a clean slate each run =)
-        Individual._index.delete(using=client)
-    Individual.init(using=client)
+    """
+    client = get_client()
+    report = initialize_indexes_by_model(using=client, reindex=reindex)
+    for model, status in report.items():
+        print(f'{model.__name__}: {status.value}')
 
 
 @task
 def drop(c):
     """Drop the elasticsearch instance"""
-    client = Client()
+    client = get_client()
 
-    if Individual._index.exists(using=client):
-        Individual._index.delete(using=client)
+    for model in ALL_MODELS:
+        drop_model_index(model, using=client)
 
 
 @task
-def load_random_data(c):
+def load_random_data(c, count=50):
     """Loads random data into elasticsearch"""
-    client = Client()
-    load_individuals_index_with_random_data(client)
+    client = get_client()
+    load_individuals_index_with_random_data(client, count=count)
+
+
+@task
+def load_corpus_data(c, individuals=0, encounters=0, sightings=0, seed=0):
+    """Loads a reproducible, generated corpus of the given size into elasticsearch"""
+    client = get_client()
+    loaded = load_corpus(
+        client,
+        individuals=individuals,
+        encounters=encounters,
+        sightings=sightings,
+        seed=seed,
+    )
+    for model, count in loaded.items():
+        print(f'Loaded {count} {model.__name__} documents')
 
 
 @task
-def load_from_json(c, file):
-    client = Client()
+def load_from_json(c, file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream a JSON array of individuals into elasticsearch using the bulk API"""
+    client = get_client()
 
     with Path(file).open('r') as fb:
-        data = json.load(fb)
+        success, _ = bulk_load(
+            client, iter_json_array(fb), model=Individual, chunk_size=chunk_size
+        )
+    print(f'Loaded {success} documents')
 
-    # Load as objects
-    indvs = [Individual(**props) for props in data]
 
-    # Persist the items
-    for i, indv in enumerate(indvs):
-        indv.save(using=client)
+@task
+def load_from_ndjson(
+    c, file, model='individual', chunk_size=DEFAULT_CHUNK_SIZE, trusted=False
+):
+    """Stream a newline delimited JSON dump (optionally gzipped) into elasticsearch.
+    Use ``trusted`` to skip validating documents (e.g. dumps of a gumby index).
 
-    # Refresh to ensure all shards are up-to-date and ready for requests
-    Individual._index.refresh(using=client)
+    """
+    client = get_client()
 
+    with open_dump(file) as fb:
+        success, _ = load_ndjson(
+            client, fb, model=get_model(model), chunk_size=chunk_size, trusted=trusted
+        )
+    print(f'Loaded {success} documents')
 
-def _import_migration_func(script):
-    """Imports a `migrate` function from an arbitrary filepath, given as `script`"""
-    _script = Path(script)
-    spec = importlib.util.spec_from_file_location('migration', _script)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
-    return module.migrate
+
+@task
+def sync(c, file, watermark='.checkpoints/sync.json'):
+    """Sync the changes in a newline delimited JSON change feed (optionally gzipped)
+    made since the last sync, as recorded in the ``watermark`` file.
+
+    """
+    client = get_client()
+    totals = sync_changes(client, NDJSONChangeSource(file), watermark_path=watermark)
+    print(
+        f"Synced {totals['written']} changes ({totals['skipped']} already synced), "
+        f"updating the encounters of {totals['individuals']} individuals"
+    )
+
+
+def _print_task_progress(status):
+    print(
+        f"{status.get('updated', 0) + status.get('noops', 0)} of {status.get('total', 0)} "
+        'documents processed',
+        file=sys.stderr,
+    )
 
 
 @task
-def run_migration(c, script):
+def run_migration(
+    c,
+    script,
+    slices=4,
+    processes=0,
+    checkpoint_dir='',
+    requests_per_second=0,
+    client_side=False,
+):
     """Run a given migration script.
     This imports a `migrate` function from the script file.
     The documents in elasticsearch are iteratively given
@@ -79,25 +145,51 @@ def run_migration(c, script):
     The primary usecase is for test data,
     because actual data should be rebuilt from source.
 
-    """
-    migration_func = _import_migration_func(script)
-    client = Client()
-
-    # Query all documents
-    resp = Individual.search(using=client).execute()
+    The index is migrated in ``slices`` by a pool of ``processes``
+    (defaults to the number of CPUs).
+    Progress is checkpointed in ``checkpoint_dir``
+    (defaults to ``.checkpoints/<script name>``),
+    so running an interrupted migration again resumes where it stopped.
 
-    for doc in resp.hits:
-        migration_func(doc)
-        doc.save(using=client)
+    Migrations that define a painless ``SCRIPT`` (and optionally a ``QUERY``)
+    instead run within elasticsearch as an ``_update_by_query`` task,
+    throttled to ``requests_per_second`` (unthrottled by default),
+    unless ``client_side`` is given. These aren't checkpointed.
 
-    # Refresh to ensure all shards are up-to-date and ready for requests
-    Individual._index.refresh(using=client)
+    """
+    server_side = (
+        not client_side and getattr(_import_migration(script), 'SCRIPT', None) is not None
+    )
+    if not checkpoint_dir and not server_side:
+        checkpoint_dir = Path('.checkpoints') / Path(script).stem
+    totals = migrate_index(
+        script,
+        model=Individual,
+        slices=slices,
+        processes=processes or None,
+        checkpoint_dir=checkpoint_dir or None,
+        requests_per_second=requests_per_second or None,
+        progress=_print_task_progress,
+        server_side=server_side,
+    )
+    print(
+        f"Migrated {totals['migrated']} of {totals['processed']} documents "
+        f"({totals['conflicts']} skipped due to concurrent modification)"
+    )
 
 
 @task
-def dump_index(c):
-    """Dump index as JSON to stdout"""
-    client = Client()
+def dump_index(c, model='individual', output='', ndjson=False, compress=False):
+    """Dump index as JSON to stdout or ``output``.
+    Use ``ndjson`` for one document per line, and ``compress`` to gzip the ``output`` file.
 
-    resp = Individual.search(using=client).execute()
-    print(JSONSerializer().dumps([hit.to_dict() for hit in resp.hits]))
+    """
+    client = get_client()
+    dump = dump_ndjson if ndjson else dump_json
+    model = get_model(model)
+
+    if output:
+        with open_dump(output, 'w', compress=compress or None) as fb:
+            dump(client, fb, model=model)
+    else:
+        dump(client, sys.stdout, model=model)
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import OrderedDict
+
+from elasticsearch_dsl.connections import get_connection
+
+from .cache import _generation
+from .codecs import get_codec
+
+__all__ = ('DocumentCache', 'IdentityMap', 'document_cache', 'get_many')
+
+#: Most ids requested in one ``_mget`` request
+DEFAULT_MGET_BATCH_SIZE = 500
+
+#: Marks an id absent from a cache (``None`` being a known miss)
+_ABSENT = object()
+
+
+class DocumentCache:
+    """Process-wide cache of documents fetched by ``get_many``, by index and id.
+
+    Entries are kept with the write generation of their index, so any write gumby makes
+    to the index (see ``invalidate_index``) makes them stale, and expire after ``ttl``
+    seconds. The least recently used are evicted once there are more than ``max_entries``.
+
+    Writes made outside of this process are only picked up once entries expire.
+
+    """
+
+    def __init__(self, max_entries=10000, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, index, id):
+        """The cached hit of document ``id`` in ``index``, or ``None``"""
+        key = (index, id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, generation, hit = entry
+                if expires > time.monotonic() and generation == _generation((index,)):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return hit
+                del self._entries[key]
+            self.misses += 1
+        return None
+
+    def generation(self, index):
+        """Write generation of the ``index``, to be read before requesting a hit to ``put``"""
+        return _generation((index,))
+
+    def put(self, index, id, hit, generation):
+        """Cache the ``hit`` requested at the ``generation`` of its ``index``,
+        so writes made while it was in flight make it stale
+
+        """
+        entry = (time.monotonic() + self.ttl, generation, hit)
+        with self._lock:
+            self._entries[(index, id)] = entry
+            self._entries.move_to_end((index, id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+#: The ``DocumentCache`` shared by the process
+document_cache = DocumentCache()
+
+
+class IdentityMap:
+    """Documents (and misses) already looked up by ``get_many``, e.g. during one request,
+    so each is fetched at most once and always resolves to the same instance
+
+    """
+
+    def __init__(self):
+        self._docs = {}
+
+    def __len__(self):
+        return len(self._docs)
+
+    def get(self, model, id, default=_ABSENT):
+        return self._docs.get((model, id), default)
+
+    def add(self, model, id, doc):
+        self._docs[(model, id)] = doc
+
+    def clear(self):
+        self._docs.clear()
+
+
+def _batches(items, size):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _search_ids(es, index, ids):
+    # ``_mget`` can't resolve an alias of several partitions,
+    # nor get routed documents without their routing
+    resp = es.search(
+        index=index, body={'query': {'ids': {'values': ids}}, 'size': len(ids)}
+    )
+    hits = {hit['_id']: dict(hit, found=True) for hit in resp['hits']['hits']}
+    return [hits.get(id, {'_index': index, '_id': id, 'found': False}) for id in ids]
+
+
+def get_many(
+    model,
+    ids,
+    using=None,
+    index=None,
+    batch_size=DEFAULT_MGET_BATCH_SIZE,
+    identity_map=None,
+    cache=None,
+):
+    """Get the ``model``'s documents by id (e.g. ``uuid.UUID`` or ``str``) in ``_mget``
+    requests of up to ``batch_size`` ids, rather than a ``GET`` request apiece.
+
+    Returns the documents in the order of the ``ids``, with ``None`` for those not found.
+    Documents are looked up first in the ``identity_map`` (an ``IdentityMap``),
+    then in the ``cache`` (a ``DocumentCache``, e.g. ``gumby.document_cache``),
+    and only the rest are requested
+    (with an ``ids`` search for partitioned or routed models).
+
+    """
+    if index is None:
+        index = model._index._name
+    codec = get_codec(model)
+    keys = [str(id) for id in ids]
+
+    found = {}
+    missing = []
+    for key in dict.fromkeys(keys):
+        doc = _ABSENT if identity_map is None else identity_map.get(model, key)
+        if doc is _ABSENT and cache is not None:
+            hit = cache.get(index, key)
+            if hit is not None:
+                doc = codec.from_hit(hit)
+        if doc is _ABSENT:
+            missing.append(key)
+        else:
+            found[key] = doc
+
+    if missing:
+        es = get_connection(using or model._index._using)
+        for batch in _batches(missing, batch_size):
+            generation = None if cache is None else cache.generation(index)
+            if index == model._index._name and (
+                model._partitioning is not None or model._shard_routing is not None
+            ):
+                hits = _search_ids(es, index, batch)
+            else:
+                hits = es.mget(index=index, body={'ids': batch})['docs']
+            for hit in hits:
+                if 'error' in hit:
+                    raise RuntimeError(f'failed to get document: {hit!r}')
+                key = hit['_id']
+                if not hit['found']:
+                    found[key] = None
+                    continue
+                if cache is not None:
+                    cache.put(index, key, hit, generation)
+                found[key] = codec.from_hit(hit)
+
+    if identity_map is not None:
+        for key, doc in found.items():
+            identity_map.add(model, key, doc)
+    return [found[key] for key in keys]
@@ -0,0 +1,342 @@
+import copy
+import functools
+import importlib.util
+import json
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from elasticsearch.helpers import scan, streaming_bulk
+
+from .cache import invalidate_index, refresh_index
+from .codecs import get_codec
+from .indices import wait_for_task
+from .models import Individual
+
+__all__ = ('migrate_index', 'migrate_slice', 'migrate_server_side')
+
+#: Number of migrated documents written back in each ``_bulk`` request
+DEFAULT_CHUNK_SIZE = 500
+#: Field used to order each slice, which makes a slice resumable
+RESUME_FIELD = 'id'
+
+
+@functools.lru_cache(maxsize=None)
+def _import_migration(script):
+    """Imports a migration module from an arbitrary filepath, given as `script`"""
+    _script = Path(script)
+    spec = importlib.util.spec_from_file_location('migration', _script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _import_migration_func(script):
+    """Imports a `migrate` function from an arbitrary filepath, given as `script`"""
+    return _import_migration(script).migrate
+
+
+class _Checkpoint:
+    """Progress of a single slice, persisted as a JSON file in ``directory``"""
+
+    def __init__(self, directory, slice_id):
+        self.path = None
+        self.state = {
+            'last_id': None,
+            'done': False,
+            'processed': 0,
+            'migrated': 0,
+            'conflicts': 0,
+        }
+        if directory is not None:
+            self.path = Path(directory) / f'slice-{slice_id}.json'
+            if self.path.exists():
+                self.state.update(json.loads(self.path.read_text()))
+
+    def save(self, **state):
+        self.state.update(state)
+        if self.path is None:
+            return
+        # Write then rename so a kill mid-write never corrupts the checkpoint
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.state))
+        tmp.replace(self.path)
+
+
+def _build_query(slice_id, slices, last_id):
+    query = {
+        'query': {'match_all': {}},
+        'sort': [{RESUME_FIELD: 'asc'}],
+        'seq_no_primary_term': True,
+    }
+    if last_id is not None:
+        query['query'] = {'range': {RESUME_FIELD: {'gt': last_id}}}
+    if slices > 1:
+        query['slice'] = {'id': slice_id, 'max': slices}
+    return query
+
+
+def migrate_slice(
+    client,
+    migration_func,
+    model=Individual,
+    index=None,
+    slice_id=0,
+    slices=1,
+    checkpoint_dir=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    scroll='5m',
+):
+    """Run ``migration_func`` over every document in one slice of the index.
+
+    The slice is scrolled in ``id`` order and each changed document is written back
+    through the ``_bulk`` API guarded by ``if_seq_no``/``if_primary_term``,
+    so concurrent writes are never overwritten (they are counted as ``conflicts``).
+    When ``checkpoint_dir`` is supplied, progress is recorded after every chunk
+    and a later call for the same slice resumes after the last written chunk.
+
+    """
+    if index is None:
+        index = model._index._name
+    checkpoint = _Checkpoint(checkpoint_dir, slice_id)
+    if checkpoint.state['done']:
+        return {
+            'processed': checkpoint.state['processed'],
+            'migrated': checkpoint.state['migrated'],
+            'conflicts': checkpoint.state['conflicts'],
+        }
+
+    hits = scan(
+        client,
+        query=_build_query(slice_id, slices, checkpoint.state['last_id']),
+        index=index,
+        scroll=scroll,
+        size=chunk_size,
+        preserve_order=True,
+    )
+
+    codec = get_codec(model)
+    state = checkpoint.state
+    actions, last_id, pending = [], None, 0
+
+    def flush():
+        for ok, info in streaming_bulk(
+            client, actions, chunk_size=chunk_size, raise_on_error=False
+        ):
+            if ok:
+                continue
+            if info['index'].get('status') == 409:
+                # The document was modified since it was read
+                state['conflicts'] += 1
+            else:
+                raise RuntimeError(f'failed to write migrated document: {info!r}')
+        invalidate_index(index)
+        checkpoint.save(last_id=last_id)
+
+    for hit in hits:
+        doc = codec.from_hit(hit)
+        # Copied because migrations may mutate values shared with the serialized form
+        before = copy.deepcopy(codec.to_source(doc, validate=False))
+        doc = migration_func(doc) or doc
+        after = codec.to_source(doc, validate=False)
+        last_id = hit['_source'].get(RESUME_FIELD)
+        state['processed'] += 1
+        pending += 1
+        if after != before:
+            state['migrated'] += 1
+            action = {
+                '_index': hit['_index'],
+                '_id': hit['_id'],
+                'if_seq_no': hit['_seq_no'],
+                'if_primary_term': hit['_primary_term'],
+                '_source': after,
+            }
+            if '_routing' in hit:
+                # Written back to the shard it was read from (see ``gumby.route_model``)
+                action['routing'] = hit['_routing']
+            actions.append(action)
+        if pending >= chunk_size:
+            flush()
+            actions, pending = [], 0
+    flush()
+    checkpoint.save(done=True)
+
+    return {
+        'processed': state['processed'],
+        'migrated': state['migrated'],
+        'conflicts': state['conflicts'],
+    }
+
+
+def migrate_server_side(
+    client,
+    script,
+    query=None,
+    index=None,
+    model=Individual,
+    slices='auto',
+    requests_per_second=None,
+    poll_interval=5,
+    progress=None,
+):
+    """Run a painless ``script`` over the documents matching ``query``
+    (defaults to all documents) in the ``model``'s index (or ``index``),
+    as an ``_update_by_query`` task in the cluster.
+
+    ``script`` is the painless source, or a script object (e.g. with ``params``).
+    The task runs in ``slices`` and is throttled to ``requests_per_second``
+    (unthrottled by default). It's polled every ``poll_interval`` seconds,
+    calling ``progress`` with its status.
+    Documents modified while the task runs are skipped (counted as ``conflicts``).
+    Scripts set ``ctx.op = 'noop'`` to leave a document as is.
+
+    Returns the number of processed, migrated and conflicting documents.
+
+    """
+    if index is None:
+        index = model._index._name
+    if isinstance(script, str):
+        script = {'source': script}
+    body = {'script': {'lang': 'painless', **script}}
+    if query is not None:
+        body['query'] = query
+
+    params = {'slices': slices, 'conflicts': 'proceed', 'wait_for_completion': False}
+    if requests_per_second is not None:
+        params['requests_per_second'] = requests_per_second
+    resp = client.update_by_query(index=index, body=body, **params)
+    try:
+        task = wait_for_task(
+            client, resp['task'], poll_interval=poll_interval, progress=progress
+        )
+    finally:
+        invalidate_index(index)
+
+    status = task['response']
+    return {
+        'processed': status['total'],
+        'migrated': status['updated'],
+        'conflicts': status['version_conflicts'],
+    }
+
+
+def _check_checkpoint_dir(checkpoint_dir, script, index, slices):
+    """Ensure checkpoints in ``checkpoint_dir`` belong to this migration"""
+    checkpoint_dir = Path(checkpoint_dir)
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    manifest = checkpoint_dir / 'migration.json'
+    expected = {'script': Path(script).name, 'index': index, 'slices': slices}
+    if manifest.exists():
+        found = json.loads(manifest.read_text())
+        if found != expected:
+            raise ValueError(
+                f"checkpoints in '{checkpoint_dir}' belong to a different migration: {found!r}"
+            )
+    else:
+        manifest.write_text(json.dumps(expected))
+
+
+def _migrate_slice_in_process(script, client_kwargs, **kwargs):
+    # Clients can't be shared across processes, so each worker has its own
+    from . import get_client
+
+    client = get_client(alias=None, **client_kwargs)
+    return migrate_slice(client, _import_migration_func(script), **kwargs)
+
+
+def migrate_index(
+    script,
+    model=Individual,
+    index=None,
+    slices=4,
+    processes=None,
+    checkpoint_dir=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    client_kwargs=None,
+    refresh=True,
+    requests_per_second=None,
+    progress=None,
+    server_side=None,
+):
+    """Run the migration defined in ``script`` over every document
+    in the ``model``'s index (or ``index``).
+
+    Migrations that define a painless ``SCRIPT`` (and optionally a ``QUERY``
+    of the documents to migrate) run entirely in the cluster,
+    see ``migrate_server_side`` (with ``slices``, ``requests_per_second`` and ``progress``),
+    unless ``server_side`` is false. They aren't checkpointed,
+    so a ``checkpoint_dir`` can't be given for them.
+
+    Otherwise the ``migrate`` function defined in ``script`` is given each document.
+    The index is split into ``slices`` which are migrated in parallel
+    by a pool of ``processes`` (defaults to the number of CPUs),
+    each using a client built from ``client_kwargs``.
+    See ``migrate_slice`` for how documents are written back
+    and how ``checkpoint_dir`` makes an interrupted migration resumable.
+    The checkpoints are removed once every slice has completed.
+
+    Returns the number of processed, migrated and conflicting documents.
+
+    """
+    client_kwargs = client_kwargs or {}
+    index = index or model._index._name
+    migration = _import_migration(str(script))
+    script_source = getattr(migration, 'SCRIPT', None)
+    if server_side is None:
+        server_side = script_source is not None
+    if server_side:
+        if script_source is None:
+            raise ValueError(f"'{script}' defines no SCRIPT to run in the cluster")
+        if checkpoint_dir is not None:
+            raise ValueError('server-side migrations are not checkpointed')
+        from . import get_client
+
+        client = get_client(alias=None, **client_kwargs)
+        totals = migrate_server_side(
+            client,
+            script_source,
+            query=getattr(migration, 'QUERY', None),
+            index=index,
+            model=model,
+            slices=slices,
+            requests_per_second=requests_per_second,
+            progress=progress,
+        )
+        if refresh:
+            refresh_index(client, index)
+        return totals
+
+    totals = {'processed': 0, 'migrated': 0, 'conflicts': 0}
+    if checkpoint_dir is not None:
+        _check_checkpoint_dir(checkpoint_dir, script, index, slices)
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(
+                _migrate_slice_in_process,
+                str(script),
+                client_kwargs,
+                model=model,
+                index=index,
+                slice_id=slice_id,
+                slices=slices,
+                checkpoint_dir=checkpoint_dir,
+                chunk_size=chunk_size,
+            )
+            for slice_id in range(slices)
+        ]
+        for future in futures:
+            for k, v in future.result().items():
+                totals[k] += v
+
+    # Slices were written by other processes, so invalidate this process' cache too
+    if refresh:
+        # Refresh to ensure all shards are up-to-date and ready for requests
+        from . import get_client
+
+        refresh_index(get_client(alias=None, **client_kwargs), index)
+    else:
+        invalidate_index(index)
+    if checkpoint_dir is not None:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    return totals
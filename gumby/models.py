@@ -7,12 +7,18 @@ from elasticsearch_dsl import (
     Document,
     GeoPoint,
     InnerDoc,
+    Integer,
     Keyword,
     Nested,
     Object,
     ValidationException,
 )
 
+from .cache import invalidate_index
+from .indices import init_model_index
+from .pipelines import INDIVIDUAL_SUMMARY_PIPELINE
+from .routing import RoutedSearch
+
 ALL_MODELS = []
 
 
@@ -22,6 +28,15 @@ def register_model(cls):
     return cls
 
 
+def get_model(name):
+    """Look up a registered model by its class name or index name (case-insensitive)"""
+    name = name.lower()
+    for model in ALL_MODELS:
+        if name in (model.__name__.lower(), model.Index.name.lower()):
+            return model
+    raise LookupError(f"'{name}' is not a registered model")
+
+
 # FFF Ported from Python >=3.10
 class StrEnum(str, enum.Enum):
     """
@@ -71,15 +86,21 @@ class EnumField(Keyword):
 
     def __init__(self, enum, *args, **kwargs):
         self._enum = enum
+        # Key name may not match string value name, otherwise `self._enum[data]` would work.
+        # Members are also strings, so either can be used to look up the member.
+        self._members = {str(x): x for x in enum}
         super().__init__(*args, **kwargs)
 
+    def _invalid(self, data):
+        valid_options = ', '.join(self._members)
+        return ValidationException(
+            f"'{data}' is not one the the valid options: {valid_options}"
+        )
+
     def clean(self, data):
         super().clean(data)
-        if not (data in list(self._enum) or data is None):
-            valid_options = ', '.join([str(n) for n in self._enum])
-            raise ValidationException(
-                f"'{data}' is not one the the valid options: {valid_options}"
-            )
+        if not (data is None or data in self._members):
+            raise self._invalid(data)
         return data
 
     def _deserialize(self, data):
@@ -87,8 +108,10 @@ class EnumField(Keyword):
             return None
         elif isinstance(data, self._enum):
             return data
-        # Key name may not match string value name, otherwise `self._enum[data]` would work.
-        return [x for x in self._enum if str(x) == data][0]
+        try:
+            return self._members[data]
+        except (KeyError, TypeError):
+            raise self._invalid(data) from None
 
     def _serialize(self, data):
         if data is None:
@@ -118,6 +141,71 @@ class UUIDField(Keyword):
         return str(data)
 
 
+class BaseDocument(Document):
+    """Base class of gumby's models.
+    Writes made through the document invalidate cached query results for its index.
+    The index is created behind an alias (see ``gumby.indices``), so it can be rebuilt
+    without downtime.
+
+    """
+
+    #: ``TimePartitioning`` of the model's index, see ``gumby.partition_model``
+    _partitioning = None
+    #: ``ShardRouting`` of the model's documents, see ``gumby.route_model``
+    _shard_routing = None
+
+    @classmethod
+    def init(cls, index=None, using=None):
+        if index is not None:
+            # Explicitly named index (e.g. for testing), without an alias
+            return super().init(index=index, using=using)
+        return init_model_index(cls, using=using)
+
+    @classmethod
+    def search(cls, using=None, index=None):
+        if index is not None or (cls._partitioning is None and cls._shard_routing is None):
+            return super().search(using=using, index=index)
+        return RoutedSearch(
+            using=cls._get_using(using), index=cls._default_index(), doc_type=[cls]
+        )
+
+    def _get_index(self, index=None, required=True):
+        partitioning = self._partitioning
+        if partitioning is not None and index is None and 'index' not in self.meta:
+            # Writes go to the document's partition, rather than the read alias
+            return partitioning.index_for(getattr(self, partitioning.field, None))
+        return super()._get_index(index=index, required=required)
+
+    def _invalidate(self, index):
+        indices = {self._get_index(index)}
+        if self._partitioning is not None:
+            indices.add(self._index._name)
+        invalidate_index(*indices)
+
+    def _route(self):
+        # Routed documents are written with (and keep) the routing of their field
+        if self._shard_routing is not None and 'routing' not in self.meta:
+            self.meta.routing = self._shard_routing.routing_for(self._d_)
+
+    def save(self, using=None, index=None, **kwargs):
+        self._route()
+        result = super().save(using=using, index=index, **kwargs)
+        self._invalidate(index)
+        return result
+
+    def update(self, using=None, index=None, **kwargs):
+        self._route()
+        result = super().update(using=using, index=index, **kwargs)
+        self._invalidate(index)
+        return result
+
+    def delete(self, using=None, index=None, **kwargs):
+        self._route()
+        result = super().delete(using=using, index=index, **kwargs)
+        self._invalidate(index)
+        return result
+
+
 class IndividualEncounter(InnerDoc):
     id = UUIDField(required=True)
     point = GeoPoint(required=False)
@@ -130,10 +218,11 @@ class IndividualEncounter(InnerDoc):
 
 
 @register_model
-class Individual(Document):
+class Individual(BaseDocument):
     id = UUIDField(required=True)
     name = Keyword()
     alias = Keyword()
+    taxonomy = Keyword()
     genus = Keyword()
     species = Keyword()
     last_sighting = Date()
@@ -143,8 +232,18 @@ class Individual(Document):
 
     encounters = Nested(IndividualEncounter)
 
+    # Summary of the encounters, derived by the ingest pipeline on every index request
+    # (and by the scripts of ``gumby.updates`` on updates)
+    first_sighting = Date()
+    encounter_count = Integer()
+    has_annotated_encounter = Boolean()
+    encounter_taxonomies = Keyword(multi=True)
+    encounter_submitters = Keyword(multi=True)
+
     class Index:
         name = 'individuals'
+        # Not index sorted, elasticsearch doesn't sort indices with nested fields
+        settings = {'final_pipeline': INDIVIDUAL_SUMMARY_PIPELINE}
 
 
 class LivingStatus(StrEnum):
@@ -164,7 +263,7 @@ class Viewpoint(StrEnum):
 
 
 @register_model
-class Encounter(Document):
+class Encounter(BaseDocument):
     # ENCOUNTER.ID
     id = UUIDField(required=True)
     # point = (ENCOUNTER.DECIMALLATITUDE, ENCOUNTER.DECIMALLONGITUDE)
@@ -187,10 +286,15 @@ class Encounter(Document):
 
     class Index:
         name = 'encounters'
+        settings = {
+            # Latest first, see ``gumby.sorting``
+            'sort.field': ['datetime'],
+            'sort.order': ['desc'],
+        }
 
 
 @register_model
-class Sighting(Document):
+class Sighting(BaseDocument):
     # OCCURRENCE.ID
     id = UUIDField(required=True)
     # (OCCURRENCE.DECIMALLATITUDE, OCCURRENCE.DECIMALLONGITUDE)
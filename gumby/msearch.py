@@ -0,0 +1,189 @@
+import threading
+import time
+from concurrent.futures import Future
+
+from elasticsearch.exceptions import HTTP_EXCEPTIONS, TransportError
+from elasticsearch_dsl.connections import get_connection
+
+__all__ = ('MultiSearchDispatcher',)
+
+#: Most searches sent in one ``_msearch`` request
+DEFAULT_MAX_BATCH_SIZE = 50
+#: Seconds a search waits for others to be submitted before its batch is sent
+DEFAULT_MAX_WAIT = 0.002
+
+#: Search parameters that can be given in a ``_msearch`` header
+HEADER_PARAMS = frozenset(
+    (
+        'allow_no_indices',
+        'allow_partial_search_results',
+        'ccs_minimize_roundtrips',
+        'expand_wildcards',
+        'ignore_unavailable',
+        'preference',
+        'request_cache',
+        'routing',
+        'search_type',
+    )
+)
+
+
+def _check_params(s):
+    unsupported = set(s._params) - HEADER_PARAMS
+    if unsupported:
+        raise ValueError(
+            f'search parameters {sorted(unsupported)!r} are not supported by _msearch'
+        )
+
+
+def _msearch_body(searches):
+    body = []
+    for s in searches:
+        if hasattr(s, 'prune'):
+            # Only the partitions a ``PartitionedSearch`` can match are searched
+            s = s.prune()
+        header = dict(s._params)
+        if s._index:
+            header['index'] = s._index
+        body.append(header)
+        body.append(s.to_dict())
+    return body
+
+
+def _error(resp):
+    error = resp['error']
+    status = resp.get('status', 500)
+    error_type = error.get('type') if isinstance(error, dict) else error
+    return HTTP_EXCEPTIONS.get(status, TransportError)(status, error_type, error)
+
+
+def _resolve(batch, responses):
+    """Resolve the futures of a ``batch`` of ``(search, future)`` pairs
+    with their own response (or error) of the ``_msearch`` ``responses``
+
+    """
+    for (s, future), resp in zip(batch, responses):
+        if future.done():
+            # Cancelled while the batch was in flight
+            continue
+        if 'error' in resp:
+            future.set_exception(_error(resp))
+        else:
+            future.set_result(s._response_class(s, resp))
+
+
+def _fail(batch, exc):
+    for s, future in batch:
+        if not future.done():
+            future.set_exception(exc)
+
+
+class MultiSearchDispatcher:
+    """Send the ``Search`` objects submitted from any number of threads in batches,
+    each as a single ``_msearch`` request, rather than a ``_search`` request apiece.
+
+    A batch is sent once ``max_batch_size`` searches are waiting, or ``max_wait`` seconds
+    after its first search was submitted. Each search's future is resolved with its own
+    ``Response``, or the error of that search alone (e.g. a ``RequestError``
+    for a malformed query), while failures of the whole request fail the whole batch.
+    Searches are sent with their own connection (see ``Search.using``),
+    unless ``using`` is given.
+
+    """
+
+    def __init__(
+        self, using=None, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT
+    ):
+        self.using = using
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending = []
+        self._first_submitted = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, s):
+        """Queue the search ``s``, returning a ``concurrent.futures.Future``
+        of its response
+
+        """
+        _check_params(s)
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('cannot submit searches to a closed dispatcher')
+            if not self._pending:
+                self._first_submitted = time.monotonic()
+            self._pending.append((s, future))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='gumby-msearch', daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def search(self, s):
+        """Execute the search ``s`` in the next batch, like ``Search.execute``"""
+        return self.submit(s).result()
+
+    def close(self):
+        """Send the searches still waiting and stop the dispatcher's thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _next_batch(self):
+        with self._cond:
+            while True:
+                if len(self._pending) >= self.max_batch_size or (
+                    self._pending and self._closed
+                ):
+                    break
+                if self._pending:
+                    remaining = self._first_submitted + self.max_wait - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                elif self._closed:
+                    return None
+                else:
+                    self._cond.wait()
+            batch = self._pending[: self.max_batch_size]
+            del self._pending[: self.max_batch_size]
+            # The rest have been waiting since (at the latest) now
+            self._first_submitted = time.monotonic()
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            # Skip searches cancelled before being sent
+            batch = [(s, f) for s, f in batch if f.set_running_or_notify_cancel()]
+            connections = {}
+            for s, future in batch:
+                using = self.using or s._using
+                connections.setdefault(using, []).append((s, future))
+            for using, group in connections.items():
+                self._send(using, group)
+
+    def _send(self, using, batch):
+        try:
+            es = get_connection(using)
+            raw = es.msearch(body=_msearch_body(s for s, f in batch))
+        except Exception as exc:
+            _fail(batch, exc)
+        else:
+            _resolve(batch, raw['responses'])
@@ -0,0 +1,144 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from elasticsearch.exceptions import TransportError
+from elasticsearch.helpers import scan
+from elasticsearch_dsl.connections import get_connection
+
+from .codecs import get_codec
+
+__all__ = ('iter_documents', 'iter_hits')
+
+#: Number of hits requested per page
+DEFAULT_PAGE_SIZE = 1000
+#: How long the point-in-time is kept open between page requests
+DEFAULT_KEEP_ALIVE = '1m'
+#: Every model has a unique ``id``, which makes it a stable tiebreaker for ``search_after``
+DEFAULT_SORT = ({'id': 'asc'},)
+
+
+def _pit_unsupported(e):
+    """Whether the error is of a cluster without the point-in-time API,
+    e.g. the OSS distribution of elasticsearch 7.10
+
+    """
+    return e.status_code in (400, 404, 405) and 'no handler found' in str(e.error)
+
+
+def _scroll_params(body, sort, page_size, keep_alive):
+    # Arguments of ``scan`` for a sorted scroll in place of a point-in-time
+    params = {'query': dict(body or {}), 'size': page_size, 'scroll': keep_alive}
+    if tuple(sort) != DEFAULT_SORT:
+        # Otherwise the scroll is sorted by ``_doc``, the most efficient order
+        params['query']['sort'] = list(sort)
+        params['preserve_order'] = True
+    return params
+
+
+def iter_hits(
+    client,
+    index,
+    body=None,
+    sort=DEFAULT_SORT,
+    page_size=DEFAULT_PAGE_SIZE,
+    keep_alive=DEFAULT_KEEP_ALIVE,
+    prefetch=False,
+):
+    """Iterate over every hit in ``index`` matching the search ``body``.
+
+    Pages are requested with ``search_after`` against a point-in-time,
+    so the iteration sees a consistent view of the index, isn't limited by
+    ``index.max_result_window`` and only holds one page in memory at a time.
+    The ``sort`` must end with a unique field to page reliably.
+    With ``prefetch``, the next page is requested while the current one is consumed
+    (which holds up to two pages in memory).
+
+    Clusters without the point-in-time API are paged with a sorted scroll instead.
+
+    """
+    try:
+        pit_id = client.open_point_in_time(index=index, keep_alive=keep_alive)['id']
+    except TransportError as e:
+        if not _pit_unsupported(e):
+            raise
+        params = _scroll_params(body, sort, page_size, keep_alive)
+        yield from scan(client, index=index, **params)
+        return
+    body = dict(body or {})
+    body.update(size=page_size, sort=list(sort), track_total_hits=False)
+
+    def search(pit_id, search_after=None):
+        page_body = dict(body, pit={'id': pit_id, 'keep_alive': keep_alive})
+        if search_after is not None:
+            page_body['search_after'] = search_after
+        return client.search(body=page_body)
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    try:
+        resp = search(pit_id)
+        while True:
+            hits = resp['hits']['hits']
+            # The point-in-time id may change between requests
+            pit_id = resp.get('pit_id', pit_id)
+            if len(hits) < page_size:
+                yield from hits
+                break
+            search_after = hits[-1]['sort']
+            if executor is not None:
+                next_page = executor.submit(search, pit_id, search_after)
+                yield from hits
+                resp = next_page.result()
+            else:
+                yield from hits
+                resp = search(pit_id, search_after)
+    finally:
+        if executor is not None:
+            # Let a prefetch in flight finish, rather than close the point-in-time under it
+            executor.shutdown(wait=True, cancel_futures=True)
+        client.close_point_in_time(body={'id': pit_id}, ignore=(404,))
+
+
+def iter_documents(
+    model,
+    query=None,
+    fields=None,
+    page_size=DEFAULT_PAGE_SIZE,
+    using=None,
+    index=None,
+    raw=False,
+    sort=DEFAULT_SORT,
+    keep_alive=DEFAULT_KEEP_ALIVE,
+    prefetch=True,
+):
+    """Iterate over every document of the ``model`` (in its index or ``index``)
+    matching the ``query`` (a ``Q`` or a query dictionary), in constant memory.
+
+    Documents are paged by ``iter_hits`` in pages of ``page_size``,
+    prefetching the next page while the current one is consumed.
+    Only the ``fields`` of the documents are fetched, when given.
+    Yields ``model`` instances or, with ``raw``, the ``_source`` dictionaries.
+
+    """
+    client = get_connection(using or model._index._using)
+    if index is None:
+        index = model._index._name
+    body = {}
+    if query is not None:
+        body['query'] = query if isinstance(query, dict) else query.to_dict()
+    if fields is not None:
+        body['_source'] = list(fields)
+    hits = iter_hits(
+        client,
+        index,
+        body=body,
+        sort=sort,
+        page_size=page_size,
+        keep_alive=keep_alive,
+        prefetch=prefetch,
+    )
+    if raw:
+        for hit in hits:
+            yield hit['_source']
+    else:
+        from_hit = get_codec(model).from_hit
+        for hit in hits:
+            yield from_hit(hit)
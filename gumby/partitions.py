@@ -0,0 +1,355 @@
+import datetime
+
+from dateutil.parser import isoparse
+from elasticsearch_dsl import Search
+from elasticsearch_dsl.connections import get_connection
+
+from .cache import invalidate_index
+from .indices import (
+    IndexStatus,
+    _Call,
+    _index_body,
+    _put_pipelines_steps,
+    _run_steps,
+    mapping_status,
+)
+
+__all__ = (
+    'PartitionedSearch',
+    'TimePartitioning',
+    'drop_partitions_before',
+    'partition_model',
+    'rollover_partitions',
+)
+
+#: Most partitions a search is narrowed down to, beyond which it searches them all
+MAX_PRUNED_PARTITIONS = 100
+
+#: Partition of the documents without a date
+UNDATED = 'undated'
+
+_FORMATS = {'year': '%Y', 'month': '%Y-%m'}
+
+
+def _to_datetime(value):
+    """UTC datetime of a date, datetime or ISO 8601 string, or None when it isn't one
+    (e.g. date math like ``now-1y``)
+
+    """
+    if isinstance(value, str):
+        try:
+            value = isoparse(value)
+        except ValueError:
+            return None
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            return value.replace(tzinfo=datetime.timezone.utc)
+        return value.astimezone(datetime.timezone.utc)
+    if isinstance(value, datetime.date):
+        return datetime.datetime(
+            value.year, value.month, value.day, tzinfo=datetime.timezone.utc
+        )
+    return None
+
+
+def _conjuncts(query):
+    # Clauses that every matching document matches
+    yield query
+    clauses = []
+    for occur in ('filter', 'must'):
+        found = query.get('bool', {}).get(occur, [])
+        clauses.extend(found if isinstance(found, list) else [found])
+    for clause in clauses:
+        yield from _conjuncts(clause)
+
+
+class TimePartitioning:
+    """Partitioning of a ``model``'s documents into an index per ``interval``
+    (``year`` or ``month``) of their date ``field``, named like ``encounters.2021``
+    (or ``encounters.2021-05``), all behind the model's index name as a read alias.
+    Documents without a date are kept in ``encounters.undated``.
+
+    Partitions are created from an index template (so the first write of a new period
+    creates its partition) and ahead of time by ``rollover_partitions``.
+    The date of a document must not change once it's written,
+    as that would leave a copy in its former partition.
+
+    """
+
+    def __init__(self, model, interval='year', field='datetime'):
+        if interval not in _FORMATS:
+            raise ValueError(
+                f"interval must be one of {list(_FORMATS)!r}, not '{interval}'"
+            )
+        if field not in model._doc_type.mapping:
+            raise ValueError(f"{model.__name__} has no field '{field}'")
+        self.model = model
+        self.interval = interval
+        self.field = field
+
+    @property
+    def alias(self):
+        return self.model._index._name
+
+    @property
+    def template_name(self):
+        return f'gumby-{self.alias}'
+
+    @property
+    def pattern(self):
+        return f'{self.alias}.*'
+
+    def _start(self, dt):
+        if self.interval == 'year':
+            return dt.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    def _next(self, start):
+        if self.interval == 'year':
+            return start.replace(year=start.year + 1)
+        if start.month == 12:
+            return start.replace(year=start.year + 1, month=1)
+        return start.replace(month=start.month + 1)
+
+    def _name(self, start):
+        return f'{self.alias}.{start.strftime(_FORMATS[self.interval])}'
+
+    def index_for(self, value):
+        """Name of the partition of a document dated ``value``"""
+        if value is None:
+            return f'{self.alias}.{UNDATED}'
+        dt = _to_datetime(value)
+        if dt is None:
+            raise ValueError(f'cannot partition {self.field}={value!r}')
+        return self._name(self._start(dt))
+
+    def period_of(self, name):
+        """The ``(start, end)`` of the period of a partition, or None if it has no dates"""
+        suffix = name[len(self.alias) + 1 :]
+        try:
+            start = datetime.datetime.strptime(suffix, _FORMATS[self.interval])
+        except ValueError:
+            return None
+        start = start.replace(tzinfo=datetime.timezone.utc)
+        return start, self._next(start)
+
+    def names_between(self, start, end):
+        """Names of the partitions from the one of ``start`` to the one of ``end``"""
+        names = []
+        period = self._start(start)
+        while period <= end:
+            names.append(self._name(period))
+            period = self._next(period)
+        return names
+
+    def date_bounds(self, query):
+        """The ``(start, end)`` dates the ``query``'s filters limit the field to,
+        each None when unbounded
+
+        """
+        start, end = None, None
+        for clause in _conjuncts(query):
+            if self.field in clause.get('term', {}):
+                value = clause['term'][self.field]
+                lower = upper = value.get('value') if isinstance(value, dict) else value
+            elif self.field in clause.get('range', {}):
+                bounds = clause['range'][self.field]
+                if 'format' in bounds or 'time_zone' in bounds:
+                    continue
+                lower = bounds.get('gte', bounds.get('gt'))
+                upper = bounds.get('lte', bounds.get('lt'))
+            else:
+                continue
+            lower, upper = _to_datetime(lower), _to_datetime(upper)
+            if lower is not None and (start is None or lower > start):
+                start = lower
+            if upper is not None and (end is None or upper < end):
+                end = upper
+        return start, end
+
+    def indices_for_query(self, query):
+        """Names of the only partitions the ``query`` can match documents in,
+        or None when it isn't limited to a date range
+
+        """
+        start, end = self.date_bounds(query)
+        if start is None or end is None:
+            return None
+        if start > end:
+            return []
+        names = self.names_between(start, end)
+        if len(names) > MAX_PRUNED_PARTITIONS:
+            return None
+        return names
+
+    def _template_body(self):
+        body = _index_body(self.model)
+        body['aliases'] = {self.alias: {}}
+        return {'index_patterns': [self.pattern], 'priority': 100, 'template': body}
+
+    def _live_mappings_steps(self):
+        resp = yield _Call(
+            'indices.get_index_template', {'name': self.template_name, 'ignore': 404}
+        )
+        for template in resp.get('index_templates', []):
+            return template['index_template']['template'].get('mappings', {})
+        return None
+
+    def _init_steps(self, now=None):
+        # Steps of ``init``, shared with ``gumby.aio``
+        live = yield from self._live_mappings_steps()
+        status = IndexStatus.CREATED if live is None else mapping_status(self.model, live)
+        yield from _put_pipelines_steps(self.model)
+        if status != IndexStatus.UNCHANGED:
+            # Changes to existing fields only apply to new partitions
+            yield _Call(
+                'indices.put_index_template',
+                {'name': self.template_name, 'body': self._template_body()},
+            )
+        if status == IndexStatus.UPDATED:
+            yield _Call(
+                'indices.put_mapping',
+                {'index': self.pattern, 'body': _index_body(self.model)['mappings']},
+            )
+        yield from self._rollover_steps(now, ahead=0)
+        return status
+
+    def init(self, es, now=None):
+        """Put the index template and create the current partition.
+        Returns the ``IndexStatus`` of the template, whose new fields are added
+        to the existing partitions in place.
+
+        """
+        return _run_steps(es, self._init_steps(now))
+
+    def _rollover_names(self, now, ahead):
+        period = self._start(
+            _to_datetime(now or datetime.datetime.now(datetime.timezone.utc))
+        )
+        names = [f'{self.alias}.{UNDATED}']
+        for i in range(ahead + 1):
+            names.append(self._name(period))
+            period = self._next(period)
+        return names
+
+    def _rollover_steps(self, now, ahead):
+        created = []
+        for name in self._rollover_names(now, ahead):
+            # Created from the template
+            resp = yield _Call('indices.create', {'index': name, 'ignore': 400})
+            if resp.get('acknowledged'):
+                created.append(name)
+        if created:
+            invalidate_index(self.alias)
+        return created
+
+    def rollover(self, es, now=None, ahead=1):
+        """Create the partition of ``now`` and of the ``ahead`` periods after it
+        (and the partition of undated documents), returning the names of those created
+
+        """
+        return _run_steps(es, self._rollover_steps(now, ahead))
+
+    def partitions(self, es):
+        """Names of the existing partitions"""
+        resp = es.indices.get_alias(name=self.alias, ignore=404)
+        return sorted(name for name in resp if name not in ('error', 'status'))
+
+    def drop_before(self, es, cutoff):
+        """Delete the partitions whose whole period is before ``cutoff``,
+        returning their names
+
+        """
+        cutoff = _to_datetime(cutoff)
+        expired = []
+        for name in self.partitions(es):
+            period = self.period_of(name)
+            if period is not None and period[1] <= cutoff:
+                expired.append(name)
+        if expired:
+            es.indices.delete(index=','.join(expired))
+            invalidate_index(self.alias, *expired)
+        return expired
+
+    def drop(self, es):
+        """Delete every partition and the index template"""
+        es.indices.delete(index=self.pattern, ignore=404)
+        es.indices.delete_index_template(name=self.template_name, ignore=404)
+        invalidate_index(self.alias)
+
+
+class PartitionedSearch(Search):
+    """``Search`` of a partitioned model, which only searches the partitions
+    its date filters overlap (see ``prune``)
+
+    """
+
+    @property
+    def _partitioning(self):
+        if len(self._doc_type) == 1:
+            return getattr(self._doc_type[0], '_partitioning', None)
+        return None
+
+    def prune(self):
+        """Copy of the search narrowed down to the partitions its date filters overlap,
+        or the search itself when its date range is unbounded or it targets other indices
+
+        """
+        partitioning = self._partitioning
+        if partitioning is None or self._index != [partitioning.alias]:
+            return self
+        names = partitioning.indices_for_query(self.to_dict().get('query', {}))
+        if names is None:
+            return self
+        if not names:
+            return self.filter('match_none')
+        # Partitions of the period that don't exist (yet) are skipped
+        return self.index().index(*names).params(ignore_unavailable=True)
+
+    def execute(self, ignore_cache=False):
+        if ignore_cache or not hasattr(self, '_response'):
+            self._response = Search.execute(self.prune(), ignore_cache=True)
+        return self._response
+
+    def count(self):
+        if hasattr(self, '_response'):
+            return super().count()
+        return Search.count(self.prune())
+
+
+def partition_model(model, interval='year', field='datetime'):
+    """Opt the ``model`` (e.g. ``Encounter`` or ``Sighting``) into time partitioning
+    (see ``TimePartitioning``), before its index is initialized.
+    Returns the model's ``TimePartitioning``.
+
+    """
+    model._partitioning = TimePartitioning(model, interval=interval, field=field)
+    return model._partitioning
+
+
+def _get_partitioning(model):
+    partitioning = getattr(model, '_partitioning', None)
+    if partitioning is None:
+        raise ValueError(f'{model.__name__} is not partitioned, see partition_model')
+    return partitioning
+
+
+def rollover_partitions(model, using=None, now=None, ahead=1):
+    """Create the ``model``'s partition of ``now`` and the ``ahead`` periods after it,
+    e.g. daily, so no write has to wait for its partition to be created.
+    Returns the names of the partitions created.
+
+    """
+    partitioning = _get_partitioning(model)
+    es = get_connection(using or model._index._using)
+    return partitioning.rollover(es, now=now, ahead=ahead)
+
+
+def drop_partitions_before(model, cutoff, using=None):
+    """Retention of the ``model``'s documents: delete the partitions
+    whose whole period is before ``cutoff``. Returns the names of those deleted.
+
+    """
+    partitioning = _get_partitioning(model)
+    es = get_connection(using or model._index._using)
+    return partitioning.drop_before(es, cutoff)
@@ -0,0 +1,102 @@
+import hashlib
+import json
+
+__all__ = ('INDIVIDUAL_SUMMARY_PIPELINE', 'put_pipelines')
+
+#: Ingest pipeline bodies by id
+_pipelines = {}
+
+
+def _register_pipeline(name, body):
+    """Register an ingest pipeline, returning its id.
+    Ids include a hash of the body, so a changed pipeline is stored alongside
+    (rather than replacing) the one used by existing indexes.
+
+    """
+    digest = hashlib.sha1(json.dumps(body, sort_keys=True).encode('utf-8')).hexdigest()
+    pipeline_id = f'gumby-{name}-{digest[:12]}'
+    _pipelines[pipeline_id] = body
+    return pipeline_id
+
+
+#: Painless snippet summarizing the ``encounters`` (a list) of an individual's
+#: source (``doc``) into flat fields, so common filters don't need ``nested`` queries.
+#: Shared by the ingest pipeline and the stored scripts of ``gumby.updates``,
+#: as elasticsearch doesn't run ingest pipelines on scripted updates.
+#: Leaves the ``first`` and ``last`` sightings (or nulls) for the caller to store.
+#: Dates compare as the ISO 8601 strings they're stored as.
+SUMMARIZE_ENCOUNTERS_SNIPPET = """
+def first = null;
+def last = null;
+boolean annotated = false;
+Set taxonomies = new TreeSet();
+Set submitters = new TreeSet();
+for (def encounter : encounters) {
+  def date = encounter.date_occurred;
+  if (date != null) {
+    if (first == null || date.compareTo(first) < 0) {
+      first = date;
+    }
+    if (last == null || date.compareTo(last) > 0) {
+      last = date;
+    }
+  }
+  if (encounter.has_annotation == true) {
+    annotated = true;
+  }
+  if (encounter.taxonomy != null) {
+    taxonomies.add(encounter.taxonomy);
+  }
+  if (encounter.submitter_id != null) {
+    submitters.add(encounter.submitter_id);
+  }
+}
+doc.encounter_count = encounters.size();
+doc.has_annotated_encounter = annotated;
+doc.encounter_taxonomies = new ArrayList(taxonomies);
+doc.encounter_submitters = new ArrayList(submitters);
+"""
+
+#: Summarizes an individual's encounters on every index request
+INDIVIDUAL_SUMMARY_SCRIPT = (
+    """
+def doc = ctx;
+def encounters = doc.encounters;
+if (encounters == null) {
+  encounters = [];
+} else if (!(encounters instanceof List)) {
+  encounters = [encounters];
+}
+"""
+    + SUMMARIZE_ENCOUNTERS_SNIPPET
+    + """// Individuals without dated encounters keep any sightings they were given
+if (last != null) {
+  doc.first_sighting = first;
+  doc.last_sighting = last;
+}
+"""
+)
+
+INDIVIDUAL_SUMMARY_PIPELINE = _register_pipeline(
+    'individual-summary',
+    {
+        'description': "Summarize an individual's encounters",
+        'processors': [
+            {'script': {'lang': 'painless', 'source': INDIVIDUAL_SUMMARY_SCRIPT}}
+        ],
+    },
+)
+
+
+def _model_pipelines(model):
+    settings = model._index._settings
+    for name in ('default_pipeline', 'final_pipeline'):
+        pipeline_id = settings.get(name, settings.get(f'index.{name}'))
+        if pipeline_id in _pipelines:
+            yield pipeline_id
+
+
+def put_pipelines(client, model):
+    """Store the ingest pipelines used by the ``model``'s index in the cluster"""
+    for pipeline_id in _model_pipelines(model):
+        client.ingest.put_pipeline(id=pipeline_id, body=_pipelines[pipeline_id])
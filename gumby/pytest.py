@@ -1,13 +1,16 @@
 """Test the individuals index"""
+import copy
+import hashlib
 import json
 import os
 from pathlib import Path
 
 import pytest
 
-from gumby import Client
-from gumby import dsl
+from gumby import dsl, get_client
+from gumby.ingest import bulk_load, iter_json_array
 from gumby.models import Individual
+from gumby.pipelines import put_pipelines
 
 
 HERE = Path(__file__).parent
@@ -16,7 +19,18 @@ HERE = Path(__file__).parent
 RAW_INDIVIDUALS_DUMP = HERE / 'testing-data/individuals.json'
 
 
-@pytest.fixture
+def _index_fingerprint(model, data_file):
+    """Hash of the model's index definition and the data loaded into it,
+    used to name the shared source index so a changed mapping or dataset is never reused.
+
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps(model._index.to_dict(), sort_keys=True).encode('utf-8'))
+    digest.update(data_file.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+@pytest.fixture(scope='session')
 def gumby_client():
     hosts = os.getenv('ELASTICSEARCH_HOSTS')
     if not hosts:
@@ -24,7 +38,7 @@ def gumby_client():
         hosts = None
     else:
         hosts = [h.strip() for h in hosts.split(',')]
-    return Client(hosts)
+    return get_client(hosts, alias=None)
 
 
 @pytest.fixture
@@ -32,36 +46,97 @@ def gumby_individual_index_name():
     return f'test-{Individual.Index.name}'
 
 
+@pytest.fixture(scope='session')
+def _gumby_faux_individual_props():
+    # Parsed once per session, but never handed out, as tests may mutate what they're given
+    with RAW_INDIVIDUALS_DUMP.open('r') as fb:
+        return list(iter_json_array(fb))
+
+
 @pytest.fixture
-def gumby_faux_index_data(request, gumby_client, gumby_individual_index_name):
-    idx_name = gumby_individual_index_name
-    idx = dsl.Index(name=idx_name, using=gumby_client)
+def gumby_faux_individuals(_gumby_faux_individual_props):
+    """The individuals in the testing data, as (unsaved) model instances
+    of their own, so a test's changes to them don't leak into other tests
+
+    """
+    return [Individual(**copy.deepcopy(props)) for props in _gumby_faux_individual_props]
+
+
+@pytest.fixture(scope='session')
+def gumby_readonly_individual_index_name(request, gumby_client):
+    """Name of a read-only index loaded with the testing data.
+    It is built once per session (with the bulk API) and shared by every test that uses it,
+    so only use this in tests that don't write to the index.
+
+    """
+    client = gumby_client
+    fingerprint = _index_fingerprint(Individual, RAW_INDIVIDUALS_DUMP)
+    idx_name = f'test-{Individual.Index.name}-{fingerprint}'
+    idx = dsl.Index(name=idx_name, using=client)
 
     # Set up index (and cleanup before if necessary)
     # Use a bit of magic to let the custom named index know about
     # our document mapping as defined by the model.
     idx.get_or_create_mapping().update(Individual._doc_type.mapping)
-    # Remove the index if it already exists
+    # The model's settings (e.g. its ingest pipeline), but no replicas,
+    # so that the index (and its clones) are quickly ready on a single node
+    idx.settings(**Individual._index._settings, number_of_replicas=0)
     if idx.exists():
         idx.delete()
-    # Create the index with mapping
+    put_pipelines(client, Individual)
     idx.create()
 
     # Register teardown
     request.addfinalizer(idx.delete)
 
-    # Load data from file
     with RAW_INDIVIDUALS_DUMP.open('r') as fb:
-        raw_data = json.load(fb)
+        bulk_load(client, iter_json_array(fb), model=Individual, index=idx_name)
 
-    # Load as objects
-    indvs = [Individual(**props) for props in raw_data]
+    # Block writes, which both protects the shared data and allows cloning it
+    idx.put_settings(body={'index.blocks.write': True})
+    client.cluster.health(index=idx_name, wait_for_status='green')
+    return idx_name
 
-    # Persist the items
-    for i, indv in enumerate(indvs):
-        indv.save(index=idx_name, using=gumby_client)
 
-    # Refresh to ensure all shards are up-to-date and ready for requests
-    idx.refresh()
+@pytest.fixture
+def gumby_readonly_faux_index_data(
+    gumby_readonly_individual_index_name, gumby_faux_individuals
+):
+    """Like ``gumby_faux_index_data``, but loaded into the shared read-only index
+    (see ``gumby_readonly_individual_index_name``)
+
+    """
+    return {Individual: gumby_faux_individuals}
+
+
+@pytest.fixture
+def gumby_faux_index_data(
+    request,
+    gumby_client,
+    gumby_individual_index_name,
+    gumby_readonly_individual_index_name,
+    gumby_faux_individuals,
+):
+    """Testing data loaded into an index of its own (``gumby_individual_index_name``).
+    The index is a cheap ``_clone`` of the shared, session-wide index.
+
+    """
+    client = gumby_client
+    idx_name = gumby_individual_index_name
+    idx = dsl.Index(name=idx_name, using=client)
+
+    # Remove the index if it already exists
+    if idx.exists():
+        idx.delete()
+    # Clone the data, without the source's write block
+    client.indices.clone(
+        index=gumby_readonly_individual_index_name,
+        target=idx_name,
+        body={'settings': {'index.blocks.write': None}},
+        wait_for_active_shards='all',
+    )
+
+    # Register teardown
+    request.addfinalizer(idx.delete)
 
-    return {Individual: indvs}
+    return {Individual: gumby_faux_individuals}
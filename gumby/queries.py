@@ -0,0 +1,72 @@
+from elasticsearch_dsl import Q
+
+__all__ = ('encounter_count_at_least', 'has_encounter')
+
+
+def encounter_count_at_least(count):
+    """Query for individuals with at least ``count`` encounters"""
+    return Q('range', encounter_count={'gte': count})
+
+
+def _summary_filters(taxonomy, submitter_id, has_annotation, after, before):
+    # Conditions on the summary fields (see ``gumby.pipelines``)
+    # that are true of an individual with a matching encounter
+    filters = []
+    if taxonomy is not None:
+        filters.append(Q('term', encounter_taxonomies=taxonomy))
+    if submitter_id is not None:
+        filters.append(Q('term', encounter_submitters=submitter_id))
+    if has_annotation:
+        filters.append(Q('term', has_annotated_encounter=True))
+    if after is not None:
+        filters.append(Q('range', last_sighting={'gte': after}))
+    if before is not None:
+        filters.append(Q('range', first_sighting={'lte': before}))
+    return filters
+
+
+def has_encounter(
+    taxonomy=None, submitter_id=None, has_annotation=None, after=None, before=None
+):
+    """Query for individuals with an encounter matching all of the given criteria
+    (its ``taxonomy``, ``submitter_id``, ``has_annotation`` and
+    a ``date_occurred`` on or ``after`` and on or ``before`` the given dates).
+
+    A single criterion is answered by the individual's flat summary fields,
+    which is much faster than a ``nested`` query.
+    A ``nested`` query is only used when several criteria must hold for the same encounter
+    (or for a date range or encounters without an annotation), and is combined with
+    the summary fields' filters to narrow down the individuals it runs against.
+
+    """
+    criteria = {
+        'taxonomy': taxonomy,
+        'submitter_id': submitter_id,
+        'has_annotation': has_annotation,
+    }
+    conditions = [
+        Q('term', **{f'encounters__{name}': value})
+        for name, value in criteria.items()
+        if value is not None
+    ]
+    if after is not None or before is not None:
+        date_range = {}
+        if after is not None:
+            date_range['gte'] = after
+        if before is not None:
+            date_range['lte'] = before
+        conditions.append(Q('range', encounters__date_occurred=date_range))
+
+    filters = _summary_filters(taxonomy, submitter_id, has_annotation, after, before)
+    if (
+        len(conditions) > 1
+        or has_annotation is False
+        # The first and last sightings can't tell if an encounter is between them
+        or (after is not None and before is not None)
+    ):
+        filters.append(Q('nested', path='encounters', query=Q('bool', filter=conditions)))
+    elif not conditions:
+        return Q('range', encounter_count={'gt': 0})
+    if len(filters) == 1:
+        return filters[0]
+    return Q('bool', filter=filters)
@@ -0,0 +1,96 @@
+from .partitions import PartitionedSearch, _conjuncts
+
+__all__ = ('RoutedSearch', 'ShardRouting', 'route_model')
+
+#: Most routing values a search is sent with, beyond which it searches every shard
+MAX_ROUTING_VALUES = 10
+
+
+class ShardRouting:
+    """Routing of a ``model``'s documents to shards by the value of their ``field``
+    (e.g. ``taxonomy``), so searches filtered to a single value (or a few)
+    only query the shards holding its documents.
+    Documents without a value are routed by their id.
+
+    The mapping requires a routing value, so writes (and gets) without one are rejected
+    rather than landing on the wrong shard. The value of the field must not change
+    once a document is written, as that would leave a copy on its former shard.
+
+    """
+
+    def __init__(self, model, field='taxonomy'):
+        if field not in model._doc_type.mapping:
+            raise ValueError(f"{model.__name__} has no field '{field}'")
+        self.model = model
+        self.field = field
+
+    def routing_for(self, source):
+        """Routing value of a document's ``_source`` (or dictionary of its properties)"""
+        value = source.get(self.field)
+        if value is None:
+            value = source.get('id')
+        if value is None:
+            raise ValueError(f"cannot route a document without '{self.field}' or 'id'")
+        return str(value)
+
+    def routing_for_query(self, query):
+        """Routing of the only shards the ``query`` can match documents in,
+        or None when it isn't limited to a few values of the field
+
+        """
+        values = None
+        for clause in _conjuncts(query):
+            if self.field in clause.get('term', {}):
+                value = clause['term'][self.field]
+                found = {value.get('value') if isinstance(value, dict) else value}
+            elif isinstance(clause.get('terms', {}).get(self.field), list):
+                found = set(clause['terms'][self.field])
+            else:
+                continue
+            values = found if values is None else values & found
+        if not values or len(values) > MAX_ROUTING_VALUES:
+            return None
+        values = [str(value) for value in values]
+        if any(',' in value for value in values):
+            # Routing values are comma separated
+            return None
+        return ','.join(sorted(values))
+
+
+class RoutedSearch(PartitionedSearch):
+    """``Search`` of a routed model, which only queries the shards
+    its filters on the routing field allow (see ``prune``)
+
+    """
+
+    @property
+    def _shard_routing(self):
+        if len(self._doc_type) == 1:
+            return getattr(self._doc_type[0], '_shard_routing', None)
+        return None
+
+    def prune(self):
+        """Copy of the search narrowed down to the partitions its date filters overlap
+        and the shards its routing field filters allow
+
+        """
+        s = super().prune()
+        shard_routing = self._shard_routing
+        if shard_routing is None or 'routing' in self._params:
+            return s
+        routing = shard_routing.routing_for_query(self.to_dict().get('query', {}))
+        if routing is None:
+            return s
+        return s.params(routing=routing)
+
+
+def route_model(model, field='taxonomy'):
+    """Opt the ``model`` (e.g. ``Individual`` or ``Encounter``) into routing its documents
+    to shards by their ``field`` (see ``ShardRouting``), before its index is initialized.
+    An existing index is reported as needing a reindex.
+    Returns the model's ``ShardRouting``.
+
+    """
+    model._shard_routing = ShardRouting(model, field=field)
+    model._doc_type.mapping.meta('_routing', required=True)
+    return model._shard_routing
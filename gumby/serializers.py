@@ -0,0 +1,69 @@
+from elasticsearch.serializer import JSONSerializer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+__all__ = ('OrjsonSerializer', 'bulk_body', 'get_serializer')
+
+
+class OrjsonSerializer(JSONSerializer):
+    """JSON serializer using the (optional) ``orjson`` library (``pip install gumby[fast]``),
+    which encodes ``uuid.UUID``, ``StrEnum`` and ``datetime`` values natively.
+
+    ``dumps`` returns text, as the ``elasticsearch.helpers`` expect,
+    while ``dumps_bytes`` skips decoding the encoded bytes (see ``bulk_body``).
+
+    """
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError('OrjsonSerializer requires the orjson library')
+
+    def dumps_bytes(self, data):
+        if isinstance(data, bytes):
+            return data
+        if isinstance(data, str):
+            return data.encode('utf-8', 'surrogatepass')
+        try:
+            return orjson.dumps(
+                data, default=self.default, option=orjson.OPT_NON_STR_KEYS
+            )
+        except TypeError:
+            # e.g. integers larger than 64 bits, which only the stdlib encodes
+            return super().dumps(data).encode('utf-8', 'surrogatepass')
+
+    def dumps(self, data):
+        if isinstance(data, str):
+            return data
+        return self.dumps_bytes(data).decode('utf-8')
+
+    def loads(self, s):
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # e.g. integers larger than 64 bits, which only the stdlib decodes
+            return super().loads(s)
+
+
+def get_serializer():
+    """The fastest serializer available, ``OrjsonSerializer`` when ``orjson`` is installed"""
+    if orjson is None:
+        return JSONSerializer()
+    return OrjsonSerializer()
+
+
+def bulk_body(serializer, lines):
+    """Encode the ``lines`` of a ``_bulk`` request (actions and sources)
+    as a newline delimited JSON body, directly to bytes when the ``serializer`` can
+
+    """
+    dumps = getattr(serializer, 'dumps_bytes', None)
+    if dumps is None:
+        return ''.join(serializer.dumps(line) + '\n' for line in lines).encode('utf-8')
+    body = bytearray()
+    for line in lines:
+        body += dumps(line)
+        body += b'\n'
+    return bytes(body)
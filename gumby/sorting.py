@@ -0,0 +1,101 @@
+from .models import Encounter, Individual
+
+__all__ = (
+    'index_sort',
+    'latest_encounters',
+    'matches_index_sort',
+    'recent_individuals',
+    'sort_by_index',
+)
+
+#: Number of documents in a recent activity feed
+DEFAULT_FEED_SIZE = 20
+
+
+def _as_list(value):
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def index_sort(model):
+    """The ``model``'s index sort (its ``sort.field`` and ``sort.order`` settings),
+    as a list of ``(field, order)`` pairs
+
+    """
+    settings = model._index._settings
+    fields = settings.get('index.sort.field', settings.get('sort.field'))
+    if fields is None:
+        return []
+    fields = _as_list(fields)
+    orders = _as_list(settings.get('index.sort.order', settings.get('sort.order', [])))
+    return [
+        (field, orders[i] if i < len(orders) else 'asc') for i, field in enumerate(fields)
+    ]
+
+
+def _normalize(sort):
+    # ``(field, order)`` pairs of a search's sort, or None when it has other options
+    pairs = []
+    for item in sort:
+        if isinstance(item, str):
+            field, order = (item[1:], 'desc') if item.startswith('-') else (item, 'asc')
+        elif len(item) == 1:
+            ((field, options),) = item.items()
+            if isinstance(options, str):
+                order = options
+            elif set(options) <= {'order'}:
+                order = options.get('order', 'asc')
+            else:
+                return None
+        else:
+            return None
+        if field == '_score':
+            return None
+        pairs.append((field, order))
+    return pairs
+
+
+def matches_index_sort(s):
+    """Whether the search ``s`` is sorted like its model's index (or by a prefix of it),
+    so each shard can stop collecting hits early
+
+    """
+    if len(s._doc_type) != 1:
+        return False
+    sort = index_sort(s._doc_type[0])
+    requested = _normalize(s.to_dict().get('sort', []))
+    return bool(sort and requested) and requested == sort[: len(requested)]
+
+
+def sort_by_index(s):
+    """Copy of the search ``s`` sorted like its model's index and without counting
+    the total number of hits, which lets the shards terminate early.
+    The search's own sort is kept when it's a prefix of the index sort.
+
+    """
+    if not matches_index_sort(s):
+        sort = index_sort(s._doc_type[0]) if len(s._doc_type) == 1 else []
+        if not sort:
+            raise ValueError('the search is not of a model with an index sort')
+        s = s.sort(*[{field: {'order': order}} for field, order in sort])
+    return s.extra(track_total_hits=False)
+
+
+def recent_individuals(query=None, size=DEFAULT_FEED_SIZE, using=None):
+    """Search of the most recently sighted individuals (matching the ``query``).
+    The individuals index isn't sorted (it has nested fields), so the shards can't
+    terminate early, but the total number of hits still isn't counted.
+
+    """
+    s = Individual.search(using=using)
+    if query is not None:
+        s = s.filter(query)
+    s = s.sort({'last_sighting': {'order': 'desc'}})
+    return s.extra(track_total_hits=False)[:size]
+
+
+def latest_encounters(query=None, size=DEFAULT_FEED_SIZE, using=None):
+    """Search of the latest encounters (matching the ``query``)"""
+    s = Encounter.search(using=using)
+    if query is not None:
+        s = s.filter(query)
+    return sort_by_index(s)[:size]
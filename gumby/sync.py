@@ -0,0 +1,261 @@
+import itertools
+import json
+from collections import namedtuple
+from pathlib import Path
+
+from elasticsearch.helpers import streaming_bulk
+
+from .cache import invalidate_index, refresh_index
+from .codecs import get_codec
+from .dump import iter_ndjson, open_dump
+from .ingest import DEFAULT_CHUNK_SIZE
+from .models import Encounter, Individual, get_model
+from .pagination import iter_hits
+from .updates import _ensure_scripts, iter_update_encounters_actions
+
+__all__ = (
+    'Change',
+    'InMemoryChangeSource',
+    'NDJSONChangeSource',
+    'Watermark',
+    'sync_changes',
+)
+
+#: ``Encounter`` fields copied into the ``Individual.encounters`` they appear in,
+#: as ``<encounter field>: <individual encounter field>``
+PROPAGATED_ENCOUNTER_FIELDS = {
+    'point': 'point',
+    'sex': 'sex',
+    'taxonomy': 'taxonomy',
+    'living_status': 'animate_status',
+    'datetime': 'date_occurred',
+}
+
+#: Default ``index.max_inner_result_window``, the most inner hits returned per hit
+MAX_INNER_HITS = 100
+
+#: A changed (or ``deleted``) record of a ``model``, given as a dictionary
+#: of its properties (``data``, which must include the ``id``).
+#: The ``version`` (e.g. a modification timestamp in milliseconds) is an integer
+#: that increases with every change in the feed, and is used as the document's
+#: external version and the feed's watermark.
+Change = namedtuple('Change', ('model', 'version', 'data', 'deleted'), defaults=(False,))
+
+
+class InMemoryChangeSource:
+    """Change feed kept in memory (e.g. a stand-in for Houston in tests)"""
+
+    def __init__(self, changes=()):
+        self._changes = list(changes)
+
+    def add(self, model, version, data, deleted=False):
+        self._changes.append(Change(model, version, data, deleted))
+
+    def changes(self, since=None):
+        """Changes with a version greater than ``since``, in version order"""
+        changes = sorted(self._changes, key=lambda c: c.version)
+        return [c for c in changes if since is None or c.version > since]
+
+
+class NDJSONChangeSource:
+    """Change feed read from a newline delimited JSON file (optionally gzipped),
+    with lines like ``{"model": "encounter", "version": 2, "data": {...}, "deleted": false}``
+    in version order
+
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def changes(self, since=None):
+        """Changes with a version greater than ``since``, in version order"""
+        with open_dump(self.path) as fp:
+            for record in iter_ndjson(fp):
+                if since is not None and record['version'] <= since:
+                    continue
+                yield Change(
+                    get_model(record['model']),
+                    record['version'],
+                    record['data'],
+                    record.get('deleted', False),
+                )
+
+
+class Watermark:
+    """Version of the last change synced, persisted as a JSON file at ``path``"""
+
+    def __init__(self, path=None):
+        self.path = None if path is None else Path(path)
+        self.value = None
+        if self.path is not None and self.path.exists():
+            self.value = json.loads(self.path.read_text())['watermark']
+
+    def save(self, value):
+        self.value = value
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so a kill mid-write never corrupts the watermark
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps({'watermark': value}))
+        tmp.replace(self.path)
+
+
+def _to_action(change):
+    model = change.model
+    if change.deleted:
+        index = model._index._name
+        partitioning = model._partitioning
+        if partitioning is not None:
+            # Deletes of partitioned models have to carry the document's date
+            index = partitioning.index_for(change.data.get(partitioning.field))
+        action = {'_op_type': 'delete', '_index': index, '_id': str(change.data['id'])}
+        if model._shard_routing is not None:
+            # and the value they're routed by
+            action['routing'] = model._shard_routing.routing_for(change.data)
+    else:
+        action = get_codec(model).to_action(change.data)
+    action['version'] = change.version
+    action['version_type'] = 'external'
+    return action
+
+
+def _is_skipped(info):
+    # Changes older than (or replays of) those already written,
+    # and deletes of documents that were never written
+    op_type, result = next(iter(info.items()))
+    return result['status'] == 409 or (op_type == 'delete' and result['status'] == 404)
+
+
+def _bulk(client, actions):
+    # Whether each of the actions was written (or skipped), in order
+    written = []
+    for ok, info in streaming_bulk(
+        client, actions, raise_on_error=False, raise_on_exception=False
+    ):
+        if ok:
+            written.append(True)
+        elif _is_skipped(info):
+            written.append(False)
+        else:
+            raise RuntimeError(f'failed to sync change: {info!r}')
+    return written
+
+
+def _propagate_encounters(client, encounters):
+    """Apply the changed ``encounters`` (fields by encounter id, or None when deleted)
+    to the individuals they belong to. Returns the number of individuals changed.
+
+    """
+    query = {
+        'query': {
+            'nested': {
+                'path': 'encounters',
+                'query': {'terms': {'encounters.id': list(encounters)}},
+                'inner_hits': {
+                    '_source': False,
+                    'docvalue_fields': ['encounters.id'],
+                    'size': min(len(encounters), MAX_INNER_HITS),
+                },
+            }
+        },
+        '_source': False,
+    }
+    index = Individual._index._name
+    updates = []
+    routings = {}
+    for hit in iter_hits(client, index, body=query):
+        if '_routing' in hit:
+            routings[hit['_id']] = hit['_routing']
+        inner_hits = hit['inner_hits']['encounters']['hits']
+        if inner_hits['total']['value'] > len(inner_hits['hits']):
+            # Too many to list, the script ignores those the individual doesn't have
+            matched = list(encounters)
+        else:
+            matched = [
+                inner['fields']['encounters.id'][0] for inner in inner_hits['hits']
+            ]
+        changed = {id: encounters[id] for id in matched if encounters[id] is not None}
+        removed = [id for id in matched if encounters[id] is None]
+        updates.append((hit['_id'], changed, removed))
+    if not updates:
+        return 0
+
+    _ensure_scripts(client)
+    actions = iter_update_encounters_actions(updates, index=index)
+    if routings:
+        # Updates of routed individuals go to the shard of their routing
+        actions = (dict(a, routing=routings[a['_id']]) for a in actions)
+    success = 0
+    for ok, info in streaming_bulk(client, actions, raise_on_error=False):
+        if ok:
+            success += 1
+        elif info['update']['status'] != 404:
+            # Individuals deleted in the meantime are skipped
+            raise RuntimeError(f'failed to propagate encounter changes: {info!r}')
+    return success
+
+
+def _encounter_fields(change, action):
+    if change.deleted:
+        return None
+    source = action['_source']
+    return {
+        target: source.get(name)
+        for name, target in PROPAGATED_ENCOUNTER_FIELDS.items()
+        if name in change.data
+    }
+
+
+def sync_changes(client, source, watermark_path=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write the changes in the feed since the last sync (as read from ``watermark_path``).
+
+    Changes are read from the ``source`` (any object with a ``changes(since)`` method,
+    e.g. ``NDJSONChangeSource``) and written in chunks of ``chunk_size``
+    with their version as an external version, so replaying changes is harmless:
+    changes older than the document already written are skipped.
+    The encounter changes written are then applied to the ``Individual.encounters``
+    they appear in, without rewriting anything else.
+    The watermark is saved after each chunk, so an interrupted sync resumes where it stopped.
+
+    Returns the totals of changes ``written`` and ``skipped``,
+    the number of ``individuals`` the encounter changes were applied to
+    and the new ``watermark``.
+
+    """
+    watermark = Watermark(watermark_path)
+    changes = iter(source.changes(watermark.value))
+    totals = {'written': 0, 'skipped': 0, 'individuals': 0}
+    # Whether individuals were written since the index was last refreshed
+    unrefreshed = False
+
+    while True:
+        chunk = list(itertools.islice(changes, chunk_size))
+        if not chunk:
+            break
+        actions = [_to_action(change) for change in chunk]
+        written = _bulk(client, actions)
+        totals['written'] += sum(written)
+        totals['skipped'] += len(written) - sum(written)
+
+        indices = {change.model._index._name for change in chunk}
+        unrefreshed = unrefreshed or Individual._index._name in indices
+        # Skipped changes are stale, and mustn't be applied to the individuals either
+        encounters = {
+            str(change.data['id']): _encounter_fields(change, action)
+            for change, action, ok in zip(chunk, actions, written)
+            if ok and change.model is Encounter
+        }
+        if encounters:
+            if unrefreshed:
+                # Make the individuals written (in this chunk or before) searchable
+                refresh_index(client, Individual._index._name)
+                unrefreshed = False
+            totals['individuals'] += _propagate_encounters(client, encounters)
+            indices.add(Individual._index._name)
+
+        invalidate_index(*indices)
+        watermark.save(max(change.version for change in chunk))
+
+    totals['watermark'] = watermark.value
+    return totals
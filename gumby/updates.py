@@ -0,0 +1,297 @@
+import hashlib
+import threading
+import weakref
+
+from elasticsearch.helpers import streaming_bulk
+
+from .cache import invalidate_index, refresh_index
+from .codecs import get_codec
+from .ingest import DEFAULT_CHUNK_SIZE, DEFAULT_MAX_CHUNK_BYTES
+from .models import Individual, IndividualEncounter
+from .pipelines import SUMMARIZE_ENCOUNTERS_SNIPPET
+
+__all__ = (
+    'append_encounters',
+    'bulk_append_encounters',
+    'iter_append_encounters_actions',
+    'iter_update_encounters_actions',
+    'put_scripts',
+)
+
+#: Stores the sightings summarized by ``SUMMARIZE_ENCOUNTERS_SNIPPET``.
+#: Without dated encounters, sightings given to the individual are kept,
+#: unless encounters (that may have held the dates) were ``replaced`` or removed.
+_STORE_SIGHTINGS = """
+if (last != null) {
+  doc.first_sighting = first;
+  doc.last_sighting = last;
+} else if (replaced) {
+  doc.remove('first_sighting');
+  doc.remove('last_sighting');
+}
+"""
+
+#: Adds the ``params.encounters`` to an individual, replacing those with the same ``id``,
+#: and keeps the summary fields (see ``gumby.pipelines``) up-to-date, as the ingest
+#: pipeline doesn't run on updates. Nothing is written when the encounters are
+#: already present as given.
+APPEND_ENCOUNTERS_SCRIPT = (
+    """
+def doc = ctx._source;
+def encounters = doc.encounters;
+if (encounters == null) {
+  encounters = new ArrayList();
+} else if (!(encounters instanceof List)) {
+  encounters = [encounters];
+}
+boolean changed = false;
+boolean replaced = false;
+for (def encounter : params.encounters) {
+  int i = 0;
+  while (i < encounters.size() && encounters[i].id != encounter.id) {
+    i++;
+  }
+  if (i == encounters.size()) {
+    encounters.add(encounter);
+    changed = true;
+  } else if (encounters[i] != encounter) {
+    encounters[i] = encounter;
+    changed = true;
+    replaced = true;
+  }
+}
+if (changed) {
+  doc.encounters = encounters;
+"""
+    + SUMMARIZE_ENCOUNTERS_SNIPPET
+    + _STORE_SIGHTINGS
+    + """
+} else {
+  ctx.op = 'noop';
+}
+"""
+)
+
+#: Updates the fields given in ``params.encounters`` (by encounter id)
+#: of an individual's existing encounters, removes those in ``params.removed``,
+#: and keeps the summary fields up-to-date (like ``APPEND_ENCOUNTERS_SCRIPT``).
+#: Encounters are never added, and nothing is written when nothing changed.
+UPDATE_ENCOUNTERS_SCRIPT = (
+    """
+def doc = ctx._source;
+def encounters = doc.encounters;
+if (encounters == null) {
+  encounters = new ArrayList();
+} else if (!(encounters instanceof List)) {
+  encounters = [encounters];
+}
+boolean changed = false;
+boolean replaced = false;
+for (int i = encounters.size() - 1; i >= 0; i--) {
+  def encounter = encounters[i];
+  if (params.removed.contains(encounter.id)) {
+    encounters.remove(i);
+    changed = true;
+    replaced = true;
+    continue;
+  }
+  def fields = params.encounters[encounter.id];
+  if (fields != null) {
+    for (def entry : fields.entrySet()) {
+      if (encounter[entry.getKey()] != entry.getValue()) {
+        encounter[entry.getKey()] = entry.getValue();
+        changed = true;
+        replaced = replaced || entry.getKey() == 'date_occurred';
+      }
+    }
+  }
+}
+if (changed) {
+  doc.encounters = encounters;
+"""
+    + SUMMARIZE_ENCOUNTERS_SNIPPET
+    + _STORE_SIGHTINGS
+    + """
+} else {
+  ctx.op = 'noop';
+}
+"""
+)
+
+
+def _script_id(name, source):
+    # Stored script ids include a hash of the source,
+    # so a changed script never replaces one still used by older code
+    return f'gumby-{name}-' + hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+
+
+APPEND_ENCOUNTERS_SCRIPT_ID = _script_id('append-encounters', APPEND_ENCOUNTERS_SCRIPT)
+UPDATE_ENCOUNTERS_SCRIPT_ID = _script_id('update-encounters', UPDATE_ENCOUNTERS_SCRIPT)
+
+#: Retries of an update that conflicts with a concurrent write to the same individual
+RETRY_ON_CONFLICT = 3
+
+#: Clients the stored scripts have been put with
+_clients_with_scripts = weakref.WeakSet()
+_scripts_lock = threading.Lock()
+
+
+def put_scripts(client):
+    """Store the scripts used by the partial updates in the cluster"""
+    for script_id, source in (
+        (APPEND_ENCOUNTERS_SCRIPT_ID, APPEND_ENCOUNTERS_SCRIPT),
+        (UPDATE_ENCOUNTERS_SCRIPT_ID, UPDATE_ENCOUNTERS_SCRIPT),
+    ):
+        client.put_script(
+            id=script_id, body={'script': {'lang': 'painless', 'source': source}}
+        )
+
+
+def _ensure_scripts(client):
+    with _scripts_lock:
+        if client not in _clients_with_scripts:
+            put_scripts(client)
+            _clients_with_scripts.add(client)
+
+
+def _script(encounters, validate):
+    codec = get_codec(IndividualEncounter)
+    if isinstance(encounters, (dict, IndividualEncounter)):
+        encounters = [encounters]
+    return {
+        'id': APPEND_ENCOUNTERS_SCRIPT_ID,
+        'params': {
+            'encounters': [codec.to_source(e, validate=validate) for e in encounters]
+        },
+    }
+
+
+def append_encounters(
+    client,
+    individual_id,
+    encounters,
+    index=None,
+    refresh=False,
+    trusted=False,
+    routing=None,
+):
+    """Add ``encounters`` to an individual, or replace those with the same ``id``,
+    updating its ``last_sighting`` in the same request.
+
+    Only the encounters are sent, and applied by a stored script,
+    rather than loading and saving the whole individual.
+    ``encounters`` may be one or many ``IndividualEncounter`` instances
+    or dictionaries of their properties.
+    Validation is skipped for ``trusted`` encounters.
+    The ``routing`` of routed individuals is required (see ``gumby.route_model``).
+
+    Returns the update response, with a ``result`` of ``noop``
+    when the individual already has the encounters as given.
+
+    """
+    if index is None:
+        index = Individual._index._name
+    _ensure_scripts(client)
+    params = {} if routing is None else {'routing': routing}
+    resp = client.update(
+        index=index,
+        id=str(individual_id),
+        body={'script': _script(encounters, validate=not trusted)},
+        refresh=refresh,
+        retry_on_conflict=RETRY_ON_CONFLICT,
+        **params,
+    )
+    invalidate_index(index)
+    return resp
+
+
+def iter_append_encounters_actions(updates, index=None, trusted=False):
+    """Lazily translate ``updates``, as ``(individual_id, encounters)`` pairs
+    (or ``(individual_id, encounters, routing)`` for routed individuals),
+    into bulk update actions (see ``append_encounters``)
+
+    """
+    if index is None:
+        index = Individual._index._name
+    validate = not trusted
+    for individual_id, encounters, *routing in updates:
+        action = {
+            '_op_type': 'update',
+            '_index': index,
+            '_id': str(individual_id),
+            'retry_on_conflict': RETRY_ON_CONFLICT,
+            'script': _script(encounters, validate=validate),
+        }
+        if routing:
+            action['routing'] = routing[0]
+        yield action
+
+
+def iter_update_encounters_actions(updates, index=None):
+    """Lazily translate ``updates``, as ``(individual_id, encounters, removed)`` triples,
+    into bulk update actions that change the individual's existing encounters.
+    ``encounters`` maps encounter ids to the (serialized) fields to change,
+    and ``removed`` are the ids of the encounters to remove.
+
+    """
+    if index is None:
+        index = Individual._index._name
+    for individual_id, encounters, removed in updates:
+        yield {
+            '_op_type': 'update',
+            '_index': index,
+            '_id': str(individual_id),
+            'retry_on_conflict': RETRY_ON_CONFLICT,
+            'script': {
+                'id': UPDATE_ENCOUNTERS_SCRIPT_ID,
+                'params': {
+                    'encounters': {str(k): v for k, v in encounters.items()},
+                    'removed': [str(id) for id in removed],
+                },
+            },
+        }
+
+
+def bulk_append_encounters(
+    client,
+    updates,
+    index=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    max_chunk_bytes=DEFAULT_MAX_CHUNK_BYTES,
+    refresh=False,
+    trusted=False,
+    raise_on_error=True,
+):
+    """Batch version of ``append_encounters`` using the ``_bulk`` API.
+    ``updates`` are ``(individual_id, encounters)`` pairs
+    (or ``(individual_id, encounters, routing)``), consumed lazily.
+    Group the encounters of an individual into one pair where possible,
+    as each pair is a separate update of the individual.
+
+    Returns a tuple of the number of successfully updated individuals
+    and a list of errors (only populated when ``raise_on_error`` is false).
+
+    """
+    if index is None:
+        index = Individual._index._name
+    _ensure_scripts(client)
+    actions = iter_append_encounters_actions(updates, index=index, trusted=trusted)
+
+    success, errors = 0, []
+    for ok, info in streaming_bulk(
+        client,
+        actions,
+        chunk_size=chunk_size,
+        max_chunk_bytes=max_chunk_bytes,
+        raise_on_error=raise_on_error,
+    ):
+        if ok:
+            success += 1
+        else:
+            errors.append(info)
+
+    if refresh:
+        refresh_index(client, index)
+    else:
+        invalidate_index(index)
+    return success, errors
@@ -0,0 +1,150 @@
+from collections import namedtuple
+
+from elasticsearch_dsl.connections import get_connection
+
+from .codecs import get_codec
+from .models import Encounter, Individual, Sighting
+from .pagination import DEFAULT_PAGE_SIZE, iter_hits
+
+__all__ = ('View', 'get_view', 'register_view')
+
+#: Registered views, as ``{(model, name): view}``
+_views = {}
+
+
+def _first(values):
+    if isinstance(values, list):
+        return values[0] if values else None
+    return values
+
+
+def _docvalue_decoder(codec):
+    # Doc values are always lists, which single valued fields are unpacked from
+    if codec.field._multi:
+        return codec.decode
+    decode = codec.decode
+    return lambda values: decode(_first(values))
+
+
+class View:
+    """Named projection of a ``model``'s documents onto some of its (top-level) fields,
+    read from ``_source`` (``fields``) or from doc values (``docvalue_fields``).
+
+    Hits are hydrated into lightweight, read-only records (named tuples)
+    of the fields' python values, rather than ``Document`` instances.
+    Use ``get_view`` to look up the views registered with ``register_view``.
+
+    """
+
+    def __init__(self, model, name, fields=(), docvalue_fields=()):
+        self.model = model
+        self.name = name
+        self.fields = tuple(fields)
+        self.docvalue_fields = tuple(docvalue_fields)
+        codec = get_codec(model)
+        names = self.fields + self.docvalue_fields
+        unknown = [n for n in names if n not in codec.fields]
+        if unknown:
+            raise ValueError(f'{model.__name__} has no fields {unknown!r}')
+        self.record = namedtuple(f'{model.__name__}_{name}', names)
+        self._source_decoders = [codec.fields[n].decode for n in self.fields]
+        self._docvalue_decoders = [
+            _docvalue_decoder(codec.fields[n]) for n in self.docvalue_fields
+        ]
+
+    def __repr__(self):
+        return f'<View {self.model.__name__}.{self.name}>'
+
+    def _body(self):
+        body = {'_source': list(self.fields) if self.fields else False}
+        if self.docvalue_fields:
+            body['docvalue_fields'] = list(self.docvalue_fields)
+        return body
+
+    def search(self, using=None, index=None):
+        """``Search`` of the model's documents, fetching only the view's fields"""
+        s = self.model.search(using=using, index=index)
+        return s.extra(**self._body())
+
+    def from_hit(self, hit):
+        """Hydrate a (raw) search hit into the view's record"""
+        source = hit.get('_source', {})
+        fields = hit.get('fields', {})
+        values = [
+            decode(source.get(n)) for decode, n in zip(self._source_decoders, self.fields)
+        ]
+        values.extend(
+            decode(fields.get(n))
+            for decode, n in zip(self._docvalue_decoders, self.docvalue_fields)
+        )
+        return self.record(*values)
+
+    def execute(self, search=None):
+        """Execute the ``search`` (defaults to ``self.search()``),
+        returning the view's records of the hits.
+        The raw response is parsed directly, without building ``Response`` objects.
+
+        """
+        if search is None:
+            search = self.search()
+        if hasattr(search, 'prune'):
+            search = search.prune()
+        es = get_connection(search._using)
+        body = {**search.to_dict(), **self._body()}
+        raw = es.search(index=search._index, body=body, **search._params)
+        from_hit = self.from_hit
+        return [from_hit(hit) for hit in raw['hits']['hits']]
+
+    def iter(self, query=None, page_size=DEFAULT_PAGE_SIZE, using=None, index=None):
+        """Iterate over the view's records of every document matching the ``query``,
+        in constant memory (see ``gumby.iter_documents``)
+
+        """
+        client = get_connection(using or self.model._index._using)
+        body = self._body()
+        if query is not None:
+            body['query'] = query if isinstance(query, dict) else query.to_dict()
+        hits = iter_hits(
+            client,
+            index or self.model._index._name,
+            body=body,
+            page_size=page_size,
+            prefetch=True,
+        )
+        from_hit = self.from_hit
+        for hit in hits:
+            yield from_hit(hit)
+
+
+def register_view(model, name, fields=(), docvalue_fields=()):
+    """Register a named ``View`` of the ``model``"""
+    view = View(model, name, fields=fields, docvalue_fields=docvalue_fields)
+    _views[(model, name)] = view
+    return view
+
+
+def get_view(model, name):
+    """Look up the ``model``'s view named ``name``"""
+    try:
+        return _views[(model, name)]
+    except KeyError:
+        raise LookupError(f"{model.__name__} has no view named '{name}'") from None
+
+
+# Pages of results
+register_view(
+    Individual, 'summary', fields=('id', 'name', 'alias', 'sex', 'last_sighting')
+)
+register_view(Encounter, 'summary', fields=('id', 'taxonomy', 'sex', 'datetime'))
+register_view(
+    Sighting, 'summary', fields=('id', 'datetime', 'time_specificity', 'taxonomy')
+)
+
+# Doc values only, without loading any ``_source``
+register_view(
+    Individual,
+    'sightings',
+    docvalue_fields=('id', 'first_sighting', 'last_sighting', 'encounter_count'),
+)
+register_view(Encounter, 'location', docvalue_fields=('id', 'point', 'datetime'))
+register_view(Sighting, 'location', docvalue_fields=('id', 'point', 'datetime'))
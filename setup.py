@@ -107,7 +107,10 @@ def do_setup():
     # Define requirements
     requirements = parse_requirements('requirements.txt')
     # Define optional requirements (e.g. `pip install ".[testing]"`)
-    optional_requirements = {}
+    optional_requirements = {
+        'async': ['aiohttp'],
+        'fast': ['orjson'],
+    }
 
     setup(
         name=NAME,
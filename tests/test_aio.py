@@ -0,0 +1,187 @@
+import asyncio
+import json
+from unittest import mock
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+import elasticsearch.exceptions  # noqa: E402
+from elasticsearch import AsyncTransport  # noqa: E402
+
+from gumby.aio import (  # noqa: E402
+    AsyncClient,
+    AsyncMultiSearchDispatcher,
+    bulk_load,
+    initialize_indexes_by_model,
+    iter_hits,
+    search,
+)
+from gumby.dsl import Search  # noqa: E402
+from gumby.factories import make_individual  # noqa: E402
+from gumby.indices import IndexStatus, _index_body  # noqa: E402
+from gumby.models import Encounter, Individual  # noqa: E402
+
+
+def test_async_client__reads_environment(monkeypatch):
+    monkeypatch.setenv('ELASTICSEARCH_HOSTS', 'es-one,es-two')
+    client = AsyncClient()
+
+    assert client.transport.hosts == [{'host': 'es-one'}, {'host': 'es-two'}]
+
+
+def test_async_client__bounds_concurrency():
+    in_flight, peak = 0, 0
+
+    async def perform_request(self, method, url, *args, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {'hits': {'total': {'value': 0, 'relation': 'eq'}, 'hits': []}}
+
+    async def main():
+        client = AsyncClient(hosts=['localhost'], max_concurrency=3)
+        searches = [search(client, Search(index='individuals')) for i in range(20)]
+        return await asyncio.gather(*searches)
+
+    with mock.patch.object(AsyncTransport, 'perform_request', perform_request):
+        responses = asyncio.run(main())
+
+    assert len(responses) == 20
+    assert responses[0].hits.total.value == 0
+    assert peak == 3
+
+
+def test_multi_search_dispatcher():
+    requests = []
+
+    async def perform_request(self, method, url, *args, body=None, **kwargs):
+        requests.append(url)
+        queries = [json.loads(line) for line in body.splitlines()[1::2]]
+        responses = []
+        for q in queries:
+            if q['size'] == 0:
+                responses.append({'error': {'type': 'parsing_exception'}, 'status': 400})
+            else:
+                total = {'value': q['size'], 'relation': 'eq'}
+                responses.append({'hits': {'total': total, 'hits': []}})
+        return {'responses': responses}
+
+    async def main():
+        client = AsyncClient(hosts=['localhost'])
+        dispatcher = AsyncMultiSearchDispatcher(client, max_batch_size=4, max_wait=0.01)
+        searches = [dispatcher.search(Search(index='individuals')[:i]) for i in range(10)]
+        results = await asyncio.gather(*searches, return_exceptions=True)
+        await dispatcher.close()
+        return results
+
+    with mock.patch.object(AsyncTransport, 'perform_request', perform_request):
+        results = asyncio.run(main())
+
+    assert requests == ['/_msearch'] * 3
+    # Each search gets its own response, or error
+    assert isinstance(results[0], elasticsearch.exceptions.RequestError)
+    assert [r.hits.total.value for r in results[1:]] == list(range(1, 10))
+
+
+def test_bulk_load():
+    requests = []
+
+    async def perform_request(self, method, url, *args, body=None, **kwargs):
+        requests.append((method, url))
+        if url.endswith('_bulk'):
+            count = len(body.splitlines()) // 2
+            return {
+                'errors': False,
+                'items': [{'index': {'status': 201}} for i in range(count)],
+            }
+        return {}
+
+    async def docs():
+        for i in range(5):
+            yield make_individual()
+
+    async def main():
+        client = AsyncClient(hosts=['localhost'])
+        return await bulk_load(client, docs(), chunk_size=2)
+
+    with mock.patch.object(AsyncTransport, 'perform_request', perform_request):
+        assert asyncio.run(main()) == (5, [])
+
+    assert requests.count(('POST', '/individuals/_refresh')) == 1
+    assert len([r for r in requests if r[1].endswith('_bulk')]) == 3
+
+
+def test_initialize_indexes_by_model():
+    requests = []
+
+    async def perform_request(self, method, url, *args, **kwargs):
+        requests.append((method, url))
+        if url == '/_alias/individuals':
+            return {'individuals-v2': {'aliases': {'individuals': {}}}}
+        if url == '/individuals-v2/_mapping':
+            return {'individuals-v2': {'mappings': _index_body(Individual)['mappings']}}
+        if method == 'HEAD':
+            return False
+        return {}
+
+    async def main():
+        client = AsyncClient(hosts=['localhost'])
+        return await initialize_indexes_by_model(client, [Individual, Encounter])
+
+    with mock.patch.object(AsyncTransport, 'perform_request', perform_request):
+        report = asyncio.run(main())
+
+    assert report == {Individual: IndexStatus.UNCHANGED, Encounter: IndexStatus.CREATED}
+    assert ('PUT', '/encounters-v1') in requests
+    assert not any(
+        url.startswith('/individuals-v') for method, url in requests if method == 'PUT'
+    )
+
+
+def test_initialize_indexes_by_model__migrates_legacy_index():
+    requests = []
+
+    async def perform_request(self, method, url, *args, **kwargs):
+        requests.append((method, url))
+        if method == 'HEAD':
+            # A legacy index named like the alias
+            return url == '/individuals'
+        if url == '/_reindex':
+            return {'task': 'node:1'}
+        if url.startswith('/_tasks/'):
+            return {'completed': True, 'task': {'status': {}}}
+        return {}
+
+    async def main():
+        client = AsyncClient(hosts=['localhost'])
+        return await initialize_indexes_by_model(client, [Individual])
+
+    with mock.patch.object(AsyncTransport, 'perform_request', perform_request):
+        report = asyncio.run(main())
+
+    # Like ``gumby.init_model_index``
+    assert report == {Individual: IndexStatus.REINDEXED}
+    assert ('PUT', '/individuals-v1') in requests
+    assert ('POST', '/_reindex') in requests
+    assert ('POST', '/_aliases') in requests
+
+
+def test_iter_hits__scroll_fallback():
+    error = 'no handler found for uri [/sightings/_pit] and method [POST]'
+    client = mock.MagicMock()
+    client.open_point_in_time = mock.AsyncMock(
+        side_effect=elasticsearch.exceptions.RequestError(400, error, {'error': error})
+    )
+    page = {'_scroll_id': 'scroll', '_shards': {}, 'hits': {'hits': [{'_id': '1'}]}}
+    client.search = mock.AsyncMock(return_value=page)
+    client.scroll = mock.AsyncMock(return_value=dict(page, hits={'hits': []}))
+    client.clear_scroll = mock.AsyncMock()
+
+    async def main():
+        return [hit async for hit in iter_hits(client, 'sightings')]
+
+    assert asyncio.run(main()) == [{'_id': '1'}]
+    assert client.search.call_args.kwargs['body'] == {'sort': '_doc'}
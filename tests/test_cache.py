@@ -0,0 +1,106 @@
+from unittest import mock
+
+import pytest
+
+from gumby.cache import QueryCache, invalidate_index, refresh_index
+from gumby.dsl import Q, Search
+from gumby.factories import make_individual
+from gumby.models import Individual
+
+
+def make_response(value=1):
+    return {'hits': {'total': {'value': value, 'relation': 'eq'}, 'hits': []}}
+
+
+@pytest.fixture
+def client():
+    client = mock.MagicMock()
+    client.search.side_effect = lambda **kwargs: make_response()
+    return client
+
+
+def nested_query(taxonomy):
+    return Q(
+        'nested',
+        path='encounters',
+        query=Q(
+            'bool',
+            filter=[
+                Q('term', encounters__taxonomy=taxonomy),
+                Q('term', encounters__has_annotation=True),
+            ],
+        ),
+    )
+
+
+def test_query_cache(client):
+    cache = QueryCache()
+    s = Individual.search(using=client).query(nested_query('balaenoptera edeni'))
+
+    assert cache.execute(s).hits.total.value == 1
+    assert cache.execute(s).hits.total.value == 1
+    # Equivalent, but separately built, searches share the entry
+    cache.execute(
+        Individual.search(using=client).query(nested_query('balaenoptera edeni'))
+    )
+    cache.execute(s.query(nested_query('balaenoptera musculus')))
+
+    assert client.search.call_count == 2
+    assert cache.stats()['hits'] == 2
+    assert cache.hit_ratio == 0.5
+
+
+def test_query_cache__invalidated_by_writes(client):
+    cache = QueryCache()
+    individuals = Search(using=client, index='individuals')
+    sightings = Search(using=client, index='sightings')
+    cache.execute(individuals)
+    cache.execute(sightings)
+
+    invalidate_index('individuals')
+    cache.execute(individuals)
+    cache.execute(sightings)
+
+    assert client.search.call_count == 3
+
+
+def test_query_cache__invalidated_by_refreshes(client):
+    cache = QueryCache()
+    client.index.return_value = {'_id': '1', 'result': 'created'}
+    s = Individual.search(using=client)
+
+    Individual(**make_individual()).save(using=client)
+    # Searched before the write is searchable
+    cache.execute(s)
+    refresh_index(client, 'individuals')
+    cache.execute(s)
+
+    client.indices.refresh.assert_called_once_with(index='individuals')
+    assert client.search.call_count == 2
+
+
+def test_query_cache__eviction(client):
+    cache = QueryCache(max_entries=2)
+    searches = [Search(using=client, index=f'index-{i}') for i in range(3)]
+    for s in searches:
+        cache.execute(s)
+
+    assert cache.stats()['entries'] == 2
+    assert cache.evictions == 1
+    # The least recently used entry was evicted
+    cache.execute(searches[0])
+    assert client.search.call_count == 4
+
+
+def test_query_cache__ttl(client):
+    cache = QueryCache(ttl=10)
+    s = Search(using=client, index='individuals')
+
+    with mock.patch('gumby.cache.time.monotonic', return_value=100):
+        cache.execute(s)
+    with mock.patch('gumby.cache.time.monotonic', return_value=105):
+        cache.execute(s)
+    with mock.patch('gumby.cache.time.monotonic', return_value=111):
+        cache.execute(s)
+
+    assert client.search.call_count == 2
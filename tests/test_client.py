@@ -0,0 +1,46 @@
+import pytest
+from elasticsearch_dsl import connections
+
+from gumby import Client, clear_clients, get_client
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    clear_clients()
+    yield
+    clear_clients()
+    try:
+        connections.remove_connection('default')
+    except KeyError:
+        pass
+
+
+def test_get_client__is_shared():
+    client = get_client(hosts=['es-one', 'es-two'])
+
+    assert isinstance(client, Client)
+    assert get_client(hosts=['es-two', 'es-one']) is client
+    assert get_client(hosts=['es-one']) is not client
+    assert get_client(hosts=['es-one', 'es-two'], http_auth='a:b') is not client
+
+
+def test_get_client__registers_connection():
+    client = get_client(hosts=['es-one'])
+    assert connections.get_connection('default') is client
+
+    other = get_client(hosts=['es-two'], alias=None)
+    assert connections.get_connection('default') is client
+    assert other is not client
+
+
+def test_client__transport_settings_from_environment(monkeypatch):
+    monkeypatch.setenv('ELASTICSEARCH_MAXSIZE', '50')
+    monkeypatch.setenv('ELASTICSEARCH_HTTP_COMPRESS', 'false')
+
+    client = Client(hosts=['es-one'], timeout=3)
+
+    connection = client.transport.connection_pool.connection
+    assert connection.pool.pool.maxsize == 50
+    assert connection.http_compress is False
+    assert connection.timeout == 3
+    assert client.transport.retry_on_timeout is True
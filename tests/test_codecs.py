@@ -0,0 +1,83 @@
+import json
+from pathlib import Path
+
+import pytest
+from elasticsearch.serializer import JSONSerializer
+
+from gumby import dsl
+from gumby.codecs import get_codec
+from gumby.factories import make_encounter, make_individual
+from gumby.models import Encounter, Individual, Sex
+
+RAW_INDIVIDUALS_DUMP = (
+    Path(__file__).parent.parent / 'gumby/testing-data/individuals.json'
+)
+
+
+def as_json(data):
+    return json.loads(JSONSerializer().dumps(data))
+
+
+@pytest.fixture
+def raw_individuals():
+    with RAW_INDIVIDUALS_DUMP.open('r') as fb:
+        return json.load(fb)
+
+
+def test_get_codec__is_cached():
+    assert get_codec(Individual) is get_codec(Individual)
+
+
+def test_from_hit(raw_individuals):
+    codec = get_codec(Individual)
+    hits = [{'_id': str(i), '_source': s} for i, s in enumerate(raw_individuals)]
+
+    for hit, doc in zip(hits, codec.from_hits(hits)):
+        expected = Individual.from_es(hit)
+        assert doc.meta.id == expected.meta.id
+        assert doc.id == expected.id
+        assert doc.sex == expected.sex
+        assert doc.last_sighting == expected.last_sighting
+        assert [e.id for e in doc.encounters] == [e.id for e in expected.encounters]
+        assert [e.sex for e in doc.encounters] == [e.sex for e in expected.encounters]
+        assert doc.to_dict() == expected.to_dict()
+
+
+@pytest.mark.parametrize('validate', [True, False])
+def test_to_source(validate):
+    codec = get_codec(Individual)
+    props = make_individual(encounters=[make_encounter() for i in range(5)])
+
+    expected = Individual(**props)
+    expected.full_clean()
+
+    source = codec.to_source(props, validate=validate)
+    assert as_json(source) == as_json(expected.to_dict())
+    assert codec.to_dicts([Individual(**props)]) == [source]
+
+
+def test_to_source__validation():
+    codec = get_codec(Individual)
+    props = make_individual(encounters=[make_encounter(sex='dragon')])
+    del props['id']
+
+    with pytest.raises(dsl.ValidationException) as exc_info:
+        Individual(**props).full_clean()
+    expected = exc_info.value.args[0]
+
+    with pytest.raises(dsl.ValidationException) as exc_info:
+        codec.to_source(props)
+    errors = exc_info.value.args[0]
+
+    assert set(errors) == set(expected) == {'id', 'encounters'}
+    # Trusted data isn't validated
+    assert 'id' not in codec.to_source(props, validate=False)
+
+
+def test_enum_field():
+    field = Encounter._doc_type.mapping['sex']
+
+    assert field.deserialize('non-binary') is Sex.non_binary
+    assert field.clean(Sex.female) == 'female'
+    with pytest.raises(dsl.ValidationException, match='is not one the the valid options'):
+        field.clean('dragon')
@@ -0,0 +1,66 @@
+import io
+from unittest import mock
+
+from gumby.dump import dump_json, dump_ndjson, iter_ndjson, open_dump
+from gumby.ingest import iter_json_array
+from gumby.models import Sighting
+from gumby.pagination import iter_hits
+
+
+def make_client(sources, page_size):
+    """Client stub serving ``sources`` in pages of ``page_size``"""
+    client = mock.MagicMock()
+    client.open_point_in_time.return_value = {'id': 'pit-0'}
+    pages = [sources[i : i + page_size] for i in range(0, len(sources), page_size)]
+    if len(sources) % page_size == 0:
+        pages.append([])
+    client.search.side_effect = [
+        {
+            'pit_id': f'pit-{n + 1}',
+            'hits': {'hits': [{'_source': s, 'sort': [s['id']]} for s in page]},
+        }
+        for n, page in enumerate(pages)
+    ]
+    return client
+
+
+def test_iter_hits():
+    sources = [{'id': f'{i:03}'} for i in range(10)]
+    client = make_client(sources, page_size=4)
+
+    hits = list(iter_hits(client, 'sightings', page_size=4))
+
+    assert [h['_source'] for h in hits] == sources
+    client.open_point_in_time.assert_called_once_with(index='sightings', keep_alive='1m')
+    bodies = [c.kwargs['body'] for c in client.search.call_args_list]
+    assert len(bodies) == 3
+    assert bodies[-1]['search_after'] == ['007']
+    assert bodies[-1]['pit']['id'] == 'pit-2'
+    # Closed with the most recent point-in-time id
+    client.close_point_in_time.assert_called_once_with(
+        body={'id': 'pit-3'}, ignore=(404,)
+    )
+
+
+def test_dump_ndjson__roundtrip(tmp_path):
+    sources = [{'id': f'{i:03}', 'taxonomy': 'balaenoptera musculus'} for i in range(8)]
+    client = make_client(sources, page_size=4)
+    path = tmp_path / 'sightings.ndjson.gz'
+
+    with open_dump(path, 'w') as fb:
+        assert dump_ndjson(client, fb, model=Sighting, page_size=4) == 8
+
+    client.open_point_in_time.assert_called_once_with(index='sightings', keep_alive='1m')
+    with open_dump(path) as fb:
+        assert list(iter_ndjson(fb)) == sources
+
+
+def test_dump_json():
+    sources = [{'id': f'{i:03}'} for i in range(3)]
+    client = make_client(sources, page_size=10)
+    fp = io.StringIO()
+
+    dump_json(client, fp)
+
+    fp.seek(0)
+    assert list(iter_json_array(fp)) == sources
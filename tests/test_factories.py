@@ -0,0 +1,65 @@
+from unittest import mock
+
+from gumby.codecs import get_codec
+from gumby.factories import CorpusGenerator, load_corpus, make_encounter, make_individual
+from gumby.models import Encounter, Individual, Sighting
+
+
+def test_make_individual__last_sighting():
+    encounters = [make_encounter() for i in range(5)]
+    individual = make_individual(encounters=encounters)
+
+    assert individual['last_sighting'] == max(e['date_occurred'] for e in encounters)
+    assert make_individual()['last_sighting'] is None
+
+
+def test_corpus_generator__is_reproducible():
+    first, second = CorpusGenerator(seed=42), CorpusGenerator(seed=42)
+
+    assert list(first.individuals(10)) == list(second.individuals(10))
+    assert list(first.encounters(10)) == list(second.encounters(10))
+    assert list(first.sightings(10)) == list(second.sightings(10))
+    assert list(CorpusGenerator(seed=1).sightings(10)) != list(
+        CorpusGenerator(seed=2).sightings(10)
+    )
+
+
+def test_corpus_generator__documents_are_valid():
+    generator = CorpusGenerator(seed=0, batch_size=7)
+
+    individuals = list(generator.individuals(20))
+    assert len(individuals) == 20
+    for props in individuals:
+        get_codec(Individual).to_source(props)
+        dates = [e['date_occurred'] for e in props['encounters']]
+        assert props['last_sighting'] == max(dates, default=None)
+    for props in generator.encounters(20):
+        get_codec(Encounter).to_source(props)
+    for props in generator.sightings(20):
+        get_codec(Sighting).to_source(props)
+
+
+def test_corpus_generator__skew():
+    generator = CorpusGenerator(
+        seed=0,
+        max_encounters=5,
+        taxonomy_weights={'balaenoptera musculus': 1, 'balaenoptera edeni': 0},
+        clusters=1,
+    )
+
+    individuals = list(generator.individuals(100))
+    assert max(len(i['encounters']) for i in individuals) == 5
+    encounters = [e for i in individuals for e in i['encounters']]
+    assert {e['taxonomy'] for e in encounters} == {'balaenoptera musculus'}
+    # All points are clustered around a single center
+    lats = [float(e['point'].split(',')[0]) for e in encounters]
+    assert max(lats) - min(lats) < 30
+
+
+def test_load_corpus__skips_empty_models():
+    with mock.patch('gumby.factories.bulk_load', return_value=(3, [])) as bulk_load:
+        loaded = load_corpus(object(), encounters=3)
+
+    assert loaded == {Encounter: 3}
+    bulk_load.assert_called_once()
+    assert bulk_load.call_args.kwargs['model'] is Encounter
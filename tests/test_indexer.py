@@ -0,0 +1,174 @@
+import json
+import threading
+from unittest import mock
+
+import pytest
+from elasticsearch import Elasticsearch
+from elasticsearch.exceptions import TransportError
+
+from gumby.factories import make_encounter, make_individual
+from gumby.indexer import BulkIndexer
+from gumby.models import Encounter, Individual
+
+
+class FakeBulk:
+    """``_bulk`` API stub answering each item with the status given by ``status(action)``"""
+
+    def __init__(self, status=lambda op_type, meta: 201):
+        self.status = status
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def __call__(self, body, **kwargs):
+        assert isinstance(body, bytes)
+        lines = [json.loads(line) for line in body.splitlines()]
+        actions = []
+        items = []
+        while lines:
+            ((op_type, meta),) = lines.pop(0).items()
+            if op_type != 'delete':
+                lines.pop(0)
+            actions.append(meta.get('_id'))
+            items.append(
+                {op_type: {'status': self.status(op_type, meta), '_id': meta.get('_id')}}
+            )
+        with self.lock:
+            self.requests.append(actions)
+        errors = any(r['status'] > 299 for i in items for r in i.values())
+        return {'errors': errors, 'items': items}
+
+
+@pytest.fixture
+def client():
+    client = Elasticsearch()
+    with mock.patch.object(client, 'bulk') as bulk:
+        bulk.side_effect = FakeBulk()
+        yield client
+
+
+def test_bulk_indexer(client):
+    individuals = [Individual(**make_individual()) for i in range(30)]
+    encounters = [make_encounter() for i in range(30)]
+
+    with mock.patch('gumby.indexer.invalidate_index') as invalidate_index:
+        with BulkIndexer(client, chunk_size=10, min_chunk_size=5) as indexer:
+            threads = [
+                threading.Thread(
+                    target=lambda: [indexer.add(doc) for doc in individuals]
+                ),
+                threading.Thread(
+                    target=lambda: [indexer.add(e, model=Encounter) for e in encounters]
+                ),
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            indexer.add_action(
+                {'_op_type': 'delete', '_index': 'sightings', '_id': 'gone'}
+            )
+
+    requests = client.bulk.side_effect.requests
+    ids = {id for request in requests for id in request}
+    assert ids == {str(d.id) for d in individuals} | {
+        str(e['id']) for e in encounters
+    } | {'gone'}
+    assert indexer.stats['indexed'] == 61
+    assert indexer.stats['failed'] == 0
+    # The chunks grow while the cluster keeps up
+    assert indexer.chunk_size > 10
+    indices = {i for c in invalidate_index.call_args_list for i in c.args}
+    assert indices == {'individuals', 'encounters', 'sightings'}
+
+
+def test_bulk_indexer__not_a_model(client):
+    with BulkIndexer(client) as indexer:
+        with pytest.raises(ValueError, match='not a gumby model'):
+            indexer.add(make_individual())
+    with pytest.raises(RuntimeError, match='closed'):
+        indexer.add(make_individual(), model=Individual)
+
+
+def test_bulk_indexer__flush_interval(client):
+    indexer = BulkIndexer(client, flush_interval=0.01)
+    indexer.add(make_individual(), model=Individual)
+
+    # Sent without flushing
+    with indexer._cond:
+        assert indexer._cond.wait_for(lambda: not indexer._unfinished, timeout=5)
+    indexer.close()
+    assert client.bulk.call_count == 1
+
+
+def test_bulk_indexer__retries_failed_items(client):
+    individuals = [Individual(**make_individual()) for i in range(4)]
+    rejected_id = str(individuals[1].id)
+    attempts = []
+
+    def status(op_type, meta):
+        if meta['_id'] == rejected_id:
+            attempts.append(meta['_id'])
+            return 429 if len(attempts) < 3 else 201
+        return 201
+
+    client.bulk.side_effect = FakeBulk(status)
+    indexer = BulkIndexer(
+        client, chunk_size=400, min_chunk_size=100, concurrency=4, backoff=0.001
+    )
+    for individual in individuals:
+        indexer.add(individual)
+    stats = indexer.close()
+
+    # Only the rejected item is sent again
+    assert client.bulk.side_effect.requests[1:] == [[rejected_id], [rejected_id]]
+    assert stats['indexed'] == 4
+    assert stats['retried'] == 2
+    assert stats['rejected'] == 2
+    # Rejections back off, then the indexer recovers additively
+    assert indexer.concurrency == 1
+    assert indexer.chunk_size == 200
+
+
+def test_bulk_indexer__dead_letters(client, tmp_path):
+    individuals = [Individual(**make_individual()) for i in range(3)]
+    invalid_id, rejected_id = str(individuals[0].id), str(individuals[1].id)
+
+    def status(op_type, meta):
+        return {invalid_id: 400, rejected_id: 429}.get(meta['_id'], 201)
+
+    client.bulk.side_effect = FakeBulk(status)
+    path = tmp_path / 'dead' / 'letters.ndjson'
+    indexer = BulkIndexer(client, max_retries=1, backoff=0.001, dead_letter_path=path)
+    for individual in individuals:
+        indexer.add(individual)
+    stats = indexer.close()
+
+    assert (stats['indexed'], stats['failed']) == (1, 2)
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert sorted(r['action']['_id'] for r in records) == sorted(
+        [invalid_id, rejected_id]
+    )
+    assert {r['error']['status'] for r in records} == {400, 429}
+    assert records[0]['action']['_index'] == Individual._index._name
+
+
+def test_bulk_indexer__request_errors(client):
+    responses = [TransportError(503, 'unavailable'), None, TransportError(400, 'bad')]
+    fake = FakeBulk()
+
+    def bulk(body, **kwargs):
+        error = responses.pop(0) if responses else None
+        if error is not None:
+            raise error
+        return fake(body, **kwargs)
+
+    client.bulk.side_effect = bulk
+    indexer = BulkIndexer(client, backoff=0.001)
+    indexer.add(make_individual(), model=Individual)
+    indexer.flush()
+    indexer.add(make_individual(), model=Individual)
+    stats = indexer.close()
+
+    # The unavailable cluster is retried, the bad request is not
+    assert (stats['indexed'], stats['failed']) == (1, 1)
+    assert indexer.dead_letters[0]['error']['status'] == 400
@@ -0,0 +1,239 @@
+from unittest import mock
+
+import pytest
+
+from gumby.indices import (
+    BULK_LOAD_SETTINGS,
+    IndexStatus,
+    _index_body,
+    drop_model_index,
+    get_current_index,
+    index_meta,
+    init_model_index,
+    mapping_status,
+    reindex_model,
+    wait_for_task,
+)
+from gumby.models import Encounter, Individual
+
+
+def make_client(aliases=None, indices=(), legacy=False, mappings=None):
+    """Mock client with the ``aliases`` (as ``{alias: index}``)
+    and versioned ``indices`` in place, with the live ``mappings``
+
+    """
+    aliases = aliases or {}
+    client = mock.MagicMock()
+    client.indices.get_mapping.side_effect = lambda index: {
+        index: {'mappings': mappings or {}}
+    }
+    client.indices.get_alias.side_effect = lambda name, **kw: (
+        {aliases[name]: {'aliases': {name: {}}}}
+        if name in aliases
+        else {'error': 'alias missing', 'status': 404}
+    )
+    client.indices.get.return_value = {name: {} for name in indices}
+    client.indices.exists.return_value = legacy
+    client.reindex.return_value = {'task': 'node:1'}
+    client.tasks.get.return_value = {
+        'completed': True,
+        'task': {'status': {'total': 10, 'created': 10}},
+        'response': {'failures': []},
+    }
+    return client
+
+
+def test_get_current_index():
+    client = make_client({'individuals': 'individuals-v2'})
+    assert get_current_index(client, 'individuals') == 'individuals-v2'
+    assert get_current_index(client, 'encounters') is None
+
+
+def test_init_model_index__creates_first_version():
+    client = make_client()
+
+    assert init_model_index(Individual, using=client) == IndexStatus.CREATED
+
+    client.indices.create.assert_called_once()
+    kwargs = client.indices.create.call_args.kwargs
+    assert kwargs['index'] == 'individuals-v1'
+    assert kwargs['body']['aliases'] == {'individuals': {}}
+    mappings = kwargs['body']['mappings']
+    assert mappings['properties'] == Individual._index.to_dict()['mappings']['properties']
+    assert mappings['_meta'] == {'gumby': index_meta(Individual)}
+
+
+def test_init_model_index__skips_unchanged():
+    client = make_client(
+        {'individuals': 'individuals-v3'},
+        mappings=_index_body(Individual)['mappings'],
+    )
+
+    assert init_model_index(Individual, using=client) == IndexStatus.UNCHANGED
+
+    client.indices.create.assert_not_called()
+    client.indices.put_mapping.assert_not_called()
+
+
+def test_init_model_index__updates_mapping_in_place():
+    mappings = _index_body(Individual)['mappings']
+    # An older version of the model, without some fields
+    mappings['_meta']['gumby']['hash'] = 'old'
+    del mappings['properties']['death']
+    del mappings['properties']['encounters']['properties']['taxonomy']
+    client = make_client({'individuals': 'individuals-v3'}, mappings=mappings)
+
+    assert init_model_index(Individual, using=client) == IndexStatus.UPDATED
+
+    client.indices.create.assert_not_called()
+    client.indices.put_mapping.assert_called_once_with(
+        index='individuals', body=_index_body(Individual)['mappings']
+    )
+
+
+def test_mapping_status():
+    mappings = _index_body(Individual)['mappings']
+    assert mapping_status(Individual, mappings) == IndexStatus.UNCHANGED
+
+    # Mappings of indexes created before they were hashed
+    del mappings['_meta']
+    assert mapping_status(Individual, mappings) == IndexStatus.UPDATED
+
+    # Changed field
+    mappings['properties']['name'] = {'type': 'text'}
+    assert mapping_status(Individual, mappings) == IndexStatus.NEEDS_REINDEX
+
+    # Changed settings
+    mappings = _index_body(Individual)['mappings']
+    mappings['_meta']['gumby'] = {'hash': 'old', 'settings_hash': 'old'}
+    assert mapping_status(Individual, mappings) == IndexStatus.NEEDS_REINDEX
+
+
+def test_index_meta__is_stable():
+    assert index_meta(Individual) == index_meta(Individual)
+    assert index_meta(Individual)['hash'] != index_meta(Encounter)['hash']
+
+
+def test_init__uses_alias():
+    client = make_client()
+    Individual.init(using=client)
+    assert client.indices.create.call_args.kwargs['index'] == 'individuals-v1'
+
+    # Explicitly named indexes aren't aliased
+    client = make_client()
+    Individual.init(index='test-individuals', using=client)
+    assert client.indices.create.call_args.kwargs['index'] == 'test-individuals'
+
+
+def test_reindex_model():
+    client = make_client(
+        {'individuals': 'individuals-v2'}, ['individuals-v1', 'individuals-v2']
+    )
+    progress = mock.Mock()
+
+    with mock.patch('gumby.indices.invalidate_index') as invalidate_index:
+        name = reindex_model(Individual, using=client, progress=progress)
+
+    assert name == 'individuals-v3'
+    # Created with the bulk loading settings
+    body = client.indices.create.call_args.kwargs['body']
+    for setting, value in BULK_LOAD_SETTINGS.items():
+        assert body['settings'][setting] == value
+    # Reindexed server-side
+    client.reindex.assert_called_once_with(
+        body={'source': {'index': 'individuals-v2'}, 'dest': {'index': 'individuals-v3'}},
+        slices='auto',
+        wait_for_completion=False,
+    )
+    progress.assert_called_once_with({'total': 10, 'created': 10})
+    # Writes to the current index are blocked during the reindex,
+    # and settings are reset to the defaults before the swap
+    assert client.indices.put_settings.call_args_list == [
+        mock.call(index='individuals-v2', body={'index.blocks.write': True}),
+        mock.call(
+            index='individuals-v3', body={setting: None for setting in BULK_LOAD_SETTINGS}
+        ),
+    ]
+    client.indices.update_aliases.assert_called_once_with(
+        body={
+            'actions': [
+                {'remove': {'index': 'individuals-v2', 'alias': 'individuals'}},
+                {'add': {'index': 'individuals-v3', 'alias': 'individuals'}},
+            ]
+        }
+    )
+    invalidate_index.assert_called_once_with('individuals')
+    client.indices.delete.assert_called_once_with(index='individuals-v2')
+
+
+def test_reindex_model__from_legacy_index():
+    client = make_client(legacy=True)
+
+    assert reindex_model(Individual, using=client, delete_old=True) == 'individuals-v1'
+
+    assert client.reindex.call_args.kwargs['body']['source'] == {'index': 'individuals'}
+    # The legacy index is removed as part of the atomic swap
+    client.indices.update_aliases.assert_called_once_with(
+        body={
+            'actions': [
+                {'remove_index': {'index': 'individuals'}},
+                {'add': {'index': 'individuals-v1', 'alias': 'individuals'}},
+            ]
+        }
+    )
+    client.indices.delete.assert_not_called()
+
+
+def test_reindex_model__with_load():
+    client = make_client({'individuals': 'individuals-v1'}, ['individuals-v1'])
+    load = mock.Mock()
+
+    reindex_model(Individual, using=client, load=load, delete_old=False)
+
+    load.assert_called_once_with('individuals-v2')
+    client.reindex.assert_not_called()
+    client.indices.delete.assert_not_called()
+    # The old index is kept, and writable again
+    client.indices.put_settings.assert_called_with(
+        index='individuals-v1', body={'index.blocks.write': None}
+    )
+
+
+def test_reindex_model__failure_keeps_current_index():
+    client = make_client({'individuals': 'individuals-v1'}, ['individuals-v1'])
+    client.tasks.get.return_value = {
+        'completed': True,
+        'task': {'status': {}},
+        'response': {'failures': [{'cause': 'boom'}]},
+    }
+
+    with pytest.raises(RuntimeError, match='had failures'):
+        reindex_model(Individual, using=client)
+
+    client.indices.update_aliases.assert_not_called()
+    client.indices.delete.assert_called_once_with(index='individuals-v2', ignore=404)
+    # Writes are no longer blocked
+    assert client.indices.put_settings.call_args_list == [
+        mock.call(index='individuals-v1', body={'index.blocks.write': True}),
+        mock.call(index='individuals-v1', body={'index.blocks.write': None}),
+    ]
+
+
+def test_wait_for_task():
+    client = mock.MagicMock()
+    client.tasks.get.side_effect = [
+        {'completed': False, 'task': {'status': {'created': 1}}},
+        {'completed': True, 'task': {'status': {'created': 2}}, 'response': {}},
+    ]
+
+    with mock.patch('gumby.indices.time.sleep') as sleep:
+        resp = wait_for_task(client, 'node:1', poll_interval=1)
+
+    assert resp['completed']
+    sleep.assert_called_once_with(1)
+
+
+def test_drop_model_index():
+    client = make_client({'individuals': 'individuals-v4'})
+    drop_model_index(Individual, using=client)
+    client.indices.delete.assert_called_once_with(index='individuals-v4')
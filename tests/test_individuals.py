@@ -2,13 +2,27 @@
 import pytest
 
 from gumby.dsl import Q, Search
-from gumby.factories import make_individual
+from gumby.factories import make_encounter, make_individual
+from gumby.indices import drop_model_index
 from gumby.models import Individual
+from gumby.queries import encounter_count_at_least, has_encounter
+from gumby.updates import append_encounters, bulk_append_encounters
 
 
 @pytest.fixture
-def individuals(gumby_faux_index_data):
-    return gumby_faux_index_data[Individual]
+def individuals(gumby_readonly_faux_index_data):
+    return gumby_readonly_faux_index_data[Individual]
+
+
+def test_faux_individuals__mutated(gumby_faux_individuals):
+    gumby_faux_individuals[0].name = 'mutated'
+    gumby_faux_individuals[0].meta.id = 'saved'
+
+
+def test_faux_individuals__isolated(gumby_faux_individuals):
+    # Unaffected by the changes of the previous test
+    assert gumby_faux_individuals[0].name != 'mutated'
+    assert 'id' not in gumby_faux_individuals[0].meta
 
 
 class TestUserStories:
@@ -19,10 +33,10 @@ class TestUserStories:
     """
 
     @pytest.fixture(autouse=True)
-    def set_up(self, gumby_client, individuals, gumby_individual_index_name):
+    def set_up(self, gumby_client, individuals, gumby_readonly_individual_index_name):
         self.client = gumby_client
         self.individuals = individuals
-        self.index_name = gumby_individual_index_name
+        self.index_name = gumby_readonly_individual_index_name
 
     def test_individual_by_encounter_scientific_name_and_annotation(self):
         """As a researcher I want to search for all Individuals that have encounters where the species is “Delphinapterus”, genus is “leucas” and are associated with at least one image (Annotation)."""
@@ -47,6 +61,23 @@ class TestUserStories:
         resp = s.query(query).execute()
         assert resp.hits.total.value == 7
 
+    def test_individual_by_encounter_scientific_name_and_annotation__helper(self):
+        """Same as above, using the query helper that also filters on the summary fields"""
+        query = has_encounter(taxonomy='balaenoptera edeni', has_annotation=True)
+
+        s = Individual.search(index=self.index_name, using=self.client)
+        resp = s.query(query).execute()
+        assert resp.hits.total.value == 7
+
+    def test_individual_with_annotated_encounter(self):
+        """As a researcher I want to find all Individuals with at least one image (Annotation)."""
+        s = Individual.search(index=self.index_name, using=self.client)
+        resp = s.query(has_encounter(has_annotation=True)).execute()
+        nested = s.query(
+            'nested', path='encounters', query=Q('term', encounters__has_annotation=True)
+        ).execute()
+        assert resp.hits.total.value == nested.hits.total.value
+
     @pytest.mark.skip("not-implemented-yet")
     def test_individual_by_encounter_and_annotation_with_keyword(self):
         """As a researcher I want to find all Individuals that have at least one encounter that contains an annotation with the keyword “Medium Coat”."""
@@ -81,8 +112,7 @@ class TestQueries:
         client = gumby_client
 
         # Initialize index
-        if Individual._index.exists(using=client):
-            Individual._index.delete(using=client)
+        drop_model_index(Individual, using=client)
         Individual.init(using=client)
 
         name = 'test-indv'
@@ -97,7 +127,32 @@ class TestQueries:
         assert resp.hits.total.value == 1
 
         # Cleanup
-        Individual._index.delete(using=client)
+        drop_model_index(Individual, using=client)
+
+    def test_append_encounters__updates_summary(self, gumby_client):
+        client = gumby_client
+        drop_model_index(Individual, using=client)
+        Individual.init(using=client)
+
+        indv = make_individual(encounters=[])
+        Individual(**indv).save(using=client, refresh='wait_for')
+        encounter = make_encounter(taxonomy='balaenoptera edeni', has_annotation=True)
+        append_encounters(client, indv['id'], encounter, refresh='wait_for')
+        bulk_append_encounters(client, [(indv['id'], [make_encounter()])], refresh=True)
+
+        # The summary fields are updated without the ingest pipeline
+        stored = Individual.get(id=str(indv['id']), using=client)
+        assert stored.encounter_count == 2
+        assert stored.has_annotated_encounter is True
+        assert 'balaenoptera edeni' in stored.encounter_taxonomies
+        assert stored.first_sighting is not None
+        s = Individual.search(using=client)
+        query = has_encounter(taxonomy='balaenoptera edeni', has_annotation=True)
+        assert s.query(query).count() == 1
+        assert s.query(encounter_count_at_least(2)).count() == 1
+
+        # Cleanup
+        drop_model_index(Individual, using=client)
 
 
 # ############################################################################
@@ -0,0 +1,63 @@
+import io
+import json
+from unittest import mock
+
+import pytest
+from elasticsearch import Elasticsearch
+
+from gumby.factories import make_encounter, make_individual
+from gumby.ingest import bulk_load, iter_bulk_actions, iter_json_array
+from gumby.models import Individual
+
+
+@pytest.mark.parametrize('read_size', [1, 7, 64 * 1024])
+def test_iter_json_array(read_size):
+    data = [{'a': 1, 'b': [1, 2, {'c': 'd]'}]}, 12345, 'x,y', None, []]
+    fp = io.StringIO(json.dumps(data, indent=2))
+
+    assert list(iter_json_array(fp, read_size=read_size)) == data
+
+
+@pytest.mark.parametrize('text', ['[]', ' [ ] ', '[\n]'])
+def test_iter_json_array__empty(text):
+    assert list(iter_json_array(io.StringIO(text))) == []
+
+
+@pytest.mark.parametrize('text', ['', '{}', '[1,]', '[1 2]', '[1, 2'])
+def test_iter_json_array__invalid(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), read_size=2))
+
+
+def test_iter_bulk_actions():
+    props = make_individual(encounters=[make_encounter()])
+    actions = list(iter_bulk_actions([props], index='test-individuals'))
+
+    assert len(actions) == 1
+    action = actions[0]
+    assert action['_index'] == 'test-individuals'
+    assert action['_id'] == str(props['id'])
+    assert action['_source']['encounters'][0]['id'] == str(props['encounters'][0]['id'])
+
+
+def test_bulk_load():
+    client = Elasticsearch()
+    docs = [make_individual(encounters=[make_encounter()]) for i in range(5)]
+
+    def bulk(body, **kwargs):
+        lines = body.splitlines()
+        assert len(lines) <= 2 * 2
+        return {
+            'errors': False,
+            'items': [{'index': {'status': 201}} for i in range(len(lines) // 2)],
+        }
+
+    with mock.patch.object(
+        client, 'bulk', side_effect=bulk
+    ) as mock_bulk, mock.patch.object(client, 'indices') as mock_indices:
+        success, errors = bulk_load(client, iter(docs), chunk_size=2)
+
+    assert (success, errors) == (5, [])
+    # Three chunks (2 + 2 + 1) and a single refresh at the end
+    assert mock_bulk.call_count == 3
+    mock_indices.refresh.assert_called_once_with(index=Individual._index._name)
@@ -3,7 +3,7 @@ from unittest import mock
 import pytest
 from elasticsearch.exceptions import ConnectionError
 
-from gumby import initialize_indexes_by_model
+from gumby import IndexStatus, initialize_indexes_by_model
 
 
 def test_initialize_indexes_by_model():
@@ -47,3 +47,34 @@ def test_initialize_indexes_by_model__and_fail_gracefully():
         initialize_indexes_by_model(models, using=stub_es_client, fail_gracefully=True)
 
     mock_model.init.assert_called_with(using=stub_es_client)
+
+
+def test_initialize_indexes_by_model__report():
+    models = [mock.MagicMock(), mock.MagicMock()]
+    models[0].init.return_value = IndexStatus.UNCHANGED
+    models[1].init.return_value = IndexStatus.NEEDS_REINDEX
+
+    stub_es_client = object()
+
+    # Target
+    report = initialize_indexes_by_model(models, using=stub_es_client)
+
+    assert report == {
+        models[0]: IndexStatus.UNCHANGED,
+        models[1]: IndexStatus.NEEDS_REINDEX,
+    }
+
+
+def test_initialize_indexes_by_model__and_reindex():
+    models = [mock.MagicMock(), mock.MagicMock()]
+    models[0].init.return_value = IndexStatus.UNCHANGED
+    models[1].init.return_value = IndexStatus.NEEDS_REINDEX
+
+    stub_es_client = object()
+
+    # Target
+    with mock.patch('gumby.initialize.reindex_model') as reindex_model:
+        report = initialize_indexes_by_model(models, using=stub_es_client, reindex=True)
+
+    reindex_model.assert_called_once_with(models[1], using=stub_es_client)
+    assert report[models[1]] == IndexStatus.REINDEXED
@@ -0,0 +1,126 @@
+import uuid
+from unittest import mock
+
+import pytest
+
+from gumby.cache import invalidate_index
+from gumby.lookups import DocumentCache, IdentityMap, get_many
+from gumby.models import Individual
+
+
+def make_client(sources):
+    """Client stub serving the ``sources`` by id through ``_mget``"""
+    client = mock.MagicMock()
+
+    def mget(index, body):
+        docs = []
+        for id in body['ids']:
+            if id in sources:
+                docs.append(
+                    {'_index': index, '_id': id, 'found': True, '_source': sources[id]}
+                )
+            else:
+                docs.append({'_index': index, '_id': id, 'found': False})
+        return {'docs': docs}
+
+    client.mget.side_effect = mget
+    return client
+
+
+@pytest.fixture
+def sources():
+    ids = [str(uuid.uuid4()) for i in range(5)]
+    return {id: {'id': id, 'name': f'whale-{i}'} for i, id in enumerate(ids)}
+
+
+def test_get_many(sources):
+    client = make_client(sources)
+    ids = [uuid.UUID(id) for id in sources]
+    unknown = uuid.uuid4()
+    requested = [ids[3], unknown, ids[0], ids[1], ids[2], ids[4], ids[3]]
+
+    docs = get_many(Individual, requested, using=client, batch_size=2)
+
+    expected = [ids[3], None, ids[0], ids[1], ids[2], ids[4], ids[3]]
+    assert [d and d.id for d in docs] == expected
+    assert isinstance(docs[0], Individual)
+    assert docs[0].name == 'whale-3'
+    # Each id is only requested once
+    assert client.mget.call_count == 3
+    assert [c.kwargs['body']['ids'] for c in client.mget.call_args_list] == [
+        [str(ids[3]), str(unknown)],
+        [str(ids[0]), str(ids[1])],
+        [str(ids[2]), str(ids[4])],
+    ]
+    assert client.mget.call_args.kwargs['index'] == 'individuals'
+
+
+def test_get_many__identity_map(sources):
+    client = make_client(sources)
+    ids = list(sources)
+    identity_map = IdentityMap()
+
+    first = get_many(
+        Individual, ids[:3] + ['missing'], using=client, identity_map=identity_map
+    )
+    second = get_many(
+        Individual, ids + ['missing'], using=client, identity_map=identity_map
+    )
+
+    # The same instances, and only those not seen before are requested
+    assert all(a is b for a, b in zip(first[:3], second))
+    assert second[-1] is None
+    assert client.mget.call_args.kwargs['body'] == {'ids': ids[3:]}
+    assert len(identity_map) == 6
+
+
+def test_get_many__cache(sources):
+    client = make_client(sources)
+    ids = list(sources)
+    cache = DocumentCache(max_entries=3)
+
+    get_many(Individual, ids, using=client, cache=cache)
+    docs = get_many(Individual, ids, using=client, cache=cache)
+
+    assert [d.name for d in docs] == [s['name'] for s in sources.values()]
+    # Only the least recently used were evicted
+    assert client.mget.call_args.kwargs['body'] == {'ids': ids[:2]}
+    assert cache.hits == 3
+
+    # Writes to the index make the cached documents stale
+    get_many(Individual, ids[4:], using=client, cache=cache)
+    assert cache.hits == 4
+    invalidate_index('individuals')
+    get_many(Individual, ids[4:], using=client, cache=cache)
+    assert client.mget.call_args.kwargs['body'] == {'ids': ids[4:]}
+
+
+def test_get_many__cache_write_in_flight(sources):
+    client = make_client(sources)
+    mget = client.mget.side_effect
+    ids = list(sources)
+    cache = DocumentCache()
+
+    def written_while_in_flight(**kwargs):
+        resp = mget(**kwargs)
+        invalidate_index('individuals')
+        return resp
+
+    client.mget.side_effect = written_while_in_flight
+    get_many(Individual, ids, using=client, cache=cache)
+    client.mget.side_effect = mget
+    get_many(Individual, ids, using=client, cache=cache)
+
+    # The hits were requested before the write, so they weren't used
+    assert cache.hits == 0
+    assert client.mget.call_count == 2
+
+
+def test_get_many__errors():
+    client = mock.MagicMock()
+    client.mget.return_value = {
+        'docs': [{'_index': 'individuals', '_id': '1', 'error': {'type': 'oops'}}]
+    }
+
+    with pytest.raises(RuntimeError, match='failed to get document'):
+        get_many(Individual, ['1'], using=client)
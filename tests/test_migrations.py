@@ -0,0 +1,242 @@
+import json
+import uuid
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from gumby.migrations import (
+    _import_migration_func,
+    migrate_index,
+    migrate_server_side,
+    migrate_slice,
+)
+from gumby.models import Individual
+from gumby.routing import route_model
+
+
+def make_hits(count):
+    ids = sorted(str(uuid.uuid4()) for i in range(count))
+    return [
+        {
+            '_index': 'individuals',
+            '_id': id,
+            '_seq_no': i,
+            '_primary_term': 1,
+            '_source': {'id': id, 'name': f'TI-{i:05}'},
+        }
+        for i, id in enumerate(ids)
+    ]
+
+
+def rename(doc):
+    if doc.name.endswith('0'):
+        doc.name = 'renamed'
+    return doc
+
+
+@pytest.fixture
+def bulk_calls():
+    calls = []
+
+    def streaming_bulk(client, actions, **kwargs):
+        calls.append(list(actions))
+        for action in calls[-1]:
+            yield True, {'index': {'status': 200}}
+
+    with mock.patch('gumby.migrations.streaming_bulk', side_effect=streaming_bulk):
+        yield calls
+
+
+def test_migrate_slice(bulk_calls):
+    hits = make_hits(25)
+
+    with mock.patch('gumby.migrations.scan', return_value=iter(hits)) as mock_scan:
+        stats = migrate_slice(object(), rename, model=Individual, chunk_size=10)
+
+    assert stats == {'processed': 25, 'migrated': 3, 'conflicts': 0}
+    query = mock_scan.call_args.kwargs['query']
+    assert query['seq_no_primary_term'] is True
+    assert 'slice' not in query
+    # Only changed documents are written, guarded by their sequence number
+    written = [action for call in bulk_calls for action in call]
+    assert [a['_id'] for a in written] == [hits[i]['_id'] for i in (0, 10, 20)]
+    assert written[1]['if_seq_no'] == 10
+    assert written[1]['_source']['name'] == 'renamed'
+
+
+def test_migrate_slice__routed(bulk_calls):
+    hits = make_hits(10)
+    for hit in hits:
+        hit['_routing'] = hit['_source']['taxonomy'] = 'balaenoptera musculus'
+
+    route_model(Individual)
+    try:
+        with mock.patch('gumby.migrations.scan', return_value=iter(hits)):
+            migrate_slice(object(), rename, model=Individual, chunk_size=10)
+    finally:
+        Individual._shard_routing = None
+        del Individual._doc_type.mapping._meta['_routing']
+
+    (written,) = [action for call in bulk_calls for action in call]
+    assert written['_id'] == hits[0]['_id']
+    assert written['routing'] == 'balaenoptera musculus'
+
+
+def test_migrate_slice__resumes_from_checkpoint(tmp_path, bulk_calls):
+    hits = make_hits(25)
+
+    def interrupted_scan(*args, **kwargs):
+        yield from hits[:15]
+        raise KeyboardInterrupt
+
+    with mock.patch('gumby.migrations.scan', side_effect=interrupted_scan):
+        with pytest.raises(KeyboardInterrupt):
+            migrate_slice(
+                object(),
+                rename,
+                slice_id=1,
+                slices=2,
+                checkpoint_dir=tmp_path,
+                chunk_size=10,
+            )
+
+    # Only the first full chunk was written and recorded
+    checkpoint = json.loads((tmp_path / 'slice-1.json').read_text())
+    assert checkpoint['last_id'] == hits[9]['_id']
+    assert checkpoint['processed'] == 10
+
+    with mock.patch('gumby.migrations.scan', return_value=iter(hits[10:])) as mock_scan:
+        stats = migrate_slice(
+            object(), rename, slice_id=1, slices=2, checkpoint_dir=tmp_path, chunk_size=10
+        )
+
+    query = mock_scan.call_args.kwargs['query']
+    assert query['query'] == {'range': {'id': {'gt': hits[9]['_id']}}}
+    assert query['slice'] == {'id': 1, 'max': 2}
+    assert stats == {'processed': 25, 'migrated': 3, 'conflicts': 0}
+
+
+def test_migrate_slice__resumes_conflicts(tmp_path):
+    hits = make_hits(25)
+
+    def streaming_bulk(client, actions, **kwargs):
+        for action in actions:
+            # The first document was modified since it was read
+            status = 409 if action['_id'] == hits[0]['_id'] else 200
+            yield status == 200, {'index': {'status': status}}
+
+    def interrupted_scan(*args, **kwargs):
+        yield from hits[:15]
+        raise KeyboardInterrupt
+
+    with mock.patch('gumby.migrations.streaming_bulk', side_effect=streaming_bulk):
+        with mock.patch('gumby.migrations.scan', side_effect=interrupted_scan):
+            with pytest.raises(KeyboardInterrupt):
+                migrate_slice(object(), rename, checkpoint_dir=tmp_path, chunk_size=10)
+        with mock.patch('gumby.migrations.scan', return_value=iter(hits[10:])):
+            stats = migrate_slice(
+                object(), rename, checkpoint_dir=tmp_path, chunk_size=10
+            )
+
+    assert stats == {'processed': 25, 'migrated': 3, 'conflicts': 1}
+    # and once done
+    stats = migrate_slice(object(), rename, checkpoint_dir=tmp_path, chunk_size=10)
+    assert stats['conflicts'] == 1
+
+
+def make_update_by_query_client(status):
+    client = mock.MagicMock()
+    client.update_by_query.return_value = {'task': 'node:1'}
+    client.tasks.get.return_value = {
+        'completed': True,
+        'task': {'status': status},
+        'response': {**status, 'failures': []},
+    }
+    return client
+
+
+def test_migrate_server_side():
+    client = make_update_by_query_client(
+        {'total': 25, 'updated': 3, 'noops': 22, 'version_conflicts': 1}
+    )
+    progress = mock.Mock()
+    query = {'exists': {'field': 'genus'}}
+
+    stats = migrate_server_side(
+        client, 'ctx.op = "noop"', query=query, requests_per_second=500, progress=progress
+    )
+
+    assert stats == {'processed': 25, 'migrated': 3, 'conflicts': 1}
+    client.update_by_query.assert_called_once_with(
+        index='individuals',
+        body={
+            'script': {'lang': 'painless', 'source': 'ctx.op = "noop"'},
+            'query': query,
+        },
+        slices='auto',
+        conflicts='proceed',
+        wait_for_completion=False,
+        requests_per_second=500,
+    )
+    progress.assert_called_once()
+
+
+def test_migrate_index__server_side():
+    script = Path(__file__).parent.parent / '_migrations/0002-taxonomy.py'
+    client = make_update_by_query_client(
+        {'total': 2, 'updated': 2, 'version_conflicts': 0}
+    )
+
+    with mock.patch('gumby.get_client', return_value=client), mock.patch(
+        'gumby.migrations.ProcessPoolExecutor'
+    ) as executor:
+        stats = migrate_index(script, slices=2)
+
+    assert stats == {'processed': 2, 'migrated': 2, 'conflicts': 0}
+    # Run in the cluster rather than by the client
+    executor.assert_not_called()
+    body = client.update_by_query.call_args.kwargs['body']
+    assert 'genus' in body['script']['source']
+    assert body['query']['bool']['should'][0] == {'exists': {'field': 'genus'}}
+    assert client.update_by_query.call_args.kwargs['slices'] == 2
+    client.indices.refresh.assert_called_once_with(index='individuals')
+
+
+def test_migrate_index__server_side_is_not_checkpointed(tmp_path):
+    script = Path(__file__).parent.parent / '_migrations/0002-taxonomy.py'
+
+    with mock.patch('gumby.get_client') as get_client:
+        with pytest.raises(ValueError, match='not checkpointed'):
+            migrate_index(script, checkpoint_dir=tmp_path)
+    get_client.assert_not_called()
+
+
+def test_migrate_index__client_side():
+    script = Path(__file__).parent.parent / '_migrations/0002-taxonomy.py'
+
+    with mock.patch('gumby.get_client') as get_client, mock.patch(
+        'gumby.migrations.ProcessPoolExecutor'
+    ) as executor:
+        migrate_index(script, slices=2, server_side=False)
+
+    assert executor.return_value.__enter__.return_value.submit.call_count == 2
+    get_client.return_value.update_by_query.assert_not_called()
+
+
+def test_taxonomy_migration():
+    migrate = _import_migration_func(
+        str(Path(__file__).parent.parent / '_migrations/0002-taxonomy.py')
+    )
+    doc = Individual(
+        genus='balaenoptera',
+        species='musculus',
+        encounters=[{'genus': 'balaenoptera', 'species': None}, {'taxonomy': 'x'}],
+    )
+
+    doc = migrate(doc)
+
+    source = doc.to_dict()
+    assert source['taxonomy'] == 'balaenoptera musculus'
+    assert 'genus' not in source and 'species' not in source
+    assert source['encounters'] == [{'taxonomy': 'balaenoptera'}, {'taxonomy': 'x'}]
@@ -0,0 +1,102 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+from elasticsearch.exceptions import ConnectionError, RequestError
+
+from gumby.dsl import Search
+from gumby.msearch import MultiSearchDispatcher
+
+
+def hits_response(name):
+    return {'hits': {'total': {'value': 1, 'relation': 'eq'}, 'hits': [{'_id': name}]}}
+
+
+def make_client():
+    """Client stub answering each search with a hit named after its ``term`` value,
+    or a ``400`` error when the value is ``bad``
+
+    """
+    client = mock.MagicMock()
+
+    def msearch(body):
+        responses = []
+        for query in body[1::2]:
+            value = query['query']['term']['name']
+            if value == 'bad':
+                responses.append(
+                    {'error': {'type': 'query_shard_exception'}, 'status': 400}
+                )
+            else:
+                responses.append(hits_response(value))
+        return {'responses': responses}
+
+    client.msearch.side_effect = msearch
+    return client
+
+
+def make_search(name):
+    return Search(index='individuals').query('term', name=name)
+
+
+def test_dispatcher__batches_concurrent_searches():
+    client = make_client()
+    names = [f'moby-{i}' for i in range(20)]
+
+    with MultiSearchDispatcher(
+        using=client, max_batch_size=8, max_wait=0.05
+    ) as dispatcher:
+        with ThreadPoolExecutor(20) as pool:
+            responses = list(pool.map(lambda n: dispatcher.search(make_search(n)), names))
+
+    assert [r.hits[0].meta.id for r in responses] == names
+    # Far fewer requests than searches, none with more than a batch
+    assert client.msearch.call_count < 5
+    bodies = [c.kwargs['body'] for c in client.msearch.call_args_list]
+    assert max(len(body) for body in bodies) == 2 * 8
+    assert bodies[0][0] == {'index': ['individuals']}
+
+
+def test_dispatcher__errors_are_isolated():
+    client = make_client()
+
+    with MultiSearchDispatcher(using=client, max_wait=0.05) as dispatcher:
+        good = dispatcher.submit(make_search('moby'))
+        bad = dispatcher.submit(make_search('bad'))
+
+        assert good.result().hits[0].meta.id == 'moby'
+        with pytest.raises(RequestError):
+            bad.result()
+    client.msearch.assert_called_once()
+
+
+def test_dispatcher__request_failure_fails_batch():
+    client = mock.MagicMock()
+    client.msearch.side_effect = ConnectionError('N/A', 'unreachable', None)
+
+    with MultiSearchDispatcher(using=client) as dispatcher:
+        futures = [dispatcher.submit(make_search(n)) for n in ('a', 'b')]
+        for future in futures:
+            with pytest.raises(ConnectionError):
+                future.result()
+
+
+def test_dispatcher__close_sends_pending():
+    client = make_client()
+    dispatcher = MultiSearchDispatcher(using=client, max_wait=60)
+    future = dispatcher.submit(make_search('moby').params(routing='balaenoptera'))
+
+    dispatcher.close()
+
+    assert future.done()
+    assert future.result().hits[0].meta.id == 'moby'
+    body = client.msearch.call_args.kwargs['body']
+    assert body[0] == {'index': ['individuals'], 'routing': 'balaenoptera'}
+    with pytest.raises(RuntimeError):
+        dispatcher.submit(make_search('moby'))
+
+
+def test_dispatcher__unsupported_params():
+    with MultiSearchDispatcher(using=mock.MagicMock()) as dispatcher:
+        with pytest.raises(ValueError, match='scroll'):
+            dispatcher.submit(make_search('moby').params(scroll='1m'))
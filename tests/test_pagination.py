@@ -0,0 +1,145 @@
+import threading
+from unittest import mock
+
+import pytest
+from elasticsearch.exceptions import RequestError
+
+from gumby.dsl import Q
+from gumby.models import Sighting
+from gumby.pagination import iter_documents, iter_hits
+
+
+def make_client(sources, page_size):
+    """Client stub serving ``sources`` in pages of ``page_size``"""
+    client = mock.MagicMock()
+    client.open_point_in_time.return_value = {'id': 'pit'}
+
+    def search(body):
+        start = 0
+        if 'search_after' in body:
+            start = [s['id'] for s in sources].index(body['search_after'][0]) + 1
+        page = sources[start : start + page_size]
+        return {'hits': {'hits': [{'_source': s, 'sort': [s['id']]} for s in page]}}
+
+    client.search.side_effect = search
+    return client
+
+
+def make_oss_client(sources, page_size):
+    """Client stub of a cluster without the point-in-time API,
+    serving ``sources`` by scrolling in pages of ``page_size``
+
+    """
+    client = mock.MagicMock()
+    error = 'no handler found for uri [/sightings/_pit] and method [POST]'
+    client.open_point_in_time.side_effect = RequestError(
+        400, error, {'error': error, 'status': 400}
+    )
+    pages = [sources[i : i + page_size] for i in range(0, len(sources), page_size)]
+    responses = [
+        {
+            '_scroll_id': 'scroll',
+            '_shards': {},
+            'hits': {'hits': [{'_source': s} for s in page]},
+        }
+        for page in pages + [[]]
+    ]
+    client.search.return_value = responses[0]
+    client.scroll.side_effect = responses[1:]
+    return client
+
+
+def make_sources(count):
+    return [
+        {'id': f'00000000-0000-0000-0000-{i:012}', 'time_specificity': 'day'}
+        for i in range(count)
+    ]
+
+
+def test_iter_hits__prefetch():
+    sources = make_sources(10)
+    client = make_client(sources, page_size=4)
+    requested = threading.Event()
+    search = client.search.side_effect
+
+    def tracking_search(body):
+        resp = search(body)
+        if 'search_after' in body:
+            requested.set()
+        return resp
+
+    client.search.side_effect = tracking_search
+    hits = iter_hits(client, 'sightings', page_size=4, prefetch=True)
+
+    # The second page is requested while the first is being consumed
+    first = [next(hits) for i in range(4)]
+    assert requested.wait(1)
+    assert [h['_source'] for h in first + list(hits)] == sources
+    assert client.search.call_count == 3
+    client.close_point_in_time.assert_called_once_with(body={'id': 'pit'}, ignore=(404,))
+
+
+def test_iter_hits__closed_early():
+    client = make_client(make_sources(10), page_size=4)
+
+    hits = iter_hits(client, 'sightings', page_size=4, prefetch=True)
+    next(hits)
+    hits.close()
+
+    client.close_point_in_time.assert_called_once_with(body={'id': 'pit'}, ignore=(404,))
+
+
+def test_iter_documents():
+    sources = make_sources(5)
+    client = make_client(sources, page_size=2)
+
+    docs = list(
+        iter_documents(
+            Sighting,
+            query=Q('term', time_specificity='day'),
+            fields=['id', 'time_specificity'],
+            page_size=2,
+            using=client,
+        )
+    )
+
+    assert all(isinstance(doc, Sighting) for doc in docs)
+    assert [str(doc.id) for doc in docs] == [s['id'] for s in sources]
+    client.open_point_in_time.assert_called_once_with(index='sightings', keep_alive='1m')
+    body = client.search.call_args.kwargs['body']
+    assert body['query'] == {'term': {'time_specificity': 'day'}}
+    assert body['_source'] == ['id', 'time_specificity']
+
+    raw = list(iter_documents(Sighting, page_size=2, using=client, raw=True))
+    assert raw == sources
+
+
+def test_iter_hits__scroll_fallback():
+    sources = make_sources(5)
+    client = make_oss_client(sources, page_size=2)
+
+    hits = list(
+        iter_hits(client, 'sightings', body={'query': {'match_all': {}}}, page_size=2)
+    )
+
+    assert [hit['_source'] for hit in hits] == sources
+    kwargs = client.search.call_args.kwargs
+    assert kwargs['index'] == 'sightings'
+    assert kwargs['size'] == 2
+    assert kwargs['body'] == {'query': {'match_all': {}}, 'sort': '_doc'}
+    client.clear_scroll.assert_called_once()
+
+    # A requested sort is kept
+    client = make_oss_client(sources, page_size=2)
+    list(iter_hits(client, 'sightings', sort=[{'datetime': 'desc'}], page_size=2))
+    assert client.search.call_args.kwargs['body'] == {'sort': [{'datetime': 'desc'}]}
+
+
+def test_iter_hits__other_errors():
+    client = make_oss_client([], page_size=2)
+    client.open_point_in_time.side_effect = RequestError(
+        400, 'index_not_found_exception', {}
+    )
+
+    with pytest.raises(RequestError):
+        list(iter_hits(client, 'sightings'))
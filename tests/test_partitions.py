@@ -0,0 +1,168 @@
+import datetime
+from unittest import mock
+
+import pytest
+
+from gumby.codecs import get_codec
+from gumby.factories import make_encounter
+from gumby.indices import IndexStatus, init_model_index, reindex_model
+from gumby.lookups import get_many
+from gumby.models import Encounter, Individual
+from gumby.partitions import (
+    PartitionedSearch,
+    drop_partitions_before,
+    partition_model,
+    rollover_partitions,
+)
+from gumby.sync import Change, _to_action
+
+NOW = datetime.datetime(2021, 5, 17, 12, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def partitioning():
+    yield partition_model(Encounter, interval='year')
+    Encounter._partitioning = None
+
+
+def make_client(partitions=(), template=None):
+    """Mock client with the ``partitions`` behind the alias,
+    and the index ``template`` mappings in place
+
+    """
+    client = mock.MagicMock()
+    client.indices.get_alias.return_value = {name: {} for name in partitions}
+    client.indices.get_index_template.return_value = (
+        {'error': 'missing', 'status': 404}
+        if template is None
+        else {'index_templates': [{'index_template': {'template': template}}]}
+    )
+    client.indices.create.return_value = {'acknowledged': True}
+    return client
+
+
+def test_index_for(partitioning):
+    assert partitioning.index_for(NOW) == 'encounters.2021'
+    assert partitioning.index_for('2021-12-31T23:30:00-05:00') == 'encounters.2022'
+    assert partitioning.index_for(datetime.date(2020, 2, 1)) == 'encounters.2020'
+    assert partitioning.index_for(None) == 'encounters.undated'
+    with pytest.raises(ValueError, match='cannot partition'):
+        partitioning.index_for('now-1y')
+
+    monthly = partition_model(Encounter, interval='month')
+    assert monthly.index_for(NOW) == 'encounters.2021-05'
+    assert monthly.period_of('encounters.2021-12')[1].year == 2022
+    assert monthly.period_of('encounters.undated') is None
+
+
+def test_partition_model__invalid():
+    with pytest.raises(ValueError, match='interval'):
+        partition_model(Encounter, interval='week')
+    with pytest.raises(ValueError, match='no field'):
+        partition_model(Encounter, field='when')
+    assert Encounter._partitioning is None
+
+
+def test_search__prunes_partitions(partitioning):
+    s = Encounter.search()
+    assert isinstance(s, PartitionedSearch)
+
+    pruned = s.filter('range', datetime={'gte': '2019-06-01', 'lt': '2021-01-01'}).prune()
+    assert pruned._index == ['encounters.2019', 'encounters.2020', 'encounters.2021']
+    assert pruned._params == {'ignore_unavailable': True}
+
+    # Conjunctions narrow the range, other clauses don't
+    s = s.query('bool', must=[{'range': {'datetime': {'lte': '2020-03-01'}}}])
+    s = s.filter('range', datetime={'gte': '2020-02-01'}).filter('term', sex='female')
+    assert s.prune()._index == ['encounters.2020']
+
+    # Unbounded (or date math) ranges search every partition
+    s = Encounter.search().filter('range', datetime={'gte': 'now-1y'})
+    assert s.prune()._index == ['encounters']
+    s = Encounter.search().query('bool', should=[{'term': {'datetime': '2020-01-01'}}])
+    assert s.prune()._index == ['encounters']
+    # as do searches of other models or indices
+    assert not isinstance(Individual.search(), PartitionedSearch)
+    assert Encounter.search(index='other')._index == ['other']
+
+    # Contradicting ranges match nothing
+    s = Encounter.search().filter('range', datetime={'gte': '2021-01-01', 'lt': '2020'})
+    assert s.prune().to_dict()['query']['bool']['filter'][-1] == {'match_none': {}}
+
+
+def test_search__executes_pruned(partitioning):
+    client = mock.MagicMock()
+    client.search.return_value = {'hits': {'total': {'value': 0}, 'hits': []}}
+    s = Encounter.search(using=client).filter('term', datetime='2020-07-01')
+
+    s.execute()
+
+    assert client.search.call_args.kwargs['index'] == ['encounters.2020']
+    assert client.search.call_args.kwargs['ignore_unavailable'] is True
+
+
+def test_init(partitioning):
+    client = make_client()
+
+    assert init_model_index(Encounter, using=client) == IndexStatus.CREATED
+
+    body = client.indices.put_index_template.call_args.kwargs['body']
+    assert body['index_patterns'] == ['encounters.*']
+    assert body['template']['aliases'] == {'encounters': {}}
+    created = [c.kwargs['index'] for c in client.indices.create.call_args_list]
+    assert created[0] == 'encounters.undated'
+    assert len(created) == 2
+    with pytest.raises(ValueError, match='partitioned'):
+        reindex_model(Encounter, using=client)
+
+
+def test_init__unchanged(partitioning):
+    template = partitioning._template_body()['template']
+    client = make_client(template=template)
+
+    assert init_model_index(Encounter, using=client) == IndexStatus.UNCHANGED
+    client.indices.put_index_template.assert_not_called()
+
+
+def test_rollover_and_retention(partitioning):
+    client = make_client()
+
+    created = rollover_partitions(Encounter, using=client, now=NOW, ahead=1)
+    assert created == ['encounters.undated', 'encounters.2021', 'encounters.2022']
+
+    client = make_client(
+        ['encounters.2019', 'encounters.2020', 'encounters.2021', 'encounters.undated']
+    )
+    dropped = drop_partitions_before(Encounter, '2021-01-01', using=client)
+    assert dropped == ['encounters.2019', 'encounters.2020']
+    client.indices.delete.assert_called_once_with(index='encounters.2019,encounters.2020')
+
+    with pytest.raises(ValueError, match='not partitioned'):
+        rollover_partitions(Individual, using=client)
+
+
+def test_writes_go_to_partitions(partitioning):
+    encounter = make_encounter()
+    encounter['datetime'] = NOW
+
+    action = get_codec(Encounter).to_action(encounter)
+    assert action['_index'] == 'encounters.2021'
+    assert Encounter(**encounter)._get_index() == 'encounters.2021'
+    # unless given an index
+    assert Encounter(**encounter)._get_index('other') == 'other'
+
+    delete = _to_action(Change(Encounter, 2, {'id': 'x', 'datetime': NOW}, True))
+    assert delete['_index'] == 'encounters.2021'
+
+
+def test_get_many__searches_ids(partitioning):
+    client = mock.MagicMock()
+    client.search.return_value = {
+        'hits': {'hits': [{'_index': 'encounters.2021', '_id': 'a', '_source': {}}]}
+    }
+
+    docs = get_many(Encounter, ['a', 'b'], using=client)
+
+    assert docs[0].meta.index == 'encounters.2021'
+    assert docs[1] is None
+    client.mget.assert_not_called()
@@ -0,0 +1,52 @@
+from unittest import mock
+
+from gumby.indices import init_model_index
+from gumby.models import Encounter, Individual
+from gumby.pipelines import INDIVIDUAL_SUMMARY_PIPELINE, _pipelines, put_pipelines
+
+
+def test_individual_summary_pipeline():
+    assert Individual._index.to_dict()['settings'] == {
+        'final_pipeline': INDIVIDUAL_SUMMARY_PIPELINE
+    }
+    body = _pipelines[INDIVIDUAL_SUMMARY_PIPELINE]
+    (processor,) = body['processors']
+    assert processor['script']['lang'] == 'painless'
+
+    # The summary fields are mapped
+    mapping = Individual._doc_type.mapping.to_dict()['properties']
+    for name in (
+        'first_sighting',
+        'last_sighting',
+        'encounter_count',
+        'has_annotated_encounter',
+        'encounter_taxonomies',
+        'encounter_submitters',
+    ):
+        assert name in mapping
+
+
+def test_put_pipelines():
+    client = mock.MagicMock()
+
+    put_pipelines(client, Individual)
+    client.ingest.put_pipeline.assert_called_once_with(
+        id=INDIVIDUAL_SUMMARY_PIPELINE, body=_pipelines[INDIVIDUAL_SUMMARY_PIPELINE]
+    )
+
+    # Models without a pipeline
+    client = mock.MagicMock()
+    put_pipelines(client, Encounter)
+    client.ingest.put_pipeline.assert_not_called()
+
+
+def test_init_model_index__puts_pipelines_before_creating():
+    client = mock.MagicMock()
+    client.indices.get_alias.return_value = {}
+    client.indices.get.return_value = {}
+    client.indices.exists.return_value = False
+
+    init_model_index(Individual, using=client)
+
+    calls = [c[0] for c in client.mock_calls]
+    assert calls.index('ingest.put_pipeline') < calls.index('indices.create')
@@ -0,0 +1,74 @@
+from gumby.queries import encounter_count_at_least, has_encounter
+
+
+def test_encounter_count_at_least():
+    assert encounter_count_at_least(3).to_dict() == {
+        'range': {'encounter_count': {'gte': 3}}
+    }
+
+
+def test_has_encounter__uses_summary_fields():
+    assert has_encounter(taxonomy='balaenoptera edeni').to_dict() == {
+        'term': {'encounter_taxonomies': 'balaenoptera edeni'}
+    }
+    assert has_encounter(has_annotation=True).to_dict() == {
+        'term': {'has_annotated_encounter': True}
+    }
+    assert has_encounter(after='2021-01-01').to_dict() == {
+        'range': {'last_sighting': {'gte': '2021-01-01'}}
+    }
+    assert has_encounter().to_dict() == {'range': {'encounter_count': {'gt': 0}}}
+
+
+def test_has_encounter__nested():
+    query = has_encounter(taxonomy='balaenoptera edeni', has_annotation=True).to_dict()
+
+    filters = query['bool']['filter']
+    # Narrowed down by the summary fields
+    assert filters[:2] == [
+        {'term': {'encounter_taxonomies': 'balaenoptera edeni'}},
+        {'term': {'has_annotated_encounter': True}},
+    ]
+    # Both criteria hold for the same encounter
+    assert filters[2] == {
+        'nested': {
+            'path': 'encounters',
+            'query': {
+                'bool': {
+                    'filter': [
+                        {'term': {'encounters.taxonomy': 'balaenoptera edeni'}},
+                        {'term': {'encounters.has_annotation': True}},
+                    ]
+                }
+            },
+        }
+    }
+
+
+def test_has_encounter__date_range():
+    query = has_encounter(after='2021-01-01', before='2021-02-01').to_dict()
+
+    filters = query['bool']['filter']
+    assert filters[:2] == [
+        {'range': {'last_sighting': {'gte': '2021-01-01'}}},
+        {'range': {'first_sighting': {'lte': '2021-02-01'}}},
+    ]
+    assert filters[2]['nested']['query']['bool']['filter'] == [
+        {
+            'range': {
+                'encounters.date_occurred': {'gte': '2021-01-01', 'lte': '2021-02-01'}
+            }
+        }
+    ]
+
+
+def test_has_encounter__without_annotation():
+    query = has_encounter(has_annotation=False).to_dict()
+    assert query == {
+        'nested': {
+            'path': 'encounters',
+            'query': {
+                'bool': {'filter': [{'term': {'encounters.has_annotation': False}}]}
+            },
+        }
+    }
@@ -0,0 +1,107 @@
+import uuid
+from unittest import mock
+
+import pytest
+
+from gumby.codecs import get_codec
+from gumby.factories import make_individual
+from gumby.indices import IndexStatus, _index_body, mapping_status, reindex_model
+from gumby.lookups import get_many
+from gumby.models import Encounter, Individual
+from gumby.routing import RoutedSearch, route_model
+from gumby.sync import Change, _to_action
+from gumby.updates import iter_append_encounters_actions
+
+BLUE_WHALE = 'balaenoptera musculus'
+
+
+@pytest.fixture
+def routing():
+    yield route_model(Individual)
+    Individual._shard_routing = None
+    del Individual._doc_type.mapping._meta['_routing']
+
+
+def test_route_model(routing):
+    assert _index_body(Individual)['mappings']['_routing'] == {'required': True}
+    assert routing.routing_for({'id': 'x', 'taxonomy': BLUE_WHALE}) == BLUE_WHALE
+    # Documents without a value are routed by their id
+    assert routing.routing_for({'id': 'x', 'taxonomy': None}) == 'x'
+    with pytest.raises(ValueError, match='no field'):
+        route_model(Encounter, field='genus')
+    assert Encounter._shard_routing is None
+
+
+def test_route_model__needs_reindex(routing):
+    client = mock.MagicMock()
+    client.indices.get_alias.return_value = {'individuals-v1': {}}
+    client.indices.get.return_value = {'individuals-v1': {}}
+    client.reindex.return_value = {'task': 'node:1'}
+    client.tasks.get.return_value = {'completed': True, 'task': {}}
+    live = {'properties': _index_body(Individual)['mappings']['properties']}
+
+    assert mapping_status(Individual, live) == IndexStatus.NEEDS_REINDEX
+
+    reindex_model(Individual, using=client)
+    script = client.reindex.call_args.kwargs['body']['script']
+    assert script['params'] == {'field': 'taxonomy'}
+
+
+def test_search__routes_single_taxonomy(routing):
+    s = Individual.search()
+    assert isinstance(s, RoutedSearch)
+
+    assert s.filter('term', taxonomy=BLUE_WHALE).prune()._params == {
+        'routing': BLUE_WHALE
+    }
+    s = s.filter('terms', taxonomy=[BLUE_WHALE, 'balaenoptera edeni'])
+    assert s.prune()._params == {'routing': f'balaenoptera edeni,{BLUE_WHALE}'}
+    # Conjunctions narrow the routing down
+    assert s.filter('term', taxonomy=BLUE_WHALE).prune()._params == {
+        'routing': BLUE_WHALE
+    }
+
+    # Other clauses search every shard
+    s = Individual.search().query('bool', should=[{'term': {'taxonomy': BLUE_WHALE}}])
+    assert s.prune()._params == {}
+    s = Individual.search().filter('term', encounter_taxonomies=BLUE_WHALE)
+    assert s.prune()._params == {}
+    # as do searches given a routing
+    s = Individual.search().filter('term', taxonomy=BLUE_WHALE).params(routing='x')
+    assert s.prune()._params == {'routing': 'x'}
+
+
+def test_search__executes_routed(routing):
+    client = mock.MagicMock()
+    client.search.return_value = {'hits': {'total': {'value': 0}, 'hits': []}}
+
+    Individual.search(using=client).filter('term', taxonomy=BLUE_WHALE).execute()
+
+    assert client.search.call_args.kwargs['routing'] == BLUE_WHALE
+
+
+def test_writes_are_routed(routing):
+    individual = make_individual(taxonomy=BLUE_WHALE)
+
+    action = get_codec(Individual).to_action(individual)
+    assert action['routing'] == BLUE_WHALE
+
+    client = mock.MagicMock()
+    client.index.return_value = {'_id': str(individual['id']), 'result': 'created'}
+    Individual(**individual).save(using=client)
+    assert client.index.call_args.kwargs['routing'] == BLUE_WHALE
+
+    delete = _to_action(Change(Individual, 2, individual, True))
+    assert delete['routing'] == BLUE_WHALE
+
+    id = uuid.uuid4()
+    (action,) = iter_append_encounters_actions([(id, [], BLUE_WHALE)], trusted=True)
+    assert action['routing'] == BLUE_WHALE
+
+
+def test_get_many__searches_ids(routing):
+    client = mock.MagicMock()
+    client.search.return_value = {'hits': {'hits': []}}
+
+    assert get_many(Individual, ['a'], using=client) == [None]
+    client.mget.assert_not_called()
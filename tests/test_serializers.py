@@ -0,0 +1,70 @@
+import datetime
+import json
+import uuid
+from unittest import mock
+
+import pytest
+from elasticsearch.serializer import JSONSerializer
+
+from gumby import Client
+from gumby.models import LivingStatus, Sex
+from gumby.serializers import OrjsonSerializer, bulk_body
+
+pytest.importorskip('orjson')
+
+VALUE = {
+    'id': uuid.UUID('8d1ab1c2-5f5e-4b0a-9d55-0c9c3f4d9b7e'),
+    'sex': Sex.non_binary,
+    'living_status': LivingStatus.alive,
+    'datetime': datetime.datetime(2021, 5, 4, 12, 30, tzinfo=datetime.timezone.utc),
+    'date': datetime.date(2021, 5, 4),
+    'name': 'Mobÿ',
+    'count': 3,
+}
+
+
+def test_dumps__same_as_json_serializer():
+    serializer = OrjsonSerializer()
+
+    assert json.loads(serializer.dumps(VALUE)) == json.loads(
+        JSONSerializer().dumps(VALUE)
+    )
+    assert serializer.dumps_bytes(VALUE) == serializer.dumps(VALUE).encode('utf-8')
+    # Strings are taken to be serialized already
+    assert serializer.dumps('{"a":1}') == '{"a":1}'
+    # Beyond 64 bit integers
+    assert serializer.dumps({'big': 2**70}) == '{"big":%d}' % 2**70
+
+
+def test_loads():
+    serializer = OrjsonSerializer()
+
+    assert serializer.loads('{"a":[1,"b"]}') == {'a': [1, 'b']}
+    assert serializer.loads(b'{"a":1}') == {'a': 1}
+    assert serializer.loads('{"big":%d}' % 2**70) == {'big': 2**70}
+
+
+@pytest.mark.parametrize('serializer', [OrjsonSerializer(), JSONSerializer()])
+def test_bulk_body(serializer):
+    lines = [{'index': {'_id': str(VALUE['id'])}}, VALUE, '{"delete":{"_id":"1"}}']
+
+    body = bulk_body(serializer, lines)
+
+    assert isinstance(body, bytes)
+    assert body.endswith(b'\n')
+    decoded = [json.loads(line) for line in body.splitlines()]
+    assert decoded[1]['sex'] == 'non-binary'
+    assert decoded[2] == {'delete': {'_id': '1'}}
+
+
+def test_client__bulk_body_as_bytes():
+    client = Client(hosts=['es-one'])
+    assert isinstance(client.transport.serializer, OrjsonSerializer)
+
+    with mock.patch.object(client.transport, 'perform_request') as perform_request:
+        client.bulk([{'index': {'_index': 'encounters'}}, VALUE])
+
+    body = perform_request.call_args.kwargs['body']
+    assert body == bulk_body(
+        client.transport.serializer, [{'index': {'_index': 'encounters'}}, VALUE]
+    )
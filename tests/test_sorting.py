@@ -0,0 +1,75 @@
+from unittest import mock
+
+import pytest
+
+from gumby.dsl import Q
+from gumby.dsl import Nested
+from gumby.models import ALL_MODELS, Encounter, Individual, Sighting
+from gumby.sorting import (
+    index_sort,
+    latest_encounters,
+    matches_index_sort,
+    recent_individuals,
+    sort_by_index,
+)
+
+
+def test_index_sort():
+    assert index_sort(Encounter) == [('datetime', 'desc')]
+    assert index_sort(Sighting) == []
+    # Indices with nested fields can't be sorted
+    assert index_sort(Individual) == []
+
+
+def test_index_sort__without_nested_fields():
+    # Elasticsearch refuses to create sorted indices with nested fields
+    for model in ALL_MODELS:
+        if index_sort(model):
+            properties = model._doc_type.mapping.properties._params['properties']
+            assert not any(isinstance(f, Nested) for f in properties.values())
+
+
+def test_matches_index_sort():
+    s = Encounter.search()
+    assert matches_index_sort(s.sort('-datetime'))
+    assert matches_index_sort(s.sort({'datetime': {'order': 'desc'}}))
+    assert not matches_index_sort(s.sort('datetime'))
+    assert not matches_index_sort(s.sort('-datetime', 'sex'))
+    assert not matches_index_sort(s.sort({'datetime': {'order': 'desc', 'mode': 'max'}}))
+    assert not matches_index_sort(s)
+    assert not matches_index_sort(Individual.search().sort('-last_sighting'))
+    assert not matches_index_sort(Sighting.search().sort('-datetime'))
+
+
+def test_sort_by_index():
+    s = sort_by_index(Encounter.search().filter('term', sex='female'))
+    body = s.to_dict()
+    assert body['sort'] == [{'datetime': {'order': 'desc'}}]
+    assert body['track_total_hits'] is False
+
+    # A matching sort is kept
+    assert sort_by_index(Encounter.search().sort('-datetime')).to_dict()['sort'] == [
+        {'datetime': {'order': 'desc'}}
+    ]
+    with pytest.raises(ValueError, match='index sort'):
+        sort_by_index(Sighting.search())
+    with pytest.raises(ValueError, match='index sort'):
+        sort_by_index(Individual.search())
+
+
+def test_recent_activity_feeds():
+    client = mock.MagicMock()
+    client.search.return_value = {'hits': {'hits': []}}
+
+    recent_individuals(
+        Q('term', taxonomy='balaenoptera musculus'), using=client
+    ).execute()
+
+    body = client.search.call_args.kwargs['body']
+    assert body['size'] == 20
+    assert body['sort'] == [{'last_sighting': {'order': 'desc'}}]
+    assert body['track_total_hits'] is False
+    assert body['query'] == {
+        'bool': {'filter': [{'term': {'taxonomy': 'balaenoptera musculus'}}]}
+    }
+    assert latest_encounters(size=5).to_dict()['size'] == 5
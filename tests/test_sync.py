@@ -0,0 +1,225 @@
+import json
+import uuid
+from unittest import mock
+
+import pytest
+from elasticsearch import Elasticsearch
+
+from gumby.factories import CorpusGenerator
+from gumby.models import Encounter, Individual, Sighting
+from gumby.sync import (
+    Change,
+    InMemoryChangeSource,
+    NDJSONChangeSource,
+    Watermark,
+    sync_changes,
+)
+from gumby.updates import UPDATE_ENCOUNTERS_SCRIPT_ID
+
+
+class FakeCluster:
+    """Just enough of the ``_bulk`` and search APIs for syncing,
+    keeping the external version of each document
+
+    """
+
+    def __init__(self, individuals=None):
+        self.versions = {}
+        self.updates = []
+        #: Ids of the encounters of each individual
+        self.individuals = individuals or {}
+        self.client = Elasticsearch()
+
+    def bulk(self, body, **kwargs):
+        lines = [json.loads(line) for line in body.splitlines()]
+        items = []
+        while lines:
+            ((op_type, meta),) = lines.pop(0).items()
+            if op_type != 'delete':
+                source = lines.pop(0)
+            if op_type == 'update':
+                self.updates.append((meta['_id'], source['script']))
+                items.append({op_type: {'status': 200}})
+                continue
+            key = (meta['_index'], meta['_id'])
+            current = self.versions.get(key)
+            if current is not None and meta['version'] <= current:
+                status = 409
+            elif op_type == 'delete' and current is None:
+                status = 404
+            else:
+                status = 200
+                self.versions[key] = meta['version']
+            items.append({op_type: {'status': status}})
+        errors = any(r['status'] > 299 for i in items for r in i.values())
+        return {'errors': errors, 'items': items}
+
+    def search(self, body, **kwargs):
+        ids = set(body['query']['nested']['query']['terms']['encounters.id'])
+        hits = []
+        for individual_id, encounter_ids in self.individuals.items():
+            matched = [id for id in encounter_ids if id in ids]
+            if matched:
+                inner = [{'fields': {'encounters.id': [id]}} for id in matched]
+                hits.append(
+                    {
+                        '_id': individual_id,
+                        'sort': [individual_id],
+                        'inner_hits': {
+                            'encounters': {
+                                'hits': {'total': {'value': len(inner)}, 'hits': inner}
+                            }
+                        },
+                    }
+                )
+        return {'hits': {'hits': hits}}
+
+    def patch(self):
+        client = self.client
+        patches = [
+            mock.patch.object(client, 'bulk', side_effect=self.bulk),
+            mock.patch.object(client, 'search', side_effect=self.search),
+            mock.patch.object(client, 'open_point_in_time', return_value={'id': 'pit'}),
+            mock.patch.object(client, 'close_point_in_time'),
+            mock.patch.object(client, 'put_script'),
+            mock.patch.object(client, 'indices'),
+        ]
+        for patch in patches:
+            patch.start()
+        return patches
+
+
+@pytest.fixture
+def cluster():
+    cluster = FakeCluster()
+    patches = cluster.patch()
+    yield cluster
+    for patch in patches:
+        patch.stop()
+
+
+def make_encounter():
+    return next(CorpusGenerator(seed=1).encounters(1))
+
+
+def test_sync_changes(cluster, tmp_path):
+    generator = CorpusGenerator(seed=0)
+    source = InMemoryChangeSource()
+    for version, data in enumerate(generator.sightings(3), 1):
+        source.add(Sighting, version, data)
+    individual = next(generator.individuals(1))
+    source.add(Individual, 4, individual)
+    watermark_path = tmp_path / 'sync.json'
+
+    totals = sync_changes(cluster.client, source, watermark_path, chunk_size=2)
+
+    assert totals == {'written': 4, 'skipped': 0, 'individuals': 0, 'watermark': 4}
+    assert cluster.versions[('individuals', str(individual['id']))] == 4
+    assert Watermark(watermark_path).value == 4
+
+    # Only new changes are synced
+    source.add(Individual, 5, individual)
+    totals = sync_changes(cluster.client, source, watermark_path)
+    assert totals == {'written': 1, 'skipped': 0, 'individuals': 0, 'watermark': 5}
+
+
+def test_sync_changes__refreshes_individuals_before_propagating(cluster):
+    encounter = make_encounter()
+    individual = next(CorpusGenerator(seed=0).individuals(1))
+    source = InMemoryChangeSource(
+        [
+            Change(Individual, 1, individual),
+            Change(Sighting, 2, next(CorpusGenerator(seed=0).sightings(1))),
+            Change(Encounter, 3, encounter),
+            Change(Encounter, 4, encounter),
+        ]
+    )
+
+    sync_changes(cluster.client, source, chunk_size=1)
+
+    # Once, as the individual was written in an earlier chunk
+    cluster.client.indices.refresh.assert_called_once_with(index='individuals')
+
+
+def test_sync_changes__replay_is_idempotent(cluster):
+    encounter = make_encounter()
+    source = InMemoryChangeSource([Change(Encounter, 2, encounter)])
+
+    assert sync_changes(cluster.client, source)['written'] == 1
+    # Without a watermark, the change is replayed, but not written again
+    totals = sync_changes(cluster.client, source)
+    assert (totals['written'], totals['skipped']) == (0, 1)
+    # Nor is an older change
+    source = InMemoryChangeSource([Change(Encounter, 1, encounter)])
+    totals = sync_changes(cluster.client, source)
+    assert (totals['written'], totals['skipped']) == (0, 1)
+
+
+def test_sync_changes__propagates_encounters(cluster):
+    changed, deleted, other = make_encounter(), make_encounter(), make_encounter()
+    changed['id'], deleted['id'], other['id'] = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    individual_id = str(uuid.uuid4())
+    cluster.individuals = {
+        individual_id: [str(changed['id']), str(deleted['id'])],
+        str(uuid.uuid4()): [str(uuid.uuid4())],
+    }
+    source = InMemoryChangeSource()
+    source.add(Encounter, 1, deleted)
+    source.add(Encounter, 2, {'id': changed['id'], 'taxonomy': 'balaenoptera edeni'})
+    source.add(Encounter, 3, other)
+    source.add(Encounter, 4, deleted, deleted=True)
+
+    totals = sync_changes(cluster.client, source)
+
+    assert totals['individuals'] == 1
+    # Only the affected individual is updated, and only with the changed fields
+    ((updated_id, script),) = cluster.updates
+    assert updated_id == individual_id
+    assert script == {
+        'id': UPDATE_ENCOUNTERS_SCRIPT_ID,
+        'params': {
+            'encounters': {str(changed['id']): {'taxonomy': 'balaenoptera edeni'}},
+            'removed': [str(deleted['id'])],
+        },
+    }
+
+
+def test_sync_changes__does_not_propagate_stale_encounters(cluster):
+    encounter = make_encounter()
+    cluster.individuals = {str(uuid.uuid4()): [str(encounter['id'])]}
+    sync_changes(cluster.client, InMemoryChangeSource([Change(Encounter, 10, encounter)]))
+    cluster.updates.clear()
+
+    stale = {'id': encounter['id'], 'taxonomy': 'balaenoptera edeni'}
+    totals = sync_changes(
+        cluster.client, InMemoryChangeSource([Change(Encounter, 3, stale)])
+    )
+
+    assert (totals['skipped'], totals['individuals']) == (1, 0)
+    assert cluster.updates == []
+
+
+def test_sync_changes__fails_on_errors(cluster):
+    cluster.bulk = mock.Mock(
+        return_value={'errors': True, 'items': [{'index': {'status': 400}}]}
+    )
+    cluster.client.bulk.side_effect = cluster.bulk
+    source = InMemoryChangeSource([Change(Encounter, 1, make_encounter())])
+
+    with pytest.raises(RuntimeError, match='failed to sync change'):
+        sync_changes(cluster.client, source)
+
+
+def test_ndjson_change_source(tmp_path):
+    encounter = {'id': str(uuid.uuid4()), 'taxonomy': 'balaenoptera edeni'}
+    path = tmp_path / 'changes.ndjson'
+    records = [
+        {'model': 'encounter', 'version': 1, 'data': encounter},
+        {'model': 'encounter', 'version': 2, 'data': encounter, 'deleted': True},
+    ]
+    path.write_text(''.join(json.dumps(r) + '\n' for r in records))
+
+    source = NDJSONChangeSource(path)
+
+    assert list(source.changes(since=1)) == [Change(Encounter, 2, encounter, True)]
+    assert len(list(source.changes())) == 2
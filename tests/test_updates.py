@@ -0,0 +1,125 @@
+import uuid
+from unittest import mock
+
+import pytest
+from elasticsearch import Elasticsearch
+from elasticsearch_dsl import ValidationException
+
+from gumby.factories import make_encounter
+from gumby.models import Individual, Sex
+from gumby.pipelines import INDIVIDUAL_SUMMARY_SCRIPT, SUMMARIZE_ENCOUNTERS_SNIPPET
+from gumby.updates import (
+    APPEND_ENCOUNTERS_SCRIPT,
+    APPEND_ENCOUNTERS_SCRIPT_ID,
+    UPDATE_ENCOUNTERS_SCRIPT,
+    UPDATE_ENCOUNTERS_SCRIPT_ID,
+    append_encounters,
+    bulk_append_encounters,
+    iter_append_encounters_actions,
+    iter_update_encounters_actions,
+)
+
+
+def test_append_encounters():
+    client = mock.MagicMock()
+    individual_id = uuid.uuid4()
+    encounter = make_encounter(sex=Sex.female)
+
+    with mock.patch('gumby.updates.invalidate_index') as invalidate_index:
+        append_encounters(client, individual_id, encounter)
+        append_encounters(client, individual_id, [make_encounter()])
+
+    # The scripts are only stored once per client
+    assert client.put_script.call_count == 2
+    client.put_script.assert_any_call(
+        id=APPEND_ENCOUNTERS_SCRIPT_ID,
+        body={'script': {'lang': 'painless', 'source': APPEND_ENCOUNTERS_SCRIPT}},
+    )
+    assert client.update.call_count == 2
+    kwargs = client.update.call_args_list[0].kwargs
+    assert kwargs['index'] == Individual._index._name
+    assert kwargs['id'] == str(individual_id)
+    script = kwargs['body']['script']
+    assert script['id'] == APPEND_ENCOUNTERS_SCRIPT_ID
+    # Only the encounter is sent, in its serialized form
+    (sent,) = script['params']['encounters']
+    assert sent['id'] == str(encounter['id'])
+    assert sent['sex'] == str(encounter['sex'])
+    invalidate_index.assert_called_with(Individual._index._name)
+
+
+def test_append_encounters__validates():
+    client = mock.MagicMock()
+    encounter = make_encounter(submitter_id=None)
+
+    with pytest.raises(ValidationException):
+        append_encounters(client, uuid.uuid4(), encounter)
+    client.update.assert_not_called()
+
+    # Unless trusted
+    append_encounters(client, uuid.uuid4(), encounter, trusted=True)
+    client.update.assert_called_once()
+
+
+def test_iter_append_encounters_actions():
+    updates = [(uuid.uuid4(), [make_encounter(), make_encounter()]) for i in range(3)]
+
+    actions = list(iter_append_encounters_actions(updates, index='test-individuals'))
+
+    assert [a['_id'] for a in actions] == [str(id) for id, e in updates]
+    action = actions[0]
+    assert action['_op_type'] == 'update'
+    assert action['_index'] == 'test-individuals'
+    assert action['script']['id'] == APPEND_ENCOUNTERS_SCRIPT_ID
+    assert len(action['script']['params']['encounters']) == 2
+
+
+def test_iter_update_encounters_actions():
+    individual_id, encounter_id, removed_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    updates = [(individual_id, {encounter_id: {'taxonomy': 'x'}}, [removed_id])]
+
+    (action,) = iter_update_encounters_actions(updates)
+
+    assert action['_op_type'] == 'update'
+    assert action['_id'] == str(individual_id)
+    assert action['script'] == {
+        'id': UPDATE_ENCOUNTERS_SCRIPT_ID,
+        'params': {
+            'encounters': {str(encounter_id): {'taxonomy': 'x'}},
+            'removed': [str(removed_id)],
+        },
+    }
+
+
+def test_scripts_update_summary_fields():
+    # Ingest pipelines don't run on updates, so the scripts summarize like the pipeline
+    for source in (
+        INDIVIDUAL_SUMMARY_SCRIPT,
+        APPEND_ENCOUNTERS_SCRIPT,
+        UPDATE_ENCOUNTERS_SCRIPT,
+    ):
+        assert SUMMARIZE_ENCOUNTERS_SNIPPET in source
+        assert 'doc.last_sighting = last;' in source
+
+
+def test_bulk_append_encounters():
+    client = Elasticsearch()
+    updates = [(uuid.uuid4(), [make_encounter()]) for i in range(5)]
+
+    def bulk(body, **kwargs):
+        lines = body.splitlines()
+        return {
+            'errors': False,
+            'items': [{'update': {'status': 200}} for i in range(len(lines) // 2)],
+        }
+
+    with mock.patch.object(
+        client, 'bulk', side_effect=bulk
+    ) as mock_bulk, mock.patch.object(client, 'put_script'), mock.patch.object(
+        client, 'indices'
+    ) as mock_indices:
+        success, errors = bulk_append_encounters(client, iter(updates), chunk_size=2)
+
+    assert (success, errors) == (5, [])
+    assert mock_bulk.call_count == 3
+    mock_indices.refresh.assert_not_called()
@@ -0,0 +1,70 @@
+import datetime
+import uuid
+from unittest import mock
+
+import pytest
+
+from gumby.models import Encounter, Individual, Sex
+from gumby.views import View, get_view
+
+INDIVIDUAL_ID = '8d1ab1c2-5f5e-4b0a-9d55-0c9c3f4d9b7e'
+
+
+def test_from_hit__source():
+    view = get_view(Individual, 'summary')
+    hit = {
+        '_source': {
+            'id': INDIVIDUAL_ID,
+            'name': 'Moby',
+            'sex': 'female',
+            'last_sighting': '2021-05-04T00:00:00+00:00',
+        }
+    }
+
+    record = view.from_hit(hit)
+
+    assert record.id == uuid.UUID(INDIVIDUAL_ID)
+    assert record.name == 'Moby'
+    assert record.alias is None
+    assert record.sex is Sex.female
+    assert record.last_sighting == datetime.datetime(
+        2021, 5, 4, tzinfo=datetime.timezone.utc
+    )
+    with pytest.raises(AttributeError):
+        record.name = 'Ahab'
+
+
+def test_from_hit__docvalues():
+    view = get_view(Individual, 'sightings')
+    hit = {'fields': {'id': [INDIVIDUAL_ID], 'encounter_count': [3]}}
+
+    record = view.from_hit(hit)
+
+    assert record.id == uuid.UUID(INDIVIDUAL_ID)
+    assert record.encounter_count == 3
+    assert record.first_sighting is None
+
+
+def test_execute():
+    view = get_view(Encounter, 'location')
+    client = mock.MagicMock()
+    client.search.return_value = {
+        'hits': {'hits': [{'fields': {'id': [INDIVIDUAL_ID], 'point': []}}]}
+    }
+
+    with mock.patch('gumby.views.get_connection', return_value=client):
+        records = view.execute(view.search().filter('term', sex='male')[:5])
+
+    body = client.search.call_args.kwargs['body']
+    assert body['_source'] is False
+    assert body['docvalue_fields'] == ['id', 'point', 'datetime']
+    assert body['size'] == 5
+    assert body['query'] == {'bool': {'filter': [{'term': {'sex': 'male'}}]}}
+    assert records == [view.record(uuid.UUID(INDIVIDUAL_ID), None, None)]
+
+
+def test_unknown_view():
+    with pytest.raises(LookupError):
+        get_view(Individual, 'nope')
+    with pytest.raises(ValueError, match='no fields'):
+        View(Individual, 'broken', fields=('id', 'nope'))